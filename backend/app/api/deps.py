@@ -3,17 +3,52 @@ Dependências comuns para os endpoints da API
 """
 
 from typing import Generator, Optional
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, status, UploadFile
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
 from jose import JWTError
 
+from app.config import settings
 from app.database import SessionLocal, get_db
 from app.core.security import verify_token
 from app.models.user import User
 
 security = HTTPBearer()
 
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+async def read_upload(upload: UploadFile, max_bytes: int = settings.MAX_FILE_SIZE) -> bytes:
+    """
+    Lê o arquivo enviado em blocos, respeitando MAX_FILE_SIZE
+    
+    O corpo da requisição como um todo já foi limitado antes do parser
+    multipart (BodySizeLimitMiddleware); aqui vale o limite por arquivo.
+    
+    Raises:
+        HTTPException 413: se o arquivo ultrapassar max_bytes
+    """
+    too_large = HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"Arquivo muito grande. Tamanho máximo: {max_bytes // (1024 * 1024)}MB"
+    )
+    
+    # Tamanho informado pelo parser multipart, quando disponível
+    if upload.size is not None and upload.size > max_bytes:
+        raise too_large
+    
+    chunks = []
+    total = 0
+    while True:
+        chunk = await upload.read(UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            break
+        total += len(chunk)
+        if total > max_bytes:
+            raise too_large
+        chunks.append(chunk)
+    
+    return b"".join(chunks)
+
 def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: Session = Depends(get_db)
@@ -7,6 +7,7 @@ from app.api.deps import get_current_user
 from app.models.user import User
 from app.models.employee import AccessLog
 from app.schemas.access_log import AccessLogResponse
+from app.services.access_stats import AccessStatsService
 
 router = APIRouter()
 
@@ -44,6 +45,8 @@ def get_access_logs(
 @router.get("/stats")
 def get_access_stats(
     days: int = Query(7, ge=1, le=365),
+    device_id: Optional[str] = None,
+    employee_id: Optional[int] = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
@@ -52,25 +55,16 @@ def get_access_stats(
     """
     start_date = datetime.utcnow() - timedelta(days=days)
     
-    total_attempts = db.query(AccessLog).filter(
-        AccessLog.attempted_at >= start_date
-    ).count()
-    
-    granted = db.query(AccessLog).filter(
-        AccessLog.attempted_at >= start_date,
-        AccessLog.access_granted == True
-    ).count()
-    
-    denied = db.query(AccessLog).filter(
-        AccessLog.attempted_at >= start_date,
-        AccessLog.access_granted == False
-    ).count()
+    stats = AccessStatsService.get_stats(db, start_date, device_id=device_id, employee_id=employee_id)
+    total_attempts = stats["attempts"]
+    granted = stats["granted"]
     
     return {
         "period_days": days,
         "total_attempts": total_attempts,
         "granted": granted,
-        "denied": denied,
+        "denied": stats["denied"],
+        "liveness_failed": stats["liveness_failed"],
         "success_rate": round((granted / total_attempts * 100) if total_attempts > 0 else 0, 2)
     }
 
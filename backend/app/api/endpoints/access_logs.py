@@ -12,6 +12,7 @@ from app.database import get_db
 from app.models.employee import AccessLog, Employee
 from app.models.user import User
 from app.api.deps import get_current_user
+from app.services.access_stats import AccessStatsService
 from pydantic import BaseModel
 
 router = APIRouter()
@@ -92,38 +93,26 @@ def list_access_logs(
 @router.get("/stats")
 def get_access_stats(
     days: int = Query(7, ge=1, le=90),
+    device_id: Optional[str] = None,
+    employee_id: Optional[int] = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """
     Retorna estatísticas de acesso
+    Lidas dos rollups por hora/dia; só as bordas parciais consultam access_logs
     """
     date_from = datetime.utcnow() - timedelta(days=days)
     
-    total_attempts = db.query(AccessLog).filter(
-        AccessLog.attempted_at >= date_from
-    ).count()
-    
-    granted = db.query(AccessLog).filter(
-        AccessLog.attempted_at >= date_from,
-        AccessLog.access_granted == True
-    ).count()
-    
-    denied = db.query(AccessLog).filter(
-        AccessLog.attempted_at >= date_from,
-        AccessLog.access_granted == False
-    ).count()
-    
-    liveness_failed = db.query(AccessLog).filter(
-        AccessLog.attempted_at >= date_from,
-        AccessLog.liveness_passed == False
-    ).count()
+    stats = AccessStatsService.get_stats(db, date_from, device_id=device_id, employee_id=employee_id)
+    total_attempts = stats["attempts"]
+    granted = stats["granted"]
     
     return {
         "period_days": days,
         "total_attempts": total_attempts,
         "granted": granted,
-        "denied": denied,
-        "liveness_failed": liveness_failed,
+        "denied": stats["denied"],
+        "liveness_failed": stats["liveness_failed"],
         "success_rate": round((granted / total_attempts * 100) if total_attempts > 0 else 0, 2)
     }
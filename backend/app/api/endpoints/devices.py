@@ -0,0 +1,128 @@
+"""
+Endpoints para cadastro de dispositivos (entradas)
+"""
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
+from typing import List
+from datetime import datetime
+
+from app.database import get_db
+from app.schemas.device import DeviceCreate, DeviceUpdate, DeviceResponse
+from app.models.device import Device
+from app.api.deps import get_current_user, get_current_active_superuser
+from app.models.user import User
+from app.services.device_registry import device_registry
+
+router = APIRouter()
+
+@router.get("/", response_model=List[DeviceResponse])
+def list_devices(
+    skip: int = 0,
+    limit: int = 100,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Lista os dispositivos cadastrados
+    """
+    return db.query(Device).order_by(Device.device_id).offset(skip).limit(limit).all()
+
+@router.get("/{device_id}", response_model=DeviceResponse)
+def get_device(
+    device_id: str,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Obtém um dispositivo pelo device_id
+    """
+    device = db.query(Device).filter(Device.device_id == device_id).first()
+    
+    if not device:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Dispositivo não encontrado"
+        )
+    
+    return device
+
+@router.post("/", response_model=DeviceResponse, status_code=status.HTTP_201_CREATED)
+def create_device(
+    device_data: DeviceCreate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_superuser)
+):
+    """
+    Cadastra um dispositivo e o associa a um controlador/porta
+    """
+    if db.query(Device).filter(Device.device_id == device_data.device_id).first():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Dispositivo já cadastrado"
+        )
+    
+    device = Device(**device_data.dict())
+    db.add(device)
+    db.commit()
+    db.refresh(device)
+    
+    # Atualiza o cadastro em memória e propaga aos demais workers
+    device_registry.put(device)
+    
+    return device
+
+@router.put("/{device_id}", response_model=DeviceResponse)
+def update_device(
+    device_id: str,
+    device_data: DeviceUpdate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_superuser)
+):
+    """
+    Atualiza controlador, porta, thresholds ou status de um dispositivo
+    """
+    device = db.query(Device).filter(Device.device_id == device_id).first()
+    
+    if not device:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Dispositivo não encontrado"
+        )
+    
+    for field, value in device_data.dict(exclude_unset=True).items():
+        setattr(device, field, value)
+    
+    device.updated_at = datetime.utcnow()
+    
+    db.commit()
+    db.refresh(device)
+    
+    device_registry.put(device)
+    
+    return device
+
+@router.delete("/{device_id}", status_code=status.HTTP_204_NO_CONTENT)
+def delete_device(
+    device_id: str,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_superuser)
+):
+    """
+    Remove um dispositivo; requisições com esse device_id voltam a usar o
+    controlador e os thresholds padrão
+    """
+    device = db.query(Device).filter(Device.device_id == device_id).first()
+    
+    if not device:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Dispositivo não encontrado"
+        )
+    
+    db.delete(device)
+    db.commit()
+    
+    device_registry.remove(device_id)
+    
+    return None
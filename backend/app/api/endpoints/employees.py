@@ -3,23 +3,95 @@ Endpoints para gerenciamento de colaboradores
 """
 
 from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List
+from starlette.background import BackgroundTask
+from typing import List, Optional
+import csv
+import json
 import os
+import shutil
+import tempfile
+import threading
 import uuid
-import pickle
+import numpy as np
 from datetime import datetime
 
-from app.database import get_db
-from app.schemas.employee import EmployeeResponse, EmployeeListResponse, EmployeeUpdate
-from app.models.employee import Employee
-from app.api.deps import get_current_user
+from app.database import get_db, SessionLocal
+from app.schemas.employee import (
+    EmployeeResponse,
+    EmployeeListResponse,
+    EmployeeUpdate,
+    FaceTemplateResponse,
+    FaceTemplateUploadResponse
+)
+from app.models.employee import Employee, FaceTemplate
+from app.api.deps import get_current_user, get_current_active_superuser, read_upload
 from app.models.user import User
 from app.config import settings
 from app.services.face_recognition_service import FaceRecognitionService
+from app.services.gallery_sync import gallery_sync
+from app.services.frame_context import FrameContext
+from app.services.inference_executor import inference_executor, InferenceQueueFull
+from app.services.bulk_import import BulkImporter, PhotoSource, embed_photos, import_lock, parse_csv
+from app.services.reembedding import ReembeddingService
+from app.utils.embedding_codec import encode_embedding
 
 router = APIRouter()
 
+
+def _employee_embeddings(employee: Employee, model_name: str) -> Optional[np.ndarray]:
+    """
+    Templates armazenados do colaborador (foto do cadastro + face_templates)
+    gerados pelo modelo informado, como em FaceGallery.load
+    
+    Returns:
+        Matriz (n, dimensão) na ordem usada pela galeria, ou None se nenhum
+        vetor for desse modelo (fotos não reprocessadas por um re-embedding)
+    """
+    encodings = [employee.face_encoding] + [template.embedding for template in employee.face_templates]
+    vectors = [FaceRecognitionService.decode_encoding_for(encoding, model_name) for encoding in encodings if encoding is not None]
+    vectors = [vector for vector in vectors if vector is not None]
+    return np.vstack(vectors) if vectors else None
+
+
+def _save_photos(upload: UploadFile) -> PhotoSource:
+    """Copia o zip enviado para um arquivo temporário (removido ao fechar a origem)"""
+    max_bytes = settings.BULK_IMPORT_MAX_UPLOAD_MB * 1024 * 1024
+    
+    with tempfile.NamedTemporaryFile(suffix=".zip", delete=False) as f:
+        shutil.copyfileobj(upload.file, f)
+        size = f.tell()
+    
+    try:
+        if size > max_bytes:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"Arquivo de fotos muito grande. Tamanho máximo: {settings.BULK_IMPORT_MAX_UPLOAD_MB}MB"
+            )
+        return PhotoSource(f.name, delete_on_close=True)
+    except ValueError:
+        os.remove(f.name)
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="As fotos devem ser enviadas em um arquivo zip"
+        )
+    except HTTPException:
+        os.remove(f.name)
+        raise
+
+
+def _ensure_model_unchanged(db: Session, model_name: str):
+    """409 se um job de re-embedding ativou outro modelo durante o cadastro"""
+    db.expire_all()
+    if ReembeddingService.active_model(db)[0] != model_name:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="O modelo de reconhecimento foi trocado durante o cadastro; tente novamente"
+        )
+
+
 @router.get("/", response_model=List[EmployeeListResponse])
 def list_employees(
     skip: int = 0,
@@ -48,6 +120,66 @@ def list_employees(
     employees = query.offset(skip).limit(limit).all()
     return employees
 
+@router.post("/import")
+async def import_employees(
+    csv_file: UploadFile = File(...),
+    photos: UploadFile = File(...),
+    current_user: User = Depends(get_current_active_superuser)
+):
+    """
+    Importa colaboradores em lote a partir de um CSV e de um zip com as fotos
+    
+    Colunas do CSV: full_name, cpf, email, phone, department, position e
+    photo (nome do arquivo no zip). A resposta é um stream NDJSON com o
+    resultado de cada linha e o progresso da importação.
+    """
+    content = await read_upload(csv_file)
+    
+    try:
+        rows, failures = parse_csv(content.decode("utf-8-sig"))
+    except (UnicodeDecodeError, ValueError, csv.Error) as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"CSV inválido: {str(e)}"
+        )
+    
+    if not import_lock.acquire(blocking=False):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Já existe uma importação em andamento"
+        )
+    
+    try:
+        source = await run_in_threadpool(_save_photos, photos)
+    except Exception:
+        import_lock.release()
+        raise
+    
+    # Novos colaboradores entram na galeria e são propagados aos demais workers
+    importer = BulkImporter(SessionLocal, on_employee=gallery_sync.add)
+    events = importer.run(rows, source, failures)
+    finished = threading.Lock()
+    
+    def finish():
+        # Uma vez só: ao fim do stream ou na tarefa de fundo da resposta,
+        # que roda também se o cliente desconectar ou o stream nem começar
+        if not finished.acquire(blocking=False):
+            return
+        try:
+            events.close()
+        finally:
+            source.close()
+            import_lock.release()
+    
+    def stream():
+        try:
+            for event in events:
+                yield json.dumps(event, ensure_ascii=False) + "\n"
+        finally:
+            finish()
+    
+    return StreamingResponse(stream(), media_type="application/x-ndjson", background=BackgroundTask(finish))
+
 @router.get("/{employee_id}", response_model=EmployeeResponse)
 def get_employee(
     employee_id: int,
@@ -96,68 +228,82 @@ async def create_employee(
             detail="Email já cadastrado"
         )
     
-    # Salva imagem temporariamente
-    temp_image_path = f"/tmp/{uuid.uuid4()}.jpg"
+    # Decodifica o upload uma única vez, em memória. O embedding usa o modelo
+    # ativo no banco: um worker que ainda não recebeu a troca de modelo não
+    # grava vetores do modelo anterior
+    content = await read_upload(face_image)
+    model_name = ReembeddingService.active_model(db)[0]
+    frame = FrameContext.from_bytes(content, model_name=model_name)
+    
+    if frame.bgr is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Imagem inválida ou corrompida"
+        )
     
+    # Valida imagem facial (detecção feita uma única vez)
     try:
-        # Salva arquivo enviado
-        with open(temp_image_path, "wb") as buffer:
-            content = await face_image.read()
-            buffer.write(content)
-        
-        # Valida imagem facial
-        validation = FaceRecognitionService.validate_face_image(temp_image_path)
-        
-        if not validation["valid"]:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=validation["error"]
-            )
-        
-        # Gera encoding da face
-        face_encoding = FaceRecognitionService.encode_face(temp_image_path)
-        
-        if face_encoding is None:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Não foi possível processar a face na imagem"
-            )
-        
-        # Salva imagem permanentemente
-        os.makedirs(settings.FACES_DIR, exist_ok=True)
-        permanent_filename = f"{uuid.uuid4()}.jpg"
-        permanent_path = os.path.join(settings.FACES_DIR, permanent_filename)
-        
-        with open(permanent_path, "wb") as f:
-            with open(temp_image_path, "rb") as tmp:
-                f.write(tmp.read())
-        
-        # face_encoding já vem serializado do serviço
-        face_encoding_bytes = face_encoding
-        
-        # Cria colaborador
-        new_employee = Employee(
-            full_name=full_name,
-            cpf=cpf,
-            email=email,
-            phone=phone,
-            department=department,
-            position=position,
-            face_encoding=face_encoding_bytes,
-            face_image_path=permanent_path,
-            face_registered_at=datetime.utcnow()
+        validation = FaceRecognitionService.validate_detected_faces(frame.faces)
+    except Exception as e:
+        validation = {"valid": False, "error": f"Erro ao processar imagem: {str(e)}"}
+    
+    if not validation["valid"]:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=validation["error"]
         )
-        
-        db.add(new_employee)
-        db.commit()
-        db.refresh(new_employee)
-        
-        return new_employee
-        
-    finally:
-        # Limpa arquivo temporário
-        if os.path.exists(temp_image_path):
-            os.remove(temp_image_path)
+    
+    # Gera encoding a partir da face já detectada
+    try:
+        face_encoding = FaceRecognitionService.encode_face_crop(frame.face_crop, frame.model_name)
+    except Exception as e:
+        print(f"Erro ao processar face: {str(e)}")
+        face_encoding = None
+    
+    if face_encoding is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Não foi possível processar a face na imagem"
+        )
+    
+    _ensure_model_unchanged(db, model_name)
+    
+    # Salva os bytes originais diretamente como imagem permanente
+    os.makedirs(settings.FACES_DIR, exist_ok=True)
+    permanent_filename = f"{uuid.uuid4()}.jpg"
+    permanent_path = os.path.join(settings.FACES_DIR, permanent_filename)
+    
+    with open(permanent_path, "wb") as f:
+        f.write(content)
+    
+    # face_encoding já vem serializado do serviço
+    face_encoding_bytes = face_encoding
+    
+    # Cria colaborador
+    new_employee = Employee(
+        full_name=full_name,
+        cpf=cpf,
+        email=email,
+        phone=phone,
+        department=department,
+        position=position,
+        face_encoding=face_encoding_bytes,
+        face_image_path=permanent_path,
+        face_registered_at=datetime.utcnow()
+    )
+    
+    db.add(new_employee)
+    db.commit()
+    db.refresh(new_employee)
+    
+    # Adiciona à galeria em memória e propaga aos demais workers
+    gallery_sync.add(
+        new_employee.id,
+        FaceRecognitionService.decode_encoding(face_encoding_bytes),
+        model_name
+    )
+    
+    return new_employee
 
 @router.put("/{employee_id}", response_model=EmployeeResponse)
 def update_employee(
@@ -177,6 +323,8 @@ def update_employee(
             detail="Colaborador não encontrado"
         )
     
+    was_active = employee.is_active
+    
     # Atualiza campos fornecidos
     update_data = employee_data.dict(exclude_unset=True)
     
@@ -188,6 +336,16 @@ def update_employee(
     db.commit()
     db.refresh(employee)
     
+    # Atualiza galeria em memória apenas se o status mudou
+    if employee.is_active != was_active:
+        if employee.is_active:
+            model_name = ReembeddingService.active_model(db)[0]
+            embeddings = _employee_embeddings(employee, model_name)
+            if embeddings is not None:
+                gallery_sync.reactivate(employee.id, embeddings, model_name)
+        else:
+            gallery_sync.remove(employee.id)
+    
     return employee
 
 @router.delete("/{employee_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -213,4 +371,156 @@ def delete_employee(
     
     db.commit()
     
+    # Remove da galeria em memória e propaga aos demais workers
+    gallery_sync.remove(employee.id)
+    
+    return None
+
+@router.get("/{employee_id}/templates", response_model=List[FaceTemplateResponse])
+def list_face_templates(
+    employee_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Lista os templates faciais adicionais de um colaborador
+    """
+    employee = db.query(Employee).filter(Employee.id == employee_id).first()
+    
+    if not employee:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Colaborador não encontrado"
+        )
+    
+    return employee.face_templates
+
+@router.post(
+    "/{employee_id}/templates",
+    response_model=FaceTemplateUploadResponse,
+    status_code=status.HTTP_201_CREATED
+)
+async def add_face_templates(
+    employee_id: int,
+    files: List[UploadFile] = File(...),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Adiciona várias fotos ao colaborador de uma vez
+    
+    Todas as fotos válidas são processadas em uma única chamada ao modelo;
+    as rejeitadas (sem face, mais de uma face, imagem inválida) são
+    informadas na resposta sem impedir as demais.
+    """
+    employee = db.query(Employee).filter(Employee.id == employee_id).first()
+    
+    if not employee:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Colaborador não encontrado"
+        )
+    
+    if len(files) > settings.FACE_TEMPLATES_MAX_UPLOAD:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Máximo de {settings.FACE_TEMPLATES_MAX_UPLOAD} fotos por envio"
+        )
+    
+    existing = db.query(FaceTemplate).filter(FaceTemplate.employee_id == employee_id).count()
+    if existing + len(files) > settings.FACE_TEMPLATES_MAX_PER_EMPLOYEE:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Limite de {settings.FACE_TEMPLATES_MAX_PER_EMPLOYEE} templates por colaborador"
+        )
+    
+    contents = [await read_upload(upload) for upload in files]
+    model_name = ReembeddingService.active_model(db)[0]
+    
+    try:
+        accepted, embeddings, rejected = await inference_executor.run(embed_photos, contents, model_name)
+    except InferenceQueueFull:
+        raise HTTPException(
+            status_code=503,
+            detail="Servidor ocupado, tente novamente",
+            headers={"Retry-After": "1"}
+        )
+    
+    templates = []
+    if accepted:
+        _ensure_model_unchanged(db, model_name)
+        os.makedirs(settings.FACES_DIR, exist_ok=True)
+        
+        for index, embedding in zip(accepted, embeddings):
+            permanent_path = os.path.join(settings.FACES_DIR, f"{uuid.uuid4()}.jpg")
+            with open(permanent_path, "wb") as f:
+                f.write(contents[index])
+            
+            template = FaceTemplate(
+                employee_id=employee.id,
+                embedding=encode_embedding(embedding, model_name),
+                image_path=permanent_path
+            )
+            db.add(template)
+            templates.append(template)
+        
+        db.commit()
+        for template in templates:
+            db.refresh(template)
+        
+        # Colaborador inativo entra com todos os templates ao ser reativado
+        if employee.is_active:
+            gallery_sync.add_templates(employee.id, embeddings, model_name)
+    
+    return {
+        "employee_id": employee.id,
+        "added": templates,
+        "rejected": [
+            {"filename": files[index].filename, "error": error}
+            for index, error in sorted(rejected.items())
+        ]
+    }
+
+@router.delete("/{employee_id}/templates/{template_id}", status_code=status.HTTP_204_NO_CONTENT)
+def delete_face_template(
+    employee_id: int,
+    template_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Remove um template facial adicional
+    """
+    template = db.query(FaceTemplate).filter(
+        FaceTemplate.id == template_id,
+        FaceTemplate.employee_id == employee_id
+    ).first()
+    
+    if not template:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Template não encontrado"
+        )
+    
+    employee = template.employee
+    image_path = template.image_path
+    
+    db.delete(template)
+    db.commit()
+    db.refresh(employee)
+    
+    if os.path.exists(image_path):
+        os.remove(image_path)
+    
+    # Substitui os templates do colaborador pelos restantes; sem nenhum do
+    # modelo ativo, o colaborador sai da galeria (o template removido não
+    # pode continuar reconhecível)
+    if employee.is_active:
+        model_name = ReembeddingService.active_model(db)[0]
+        embeddings = _employee_embeddings(employee, model_name)
+        if embeddings is not None:
+            gallery_sync.add(employee.id, embeddings, model_name)
+        else:
+            gallery_sync.remove(employee.id)
+    
     return None
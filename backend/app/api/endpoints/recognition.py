@@ -2,118 +2,305 @@
 Endpoint de reconhecimento facial
 """
 
-from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, BackgroundTasks, Form
+from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Form
 from sqlalchemy.orm import Session
-from typing import Optional
-import os
-import uuid
+from starlette.concurrency import run_in_threadpool
+from typing import List, Optional
 from datetime import datetime
+import numpy as np
 
 from app.database import get_db
+from app.api.deps import read_upload
 from app.services.face_recognition_service import FaceRecognitionService
 from app.services.liveness_detection_service import LivenessDetectionService
-from app.services.door_control_service import DoorControlService
-from app.models.employee import Employee, AccessLog
+from app.services.door_command_queue import door_dispatcher
+from app.services.device_registry import device_registry, DeviceConfig
+from app.services.face_gallery import face_gallery, GalleryModelMismatch
+from app.services.inference_executor import inference_executor, InferenceQueueFull
+from app.services.embedding_batcher import embedding_batcher
+from app.services.frame_context import FrameContext
+from app.services.probe_cache import ProbeResult, probe_cache
+from app.services.access_log_writer import access_log_writer
+from app.models.employee import Employee
 from app.config import settings
+from app.core.metrics import metrics
 
 router = APIRouter()
 
+
+def _analyze_probe(frame: FrameContext, liveness_threshold: Optional[float] = None):
+    """
+    Etapas de CPU do reconhecimento, executadas no pool de inferência
+    
+    Frames sem face são descartados por um filtro barato (Haar no frame
+    reduzido) antes do restante. A face é detectada uma única vez e o
+    recorte alinhado segue para o embedding, calculado depois, em lote,
+    pelo embedding_batcher. O liveness roda sobre o frame completo, onde
+    os thresholds foram calibrados, ou sobre o recorte da face em tamanho
+    canônico com LIVENESS_ON_FACE_CROP.
+    
+    Args:
+        frame: Frame do upload
+        liveness_threshold: Threshold de liveness do dispositivo
+    
+    Returns:
+        (ProbeResult, recorte da face do probe ou None)
+    """
+    if settings.FACE_PRESENCE_ENABLED and not frame.has_face:
+        return ProbeResult(False, None, None), None
+    
+    # Sem colaboradores não há com o que comparar; evita a inferência
+    if len(face_gallery) == 0:
+        return ProbeResult(True, None, None), None
+    
+    try:
+        if not frame.faces:
+            return ProbeResult(True, None, None), None
+        
+        liveness_result = None
+        if settings.LIVENESS_ENABLED:
+            with frame.timed("liveness"):
+                liveness_result = LivenessDetectionService.check_liveness_frame(
+                    frame.face_frame if settings.LIVENESS_ON_FACE_CROP else frame,
+                    liveness_threshold
+                )
+            if not liveness_result["is_live"]:
+                return ProbeResult(True, liveness_result, None), None
+        
+        return ProbeResult(True, liveness_result, None), frame.face_crop
+    
+    except Exception as e:
+        print(f"Erro ao processar face: {str(e)}")
+        return ProbeResult(True, None, None), None
+
+
+def _prepare_probe(frame: FrameContext, model_name: str) -> Optional[np.ndarray]:
+    """Recorte da face do probe para outro modelo (pool de inferência)"""
+    if not frame.faces:
+        return None
+    return FaceRecognitionService.prepare_face(frame.faces[0]["face"], model_name)
+
+
+async def _search_probe(
+    frame: FrameContext,
+    probe_face: Optional[np.ndarray],
+    probe_embedding: Optional[np.ndarray] = None
+):
+    """
+    Embedding do probe (em lote com requisições simultâneas) e busca na galeria
+    
+    Se o modelo ativo foi trocado entre o recorte e a busca, a galeria já
+    está no modelo novo: o recorte é refeito para ele e a busca repetida.
+    
+    Args:
+        frame: Frame do upload
+        probe_face: Recorte da face do probe
+        probe_embedding: Embedding já calculado (cache de probes); dispensa o recorte
+    
+    Returns:
+        (lista de (employee_id, similaridade), embedding do probe, modelo do embedding)
+    """
+    model_name = frame.model_name
+    for attempt in range(2):
+        if probe_embedding is None:
+            with frame.timed("embed"):
+                probe_embedding = await embedding_batcher.embed(probe_face, model_name)
+        try:
+            with frame.timed("search"):
+                return face_gallery.search(probe_embedding, k=1, model_name=model_name), probe_embedding, model_name
+        except GalleryModelMismatch:
+            if attempt:
+                raise
+            model_name = face_gallery.model_name
+            probe_embedding = None
+            probe_face = await inference_executor.run(_prepare_probe, frame, model_name)
+            if probe_face is None:
+                return [], None, model_name
+
+
+def _analyze_burst(contents: List[bytes], liveness_threshold: Optional[float] = None):
+    """
+    Liveness de uma rajada, executado no pool de inferência
+    
+    A face é detectada apenas no frame central; todos os frames são
+    recortados na mesma região e analisados juntos.
+    """
+    frames = [FrameContext.from_bytes(content) for content in contents]
+    
+    if any(frame.bgr is None for frame in frames):
+        return {"is_live": False, "confidence": 0.0, "reason": "Imagem inválida ou corrompida"}
+    
+    if len({frame.bgr.shape for frame in frames}) > 1:
+        return {"is_live": False, "confidence": 0.0, "reason": "Os frames da rajada têm tamanhos diferentes"}
+    
+    reference = frames[len(frames) // 2]
+    if not reference.face_boxes:
+        return {"is_live": False, "confidence": 0.0, "reason": "Nenhuma face detectada"}
+    
+    box = reference.face_boxes[0]
+    crops = [frame.crop(box, settings.LIVENESS_CROP_SIZE) for frame in frames]
+    if any(crop is None for crop in crops):
+        return {"is_live": False, "confidence": 0.0, "reason": "Face fora da área da imagem"}
+    
+    return LivenessDetectionService.check_liveness_burst(np.stack(crops), liveness_threshold)
+
+
+def _get_device(device_id: Optional[str]) -> DeviceConfig:
+    """Configuração do dispositivo (cache em memória); 403 se desativado"""
+    device = device_registry.get(device_id)
+    if not device.is_active:
+        raise HTTPException(
+            status_code=403,
+            detail="Dispositivo desativado"
+        )
+    return device
+
+
+_presence_rejected_total = metrics.counter(
+    "recognition_presence_rejected_total",
+    "Requisições de /recognize recusadas pelo filtro de presença (inclui reenvios do cache)"
+)
+
+
+def _find_employee(db: Session, employee_id: int):
+    return db.query(
+        Employee.id,
+        Employee.full_name,
+        Employee.department,
+        Employee.position
+    ).filter(Employee.id == employee_id).first()
+
+
 @router.post("/recognize")
 async def recognize_face(
     image: UploadFile = File(...),
     device_id: Optional[str] = Form(None),
-    background_tasks: BackgroundTasks = None,
     db: Session = Depends(get_db)
 ):
     """
     Endpoint principal de reconhecimento facial
     Usado pelo app mobile para validar acesso
+    
+    O device_id define a porta aberta e os thresholds (cadastro de
+    dispositivos em memória); sem cadastro valem o controlador e os
+    thresholds globais.
     """
     
-    temp_image_path = f"/tmp/{uuid.uuid4()}.jpg"
+    frame = None
+    device = _get_device(device_id)
+    tolerance = device.recognition_tolerance
     
     try:
-        # Salva arquivo enviado
-        with open(temp_image_path, "wb") as buffer:
-            content = await image.read()
-            buffer.write(content)
+        content = await read_upload(image)
+        frame = FrameContext.from_bytes(content)
         
-        # 1. LIVENESS DETECTION
-        liveness_result = None
-        if settings.LIVENESS_ENABLED:
-            liveness_result = LivenessDetectionService.check_liveness(temp_image_path)
-            
-            if not liveness_result["is_live"]:
-                # Registra tentativa falha
-                log = AccessLog(
-                    employee_id=None,
-                    access_granted=False,
-                    liveness_passed=False,
-                    denial_reason=f"Liveness check failed: {liveness_result['reason']}",
-                    device_id=device_id,
-                    attempted_at=datetime.utcnow()
+        # 1. REENVIO DO MESMO UPLOAD: ANÁLISE DO CACHE, DIRETO PARA A GALERIA
+        cache_keys = []
+        result = None
+        probe_face = None
+        if probe_cache.enabled:
+            cache_keys.append(probe_cache.key(content, frame.model_name, device.liveness_threshold))
+            result = await probe_cache.lookup(cache_keys[0])
+        cached = result is not None
+        
+        # 2. DETECÇÃO DA FACE + LIVENESS, FORA DO EVENT LOOP
+        if not cached:
+            try:
+                result, probe_face = await inference_executor.run(
+                    _analyze_probe,
+                    frame,
+                    device.liveness_threshold
                 )
-                db.add(log)
-                db.commit()
-                
-                return {
-                    "success": False,
-                    "access_granted": False,
-                    "message": "Falha na detecção de vivacidade. Use uma câmera ao vivo.",
-                    "liveness_details": liveness_result
-                }
+            except InferenceQueueFull:
+                raise HTTPException(
+                    status_code=503,
+                    detail="Servidor ocupado, tente novamente",
+                    headers={"Retry-After": "1"}
+                )
+        
+        face_present, liveness_result = result.face_present, result.liveness_result
         
-        # 2. BUSCA COLABORADORES ATIVOS
-        employees = db.query(Employee).filter(Employee.is_active == True).all()
+        # Frame vazio (captura automática sem ninguém na frente): sem log de acesso
+        # nem rollups, só a métrica
+        if not face_present:
+            # bgr já foi decodificado no pool; aqui só consulta o cache
+            if not cached and frame.bgr is None:
+                raise HTTPException(
+                    status_code=400,
+                    detail="Imagem inválida ou corrompida"
+                )
+            if not cached and cache_keys:
+                probe_cache.store(cache_keys, result)
+            
+            _presence_rejected_total.inc()
+            
+            return {
+                "success": False,
+                "access_granted": False,
+                "face_detected": False,
+                "message": "Nenhuma face detectada. Posicione o rosto na câmera.",
+                "timestamp": datetime.now().isoformat()
+            }
+        
+        if liveness_result is not None and not liveness_result["is_live"]:
+            # Erros da análise (sem scores) não vão para o cache
+            if not cached and cache_keys and "scores" in liveness_result:
+                probe_cache.store(cache_keys, result)
+            
+            # Registra tentativa falha (gravação em lote, sem bloquear a resposta)
+            access_log_writer.write(
+                employee_id=None,
+                access_granted=False,
+                liveness_passed=False,
+                denial_reason=f"Liveness check failed: {liveness_result['reason']}",
+                device_id=device_id,
+                device_location=device.location
+            )
+            
+            return {
+                "success": False,
+                "access_granted": False,
+                "message": "Falha na detecção de vivacidade. Use uma câmera ao vivo.",
+                "liveness_details": liveness_result
+            }
         
-        if not employees:
+        # 3. VERIFICA GALERIA DE COLABORADORES ATIVOS
+        if len(face_gallery) == 0:
             raise HTTPException(
                 status_code=404,
                 detail="Nenhum colaborador cadastrado no sistema"
             )
         
-        # 3. COMPARA COM CADA COLABORADOR
+        # 4. EMBEDDING DO PROBE (EM LOTE COM REQUISIÇÕES SIMULTÂNEAS) E BUSCA NA GALERIA
         best_match = None
         best_confidence = 0.0
         
-        for employee in employees:
-            try:
-                match, confidence = FaceRecognitionService.compare_faces(
-                    employee.face_encoding,
-                    temp_image_path
-                )
-                
-                if match and confidence > best_confidence:
-                    best_match = employee
-                    best_confidence = confidence
-            except Exception as e:
-                print(f"Erro ao comparar com colaborador {employee.id}: {str(e)}")
-                continue
+        if probe_face is not None or result.embedding is not None:
+            candidates, probe_embedding, model_name = await _search_probe(frame, probe_face, result.embedding)
+            
+            # Guarda só embeddings do modelo da chave (não os refeitos numa troca de modelo)
+            if not cached and cache_keys and probe_embedding is not None and model_name == frame.model_name:
+                probe_cache.store(cache_keys, ProbeResult(True, liveness_result, probe_embedding))
+            
+            if candidates and candidates[0][1] >= tolerance:
+                employee_id, best_confidence = candidates[0]
+                best_match = await run_in_threadpool(_find_employee, db, employee_id)
         
-        # 4. PROCESSA RESULTADO
-        if best_match and best_confidence >= settings.FACE_RECOGNITION_TOLERANCE:
+        # 5. PROCESSA RESULTADO
+        if best_match and best_confidence >= tolerance:
             # ACESSO CONCEDIDO
-            access_log = AccessLog(
+            access_log_writer.write(
                 employee_id=best_match.id,
                 access_granted=True,
                 confidence_score=best_confidence,
                 liveness_passed=liveness_result.get("is_live") if liveness_result else None,
                 device_id=device_id,
-                attempted_at=datetime.utcnow()
+                device_location=device.location
             )
-            db.add(access_log)
-            db.commit()
-            
-            # Abre porta em background
-            def open_door_task():
-                try:
-                    door_service = DoorControlService()
-                    door_service.open_door(1)
-                except Exception as e:
-                    print(f"Erro ao abrir porta: {str(e)}")
             
-            if background_tasks:
-                background_tasks.add_task(open_door_task)
+            # Abre a porta do dispositivo em background; aberturas repetidas
+            # da mesma porta dentro de DOOR_OPEN_DURATION viram um único comando
+            door_dispatcher.request_open(device)
             
             # Saudação baseada na hora
             hour = datetime.now().hour
@@ -139,17 +326,15 @@ async def recognize_face(
             }
         else:
             # ACESSO NEGADO
-            access_log = AccessLog(
+            access_log_writer.write(
                 employee_id=None,
                 access_granted=False,
                 confidence_score=best_confidence if best_match else 0.0,
                 liveness_passed=liveness_result.get("is_live") if liveness_result else None,
                 denial_reason="Face não reconhecida ou confiança insuficiente",
                 device_id=device_id,
-                attempted_at=datetime.utcnow()
+                device_location=device.location
             )
-            db.add(access_log)
-            db.commit()
             
             return {
                 "success": False,
@@ -159,6 +344,8 @@ async def recognize_face(
                 "timestamp": datetime.now().isoformat()
             }
     
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Erro no reconhecimento facial: {str(e)}")
         raise HTTPException(
@@ -166,9 +353,52 @@ async def recognize_face(
             detail=f"Erro ao processar reconhecimento: {str(e)}"
         )
     finally:
-        # Limpa arquivo temporário
-        if os.path.exists(temp_image_path):
-            try:
-                os.remove(temp_image_path)
-            except:
-                pass
+        # Tempo por etapa (decode, liveness, detect, embed, ...) em /metrics
+        if frame is not None:
+            frame.record_metrics()
+
+
+@router.post("/liveness/burst")
+async def check_liveness_burst(
+    frames: List[UploadFile] = File(...),
+    device_id: Optional[str] = Form(None)
+):
+    """
+    Liveness a partir de uma rajada curta de frames (2 a LIVENESS_BURST_MAX_FRAMES)
+    Usa, além das métricas por frame, o movimento entre frames
+    
+    Desligado por padrão (LIVENESS_BURST_ENABLED): as faixas de pontuação
+    e o limite de Moiré ainda não foram calibrados para recortes da face.
+    """
+    if not settings.LIVENESS_BURST_ENABLED:
+        raise HTTPException(
+            status_code=404,
+            detail="Liveness por rajada desabilitado"
+        )
+    
+    if not 2 <= len(frames) <= settings.LIVENESS_BURST_MAX_FRAMES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Envie entre 2 e {settings.LIVENESS_BURST_MAX_FRAMES} frames"
+        )
+    
+    contents = [await read_upload(frame) for frame in frames]
+    
+    try:
+        result = await inference_executor.run(
+            _analyze_burst,
+            contents,
+            _get_device(device_id).liveness_threshold
+        )
+    except InferenceQueueFull:
+        raise HTTPException(
+            status_code=503,
+            detail="Servidor ocupado, tente novamente",
+            headers={"Retry-After": "1"}
+        )
+    
+    return {
+        "success": True,
+        "is_live": result["is_live"],
+        "liveness_details": result
+    }
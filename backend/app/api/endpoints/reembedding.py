@@ -0,0 +1,82 @@
+"""
+Endpoints para troca do modelo de reconhecimento (re-embedding)
+"""
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
+from typing import List
+
+from app.database import get_db, SessionLocal
+from app.schemas.reembedding import ReembeddingJobCreate, ReembeddingJobResponse, ActiveModelResponse
+from app.models.reembedding import ReembeddingJob
+from app.api.deps import get_current_user, get_current_active_superuser
+from app.models.user import User
+from app.services.face_gallery import face_gallery
+from app.services.reembedding import ReembeddingService, job_lock
+
+router = APIRouter()
+
+@router.get("/active", response_model=ActiveModelResponse)
+def get_active_model(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Modelo ativo no banco e modelo da galeria deste worker
+    (diferem apenas durante uma troca)
+    """
+    model_name, detector_backend = ReembeddingService.active_model(db)
+    return {
+        "model_name": model_name,
+        "detector_backend": detector_backend,
+        "gallery_model": face_gallery.model_name,
+        "gallery_size": len(face_gallery)
+    }
+
+@router.get("/jobs", response_model=List[ReembeddingJobResponse])
+def list_jobs(
+    skip: int = 0,
+    limit: int = 20,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Lista os jobs de re-embedding, do mais recente ao mais antigo
+    """
+    return db.query(ReembeddingJob).order_by(ReembeddingJob.id.desc()).offset(skip).limit(limit).all()
+
+@router.post("/jobs", response_model=ReembeddingJobResponse, status_code=status.HTTP_202_ACCEPTED)
+def start_job(
+    job_in: ReembeddingJobCreate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_superuser)
+):
+    """
+    Inicia o re-embedding para um novo modelo/detector, ou retoma o job
+    interrompido para o mesmo par, em background
+    
+    Ao terminar, o modelo novo é ativado em todos os workers. O progresso
+    é acompanhado por GET /jobs.
+    """
+    if job_lock.locked():
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Já existe um re-embedding em andamento"
+        )
+    
+    detector_backend = job_in.detector_backend or ReembeddingService.active_model(db)[1]
+    try:
+        job = ReembeddingService.start(db, job_in.model_name, detector_backend)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    if not ReembeddingService.run_in_background(SessionLocal, job.id):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Já existe um re-embedding em andamento"
+        )
+    
+    return job
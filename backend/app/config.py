@@ -31,24 +31,91 @@ class Settings(BaseSettings):
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 7  # 7 dias
     
     # Face Recognition
+    FACE_RECOGNITION_MODEL: str = "Facenet"  # modelo inicial; trocas são feitas pelo job de re-embedding
+    FACE_DETECTOR_BACKEND: str = "opencv"  # opencv, ssd, dlib, mtcnn, retinaface...
     FACE_RECOGNITION_TOLERANCE: float = 0.6
     FACE_DETECTION_MODEL: str = "hog"
     MIN_FACE_SIZE: int = 100
+    FACE_PRESENCE_ENABLED: bool = True  # descarta frames sem face antes do pipeline completo
+    FACE_PRESENCE_MAX_SIDE: int = 320  # lado do frame reduzido analisado pelo filtro
+    FACE_PRESENCE_MIN_FACE_RATIO: float = 0.1  # menor face aceita, em fração do menor lado
+    FACE_PRESENCE_BUDGET_MS: float = 10.0  # verificações mais lentas são contadas em /metrics
+    
+    # Face Gallery (embeddings em memória)
+    GALLERY_COMPACTION_RATIO: float = 0.2  # compacta quando tombstones > 20% das linhas
+    GALLERY_COMPACTION_MIN_TOMBSTONES: int = 64
+    GALLERY_SYNC_BACKEND: str = "redis"  # redis, memory ou none
+    GALLERY_SYNC_CHANNEL: str = "facial:gallery"
+    GALLERY_ANN_ENABLED: bool = False
+    GALLERY_ANN_MIN_SIZE: int = 20000  # abaixo disso a busca é exata
+    GALLERY_ANN_NLIST: int = 0  # partições IVF (0 = ~sqrt(n))
+    GALLERY_ANN_NPROBE: int = 8  # partições visitadas por busca (recall x latência)
+    GALLERY_TEMPLATE_AGGREGATION: str = "max"  # max ou mean (centróide) entre os templates do colaborador
+    FACE_TEMPLATES_MAX_UPLOAD: int = 10  # fotos por requisição de cadastro de templates
+    FACE_TEMPLATES_MAX_PER_EMPLOYEE: int = 20  # templates adicionais por colaborador
+    
+    # Modelos
+    MODEL_WARMUP_ATTRIBUTES: bool = False  # também carrega Age/Gender/Emotion no startup
+    INFERENCE_WORKERS: int = 2  # threads de inferência por worker da API
+    INFERENCE_QUEUE_SIZE: int = 8  # requisições aguardando além das em execução; acima disso, 503
+    EMBEDDING_BATCH_MAX_SIZE: int = 16  # recortes por forward pass
+    EMBEDDING_BATCH_MAX_WAIT_MS: float = 5.0  # janela para juntar requisições simultâneas
+    
+    # Importação em lote de colaboradores
+    BULK_IMPORT_WORKERS: int = 0  # processos de detecção/embedding (0 = núcleos da máquina)
+    BULK_IMPORT_CHUNK_SIZE: int = 8  # fotos por tarefa (um forward pass por tarefa)
+    BULK_IMPORT_BATCH_SIZE: int = 100  # colaboradores por INSERT/commit
+    BULK_IMPORT_MAX_UPLOAD_MB: int = 500  # tamanho máximo do zip de fotos no endpoint
+    
+    # Cache de resultados de probe (reenvios do mesmo upload)
+    PROBE_CACHE_ENABLED: bool = True
+    PROBE_CACHE_MAX_ENTRIES: int = 1024  # entradas em memória por worker (LRU)
+    PROBE_CACHE_TTL_SECONDS: float = 30.0  # retries do quiosque chegam em poucos segundos
+    PROBE_CACHE_SHARED: bool = False  # segundo nível no Redis (REDIS_HOST/REDIS_PORT) entre os workers
+    
+    # Re-embedding (troca de modelo/detector)
+    REEMBEDDING_WORKERS: int = 0  # processos do job (0 = núcleos da máquina)
+    REEMBEDDING_BATCH_SIZE: int = 200  # colaboradores por checkpoint
     
     # Liveness Detection
     LIVENESS_ENABLED: bool = True
     LIVENESS_THRESHOLD: float = 0.7
+    LIVENESS_ON_FACE_CROP: bool = False  # liveness no recorte da face; os thresholds foram calibrados no frame completo, só ligar após recalibrar
+    LIVENESS_CROP_SIZE: int = 224  # lado (px) do recorte da face analisado pelo liveness
+    LIVENESS_CASCADE_ORDER: List[str] = ["brightness", "contrast", "laplacian", "histogram", "moire"]
+    LIVENESS_FFT_MAX_SIDE: int = 256  # a FFT do teste de Moiré roda na imagem reduzida a este lado
+    LIVENESS_MOIRE_MAX_PEAKS: int = 3  # picos de alta frequência tolerados antes de considerar Moiré
+    LIVENESS_MOIRE_PENALTY: float = 0.3
+    LIVENESS_BURST_ENABLED: bool = False  # /liveness/burst aplica aos recortes da face as faixas calibradas no frame completo; só ligar após recalibrar
+    LIVENESS_BURST_MAX_FRAMES: int = 10
+    LIVENESS_BURST_MIN_MOTION: float = 0.5  # diferença média de cinza entre frames; abaixo disso, imagem estática
     
     # Door Control
     DOOR_CONTROLLER_BASE_URL: str = "http://187.50.63.194:8080"
     DOOR_CONTROLLER_USERNAME: str = "abc"
     DOOR_CONTROLLER_PASSWORD: str = "123"
     DOOR_OPEN_DURATION: int = 5  # segundos
+    DOOR_CONNECT_TIMEOUT: float = 1.0  # segundos
+    DOOR_REQUEST_TIMEOUT: float = 2.0  # segundos
+    DOOR_MAX_CONNECTIONS: int = 4  # conexões keep-alive com o controlador
+    DOOR_RETRY_ATTEMPTS: int = 3
+    DOOR_RETRY_BACKOFF_SECONDS: float = 0.2  # dobra a cada tentativa
+    DOOR_RETRY_MAX_BACKOFF_SECONDS: float = 2.0
+    DOOR_BREAKER_FAILURES: int = 5  # falhas consecutivas até abrir o circuito
+    DOOR_BREAKER_RESET_SECONDS: float = 30.0  # tempo com o circuito aberto antes de testar de novo
+    DEVICE_SYNC_CHANNEL: str = "facial:devices"  # alterações do cadastro de dispositivos entre workers
+    
+    # Access Logs
+    ACCESS_LOG_BATCH_MAX_SIZE: int = 200  # registros por INSERT
+    ACCESS_LOG_FLUSH_INTERVAL_MS: float = 200.0  # janela para juntar registros antes de gravar
+    ACCESS_LOG_MAX_PENDING: int = 10000  # acima disso novos registros são descartados
+    ACCESS_LOG_SHUTDOWN_TIMEOUT: float = 10.0  # segundos para gravar os pendentes no encerramento
     
     # Storage
     UPLOAD_DIR: str = "uploads"
     FACES_DIR: str = "uploads/faces"
     MAX_FILE_SIZE: int = 10 * 1024 * 1024  # 10MB
+    MAX_IMAGE_SIDE: int = 1280  # maior lado (px) após a decodificação; imagens maiores são reduzidas
     
     # CORS - Aceita tanto lista quanto string JSON
     BACKEND_CORS_ORIGINS: Union[List[str], str] = ["http://localhost:3000", "http://localhost:19006"]
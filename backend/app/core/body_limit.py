@@ -0,0 +1,81 @@
+"""
+Limite de tamanho do corpo das requisições
+Recusa uploads grandes antes de o parser multipart gravá-los: pelo
+Content-Length, quando informado, ou contando os bytes recebidos
+"""
+
+import re
+from typing import Sequence, Tuple
+
+from fastapi import HTTPException, status
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+
+class BodySizeLimitMiddleware:
+    """
+    Middleware ASGI com um limite padrão e limites por rota
+    
+    O parser multipart do FastAPI lê o corpo inteiro (em disco, acima de
+    1MB) antes de o endpoint rodar, então o limite de read_upload sozinho
+    só vale depois de o upload já ter sido recebido. Aqui a requisição é
+    recusada (413) pelo Content-Length ou, em uploads chunked, assim que o
+    corpo recebido passa do limite. Os limites por arquivo continuam em
+    read_upload; MULTIPART_OVERHEAD cobre boundaries e campos de formulário.
+    """
+    
+    MULTIPART_OVERHEAD = 64 * 1024
+    
+    def __init__(self, app: ASGIApp, max_bytes: int, overrides: Sequence[Tuple[str, int]] = ()):
+        """
+        Args:
+            app: Aplicação ASGI
+            max_bytes: Limite padrão dos arquivos de uma requisição
+            overrides: (regex do path, limite) para rotas com uploads maiores
+        """
+        self.app = app
+        self.max_bytes = max_bytes
+        self.overrides = [(re.compile(pattern), limit) for pattern, limit in overrides]
+    
+    def _limit(self, path: str) -> int:
+        for pattern, limit in self.overrides:
+            if pattern.fullmatch(path.rstrip("/")):
+                return limit + self.MULTIPART_OVERHEAD
+        return self.max_bytes + self.MULTIPART_OVERHEAD
+    
+    @staticmethod
+    def _detail(max_bytes: int) -> str:
+        return f"Requisição muito grande. Tamanho máximo: {max_bytes // (1024 * 1024)}MB"
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        max_bytes = self._limit(scope["path"])
+        content_length = Headers(scope=scope).get("content-length", "")
+        if content_length.isdigit() and int(content_length) > max_bytes:
+            response = JSONResponse(
+                {"detail": self._detail(max_bytes)},
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+            )
+            await response(scope, receive, send)
+            return
+        
+        received = 0
+        
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_bytes:
+                    # Tratada pelo ExceptionMiddleware como qualquer HTTPException
+                    raise HTTPException(
+                        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                        detail=self._detail(max_bytes)
+                    )
+            return message
+        
+        await self.app(scope, limited_receive, send)
@@ -0,0 +1,146 @@
+"""
+Métricas em memória do processo
+Contadores, gauges e histogramas simples expostos em /metrics (por worker)
+"""
+
+import threading
+from collections import deque
+from typing import Dict
+
+import numpy as np
+
+
+class Counter:
+    """Contador monotônico"""
+    
+    def __init__(self, description: str = ""):
+        self.description = description
+        self._value = 0
+        self._lock = threading.Lock()
+    
+    def inc(self, amount: int = 1):
+        with self._lock:
+            self._value += amount
+    
+    @property
+    def value(self) -> int:
+        return self._value
+    
+    def snapshot(self):
+        return self._value
+
+
+class Gauge:
+    """Valor instantâneo (profundidade de fila, tempo até ficar pronto, etc)"""
+    
+    def __init__(self, description: str = ""):
+        self.description = description
+        self._value = 0.0
+        self._lock = threading.Lock()
+    
+    def set(self, value: float):
+        with self._lock:
+            self._value = value
+    
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self._value += amount
+    
+    def dec(self, amount: float = 1):
+        with self._lock:
+            self._value -= amount
+    
+    @property
+    def value(self) -> float:
+        return self._value
+    
+    def snapshot(self):
+        return self._value
+
+
+class Histogram:
+    """
+    Distribuição de observações (latências em ms, tamanhos de lote, etc)
+    
+    Mantém contagem e soma totais e as últimas observações para os
+    percentis.
+    """
+    
+    WINDOW = 1024
+    
+    def __init__(self, description: str = ""):
+        self.description = description
+        self._count = 0
+        self._sum = 0.0
+        self._max = 0.0
+        self._recent = deque(maxlen=self.WINDOW)
+        self._lock = threading.Lock()
+    
+    def observe(self, value: float):
+        with self._lock:
+            self._count += 1
+            self._sum += value
+            self._max = max(self._max, value)
+            self._recent.append(value)
+    
+    @property
+    def count(self) -> int:
+        return self._count
+    
+    @property
+    def sum(self) -> float:
+        return self._sum
+    
+    def snapshot(self):
+        with self._lock:
+            recent = np.fromiter(self._recent, dtype=np.float64)
+            count, total, maximum = self._count, self._sum, self._max
+        
+        if count == 0:
+            return {"count": 0}
+        
+        p50, p95, p99 = np.percentile(recent, [50, 95, 99])
+        return {
+            "count": count,
+            "mean": round(total / count, 3),
+            "max": round(maximum, 3),
+            "p50": round(float(p50), 3),
+            "p95": round(float(p95), 3),
+            "p99": round(float(p99), 3)
+        }
+
+
+class MetricsRegistry:
+    """Registro de métricas nomeadas do processo"""
+    
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+    
+    def _get_or_create(self, name: str, cls, description: str):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = cls(description)
+                self._metrics[name] = metric
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Métrica {name} já registrada com outro tipo")
+            return metric
+    
+    def counter(self, name: str, description: str = "") -> Counter:
+        return self._get_or_create(name, Counter, description)
+    
+    def gauge(self, name: str, description: str = "") -> Gauge:
+        return self._get_or_create(name, Gauge, description)
+    
+    def histogram(self, name: str, description: str = "") -> Histogram:
+        return self._get_or_create(name, Histogram, description)
+    
+    def snapshot(self) -> Dict[str, object]:
+        with self._lock:
+            metrics = dict(self._metrics)
+        return {name: metric.snapshot() for name, metric in sorted(metrics.items())}
+
+
+# Instância única por processo
+metrics = MetricsRegistry()
@@ -3,19 +3,48 @@ Aplicação principal FastAPI
 """
 
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from contextlib import asynccontextmanager
 import os
 
 from app.config import settings
-from app.database import engine, Base
-from app.api.endpoints import auth, employees, recognition, access_logs
+from app.database import engine, Base, SessionLocal
+from app.api.endpoints import auth, employees, recognition, access_logs, devices, reembedding
+from app.services.face_gallery import face_gallery
+from app.services.gallery_sync import gallery_sync, create_change_feed
+from app.services.model_registry import model_registry
+from app.services.reembedding import ReembeddingService
+from app.services.inference_executor import inference_executor
+from app.services.embedding_batcher import embedding_batcher
+from app.services.door_command_queue import door_dispatcher
+from app.services.device_registry import device_registry
+from app.services.access_log_writer import access_log_writer
+from app.services.probe_cache import probe_cache, create_shared_tier
+from app.core.body_limit import BodySizeLimitMiddleware
+from app.core.metrics import metrics
 
 # Cria diretórios necessários
 os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
 os.makedirs(settings.FACES_DIR, exist_ok=True)
 
+def reload_gallery() -> int:
+    """Recarrega a galeria de faces a partir do banco, com o modelo ativo"""
+    db = SessionLocal()
+    try:
+        return ReembeddingService.load_gallery(db)
+    finally:
+        db.close()
+
+def reload_devices() -> int:
+    """Recarrega o cadastro de dispositivos a partir do banco"""
+    db = SessionLocal()
+    try:
+        return device_registry.load(db)
+    finally:
+        db.close()
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """
@@ -28,10 +57,43 @@ async def lifespan(app: FastAPI):
     Base.metadata.create_all(bind=engine)
     print("✅ Tabelas do banco de dados criadas/verificadas")
     
+    # Sincronização da galeria entre workers (inscreve antes da carga para
+    # não perder alterações feitas durante o startup)
+    gallery_sync.start(
+        create_change_feed(),
+        on_reconnect=reload_gallery,
+        on_model_change=reload_gallery
+    )
+    if gallery_sync.enabled:
+        print(f"✅ Sincronização da galeria ativa ({settings.GALLERY_SYNC_BACKEND})")
+    
+    # Carrega embeddings dos colaboradores ativos em memória
+    total = reload_gallery()
+    print(f"✅ Galeria facial carregada: {total} colaboradores")
+    
+    # Cadastro de dispositivos em memória (device_id -> controlador/porta/thresholds)
+    device_registry.start(create_change_feed(settings.DEVICE_SYNC_CHANNEL), on_reconnect=reload_devices)
+    total = reload_devices()
+    print(f"✅ Dispositivos carregados: {total}")
+    
+    # Cache de resultados de probe (retries do quiosque); Redis opcional entre workers
+    probe_cache.start(create_shared_tier())
+    
+    # Carrega e aquece os modelos em background; /ready responde 503 até terminar
+    model_registry.start_warm_up()
+    
     yield
     
     # Shutdown
     print("👋 Encerrando aplicação...")
+    gallery_sync.stop()
+    device_registry.stop()
+    inference_executor.shutdown()
+    embedding_batcher.stop()
+    probe_cache.stop()
+    await door_dispatcher.stop()
+    # Grava os logs de acesso ainda no buffer antes de encerrar
+    access_log_writer.stop()
 
 # Cria aplicação FastAPI
 app = FastAPI(
@@ -43,6 +105,26 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# Uploads acima do limite são recusados antes do parser multipart
+app.add_middleware(
+    BodySizeLimitMiddleware,
+    max_bytes=settings.MAX_FILE_SIZE,
+    overrides=[
+        (
+            rf"{settings.API_V1_STR}/employees/import",
+            settings.BULK_IMPORT_MAX_UPLOAD_MB * 1024 * 1024 + settings.MAX_FILE_SIZE
+        ),
+        (
+            rf"{settings.API_V1_STR}/employees/\d+/templates",
+            settings.FACE_TEMPLATES_MAX_UPLOAD * settings.MAX_FILE_SIZE
+        ),
+        (
+            rf"{settings.API_V1_STR}/recognition/liveness/burst",
+            settings.LIVENESS_BURST_MAX_FRAMES * settings.MAX_FILE_SIZE
+        ),
+    ]
+)
+
 # Configuração CORS
 app.add_middleware(
     CORSMiddleware,
@@ -81,6 +163,18 @@ app.include_router(
     tags=["Logs de Acesso"]
 )
 
+app.include_router(
+    devices.router,
+    prefix=f"{settings.API_V1_STR}/devices",
+    tags=["Dispositivos"]
+)
+
+app.include_router(
+    reembedding.router,
+    prefix=f"{settings.API_V1_STR}/models",
+    tags=["Modelos"]
+)
+
 # Rotas raiz
 @app.get("/")
 def root():
@@ -91,7 +185,8 @@ def root():
         "message": "HDT Energy - Sistema de Reconhecimento Facial",
         "version": settings.VERSION,
         "docs": "/docs",
-        "health": "/health"
+        "health": "/health",
+        "ready": "/ready"
     }
 
 @app.get("/health")
@@ -101,5 +196,41 @@ def health_check():
     """
     return {
         "status": "ok",
-        "version": settings.VERSION
+        "version": settings.VERSION,
+        "models_ready": model_registry.is_ready,
+        "gallery": {
+            "version": face_gallery.version,
+            "size": len(face_gallery),
+            "model": face_gallery.model_name,
+            "sync_enabled": gallery_sync.enabled,
+            "sync_applied": gallery_sync.applied
+        }
     }
+
+@app.get("/ready")
+def readiness_check():
+    """
+    Readiness: só responde 200 depois do warm-up dos modelos
+    """
+    if not model_registry.is_ready:
+        return JSONResponse(
+            status_code=503,
+            content={
+                "status": "warming_up" if model_registry.error is None else "error",
+                "error": model_registry.error
+            }
+        )
+    
+    return {
+        "status": "ready",
+        "model": model_registry.model_name,
+        "detector": model_registry.detector_backend,
+        "time_to_ready_seconds": round(model_registry.time_to_ready, 3)
+    }
+
+@app.get("/metrics")
+def get_metrics():
+    """
+    Métricas internas deste worker
+    """
+    return metrics.snapshot()
@@ -1,5 +1,11 @@
 from app.models.user import User
-from app.models.employee import Employee, AccessLog
+from app.models.employee import Employee, AccessLog, FaceTemplate
+from app.models.device import Device
+from app.models.access_stats import AccessStatsHourly, AccessStatsDaily
+from app.models.reembedding import FaceEmbedding, ReembeddingJob
 
-__all__ = ["User", "Employee", "AccessLog"]
+__all__ = [
+    "User", "Employee", "AccessLog", "FaceTemplate", "Device", "AccessStatsHourly", "AccessStatsDaily",
+    "FaceEmbedding", "ReembeddingJob"
+]
 
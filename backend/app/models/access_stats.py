@@ -0,0 +1,30 @@
+from sqlalchemy import Column, Integer, String, DateTime, UniqueConstraint
+from app.database import Base
+
+class AccessStatsMixin:
+    """
+    Contagem de tentativas de acesso por período, dispositivo e colaborador
+    Mantida incrementalmente na gravação dos logs (app.services.access_stats)
+    """
+    
+    id = Column(Integer, primary_key=True)
+    bucket_start = Column(DateTime, nullable=False, index=True)
+    device_id = Column(String(100), nullable=False, default="")  # "" = sem device_id
+    employee_id = Column(Integer, nullable=False, default=0)  # 0 = não reconhecido
+    
+    attempts = Column(Integer, nullable=False, default=0)
+    granted = Column(Integer, nullable=False, default=0)
+    denied = Column(Integer, nullable=False, default=0)
+    liveness_failed = Column(Integer, nullable=False, default=0)
+
+class AccessStatsHourly(AccessStatsMixin, Base):
+    __tablename__ = "access_stats_hourly"
+    __table_args__ = (
+        UniqueConstraint("bucket_start", "device_id", "employee_id", name="uq_access_stats_hourly_bucket"),
+    )
+
+class AccessStatsDaily(AccessStatsMixin, Base):
+    __tablename__ = "access_stats_daily"
+    __table_args__ = (
+        UniqueConstraint("bucket_start", "device_id", "employee_id", name="uq_access_stats_daily_bucket"),
+    )
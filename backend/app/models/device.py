@@ -0,0 +1,24 @@
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Float
+from datetime import datetime
+from app.database import Base
+
+class Device(Base):
+    __tablename__ = "devices"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    device_id = Column(String(100), unique=True, nullable=False, index=True)  # enviado pelo app em /recognize
+    name = Column(String(255), nullable=False)
+    location = Column(String(255), nullable=True)
+    
+    # Door Control (vazio = controlador padrão DOOR_CONTROLLER_BASE_URL)
+    controller_url = Column(String(255), nullable=True)
+    door_number = Column(Integer, nullable=False, default=1)
+    
+    # Thresholds por dispositivo (vazio = valor global)
+    recognition_tolerance = Column(Float, nullable=True)
+    liveness_threshold = Column(Float, nullable=True)
+    
+    # Status
+    is_active = Column(Boolean, default=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -15,7 +15,7 @@ class Employee(Base):
     position = Column(String(100), nullable=True)
     
     # Face Recognition Data
-    face_encoding = Column(LargeBinary, nullable=False)  # numpy array serializado
+    face_encoding = Column(LargeBinary, nullable=False)  # embedding float32 (app.utils.embedding_codec)
     face_image_path = Column(String(500), nullable=False)
     face_registered_at = Column(DateTime, default=datetime.utcnow)
     
@@ -26,6 +26,22 @@ class Employee(Base):
     
     # Relationships
     access_logs = relationship("AccessLog", back_populates="employee")
+    face_templates = relationship("FaceTemplate", back_populates="employee", cascade="all, delete-orphan")
+
+class FaceTemplate(Base):
+    """Fotos adicionais do colaborador; a galeria compara o probe com todas"""
+    __tablename__ = "face_templates"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    employee_id = Column(Integer, ForeignKey("employees.id"), nullable=False, index=True)
+    
+    # Face Recognition Data
+    embedding = Column(LargeBinary, nullable=False)  # mesmo formato de Employee.face_encoding
+    image_path = Column(String(500), nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    # Relationships
+    employee = relationship("Employee", back_populates="face_templates")
 
 class AccessLog(Base):
     __tablename__ = "access_logs"
@@ -0,0 +1,46 @@
+from sqlalchemy import Column, Integer, String, DateTime, LargeBinary, Text, ForeignKey, UniqueConstraint
+from datetime import datetime
+from app.database import Base
+
+class FaceEmbedding(Base):
+    """
+    Embeddings por modelo, ao lado dos ativos em employees/face_templates
+    Preenchida pelo job de re-embedding (modelo novo) e, na ativação, com
+    os vetores do modelo anterior
+    """
+    __tablename__ = "face_embeddings"
+    __table_args__ = (
+        UniqueConstraint("model_name", "employee_id", "template_id", name="uq_face_embeddings_source"),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    employee_id = Column(Integer, ForeignKey("employees.id"), nullable=False, index=True)
+    template_id = Column(Integer, nullable=False, default=0)  # 0 = foto do cadastro (employees.face_encoding)
+    model_name = Column(String(50), nullable=False)
+    detector_backend = Column(String(50), nullable=False)
+    embedding = Column(LargeBinary, nullable=False)  # mesmo formato de Employee.face_encoding
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class ReembeddingJob(Base):
+    """
+    Checkpoint do job de re-embedding: o job avança por employees.id e grava
+    last_employee_id na mesma transação dos embeddings de cada lote
+    """
+    __tablename__ = "reembedding_jobs"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    model_name = Column(String(50), nullable=False)
+    detector_backend = Column(String(50), nullable=False)
+    status = Column(String(20), nullable=False, default="running", index=True)  # running, failed, completed, active, superseded
+    
+    last_employee_id = Column(Integer, nullable=False, default=0)
+    total = Column(Integer, nullable=False, default=0)  # colaboradores no início do job
+    processed = Column(Integer, nullable=False, default=0)  # colaboradores
+    failed = Column(Integer, nullable=False, default=0)  # fotos sem face ou ilegíveis
+    reenroll_pending = Column(Integer, nullable=False, default=0)  # colaboradores com foto sem vetor do modelo, após a ativação
+    error = Column(Text, nullable=True)
+    
+    started_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
+    activated_at = Column(DateTime, nullable=True)
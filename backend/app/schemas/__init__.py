@@ -29,7 +29,10 @@ from app.schemas.employee import (
     EmployeeCreate,
     EmployeeUpdate,
     EmployeeResponse,
-    EmployeeListResponse
+    EmployeeListResponse,
+    FaceTemplateResponse,
+    FaceTemplateRejected,
+    FaceTemplateUploadResponse
 )
 
 # Access log schemas
@@ -39,6 +42,21 @@ from app.schemas.access_log import (
     AccessLogResponse
 )
 
+# Device schemas
+from app.schemas.device import (
+    DeviceBase,
+    DeviceCreate,
+    DeviceUpdate,
+    DeviceResponse
+)
+
+# Re-embedding schemas
+from app.schemas.reembedding import (
+    ReembeddingJobCreate,
+    ReembeddingJobResponse,
+    ActiveModelResponse
+)
+
 __all__ = [
     # Auth (principal)
     "Token",
@@ -52,8 +70,20 @@ __all__ = [
     "EmployeeUpdate",
     "EmployeeResponse",
     "EmployeeListResponse",
+    "FaceTemplateResponse",
+    "FaceTemplateRejected",
+    "FaceTemplateUploadResponse",
     # Access Log
     "AccessLogBase",
     "AccessLog",
     "AccessLogResponse",
+    # Device
+    "DeviceBase",
+    "DeviceCreate",
+    "DeviceUpdate",
+    "DeviceResponse",
+    # Re-embedding
+    "ReembeddingJobCreate",
+    "ReembeddingJobResponse",
+    "ActiveModelResponse",
 ]
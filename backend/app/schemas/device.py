@@ -0,0 +1,37 @@
+"""
+Schemas para dispositivos (entradas)
+"""
+
+from pydantic import BaseModel, Field
+from datetime import datetime
+from typing import Optional
+
+class DeviceBase(BaseModel):
+    device_id: str
+    name: str
+    location: Optional[str] = None
+    controller_url: Optional[str] = None
+    door_number: int = Field(1, ge=1)
+    recognition_tolerance: Optional[float] = Field(None, ge=0.0, le=1.0)
+    liveness_threshold: Optional[float] = Field(None, ge=0.0, le=1.0)
+
+class DeviceCreate(DeviceBase):
+    pass
+
+class DeviceUpdate(BaseModel):
+    name: Optional[str] = None
+    location: Optional[str] = None
+    controller_url: Optional[str] = None
+    door_number: Optional[int] = Field(None, ge=1)
+    recognition_tolerance: Optional[float] = Field(None, ge=0.0, le=1.0)
+    liveness_threshold: Optional[float] = Field(None, ge=0.0, le=1.0)
+    is_active: Optional[bool] = None
+
+class DeviceResponse(DeviceBase):
+    id: int
+    is_active: bool
+    created_at: datetime
+    updated_at: datetime
+    
+    class Config:
+        from_attributes = True
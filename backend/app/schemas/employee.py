@@ -4,7 +4,7 @@ Schemas para colaboradores
 
 from pydantic import BaseModel, EmailStr
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
 class EmployeeBase(BaseModel):
     full_name: str
@@ -48,3 +48,21 @@ class EmployeeListResponse(BaseModel):
     
     class Config:
         from_attributes = True
+
+class FaceTemplateResponse(BaseModel):
+    id: int
+    employee_id: int
+    image_path: str
+    created_at: datetime
+    
+    class Config:
+        from_attributes = True
+
+class FaceTemplateRejected(BaseModel):
+    filename: Optional[str]
+    error: str
+
+class FaceTemplateUploadResponse(BaseModel):
+    employee_id: int
+    added: List[FaceTemplateResponse]
+    rejected: List[FaceTemplateRejected]
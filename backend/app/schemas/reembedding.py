@@ -0,0 +1,43 @@
+"""
+Schemas para troca de modelo (re-embedding)
+"""
+
+from pydantic import BaseModel
+from datetime import datetime
+from typing import Optional
+
+class ReembeddingJobCreate(BaseModel):
+    model_name: str
+    detector_backend: Optional[str] = None  # padrão: detector ativo
+    
+    class Config:
+        protected_namespaces = ()
+
+class ReembeddingJobResponse(BaseModel):
+    id: int
+    model_name: str
+    detector_backend: str
+    status: str
+    last_employee_id: int
+    total: int
+    processed: int
+    failed: int
+    reenroll_pending: int
+    error: Optional[str] = None
+    started_at: datetime
+    updated_at: datetime
+    finished_at: Optional[datetime] = None
+    activated_at: Optional[datetime] = None
+    
+    class Config:
+        from_attributes = True
+        protected_namespaces = ()
+
+class ActiveModelResponse(BaseModel):
+    model_name: str
+    detector_backend: str
+    gallery_model: str
+    gallery_size: int
+    
+    class Config:
+        protected_namespaces = ()
@@ -0,0 +1,189 @@
+"""
+Gravação assíncrona e em lote dos logs de acesso
+Os endpoints apenas enfileiram o registro; uma thread grava os registros
+acumulados com um único INSERT de várias linhas, fora do caminho crítico
+da abertura da porta
+"""
+
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.exc import InterfaceError, OperationalError, TimeoutError as PoolTimeoutError
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.core.metrics import metrics
+from app.database import SessionLocal
+from app.models.employee import AccessLog
+from app.services.access_stats import AccessStatsService
+
+
+class AccessLogWriter:
+    """
+    Buffer de logs de acesso consumido por uma thread
+    
+    O primeiro registro que chega abre uma janela de flush_interval_ms; o
+    lote é gravado quando a janela fecha ou quando atinge max_batch_size.
+    Falhas transitórias do banco (conexão, timeout) são repetidas até
+    max_retries vezes antes de o lote ser descartado (e contado em
+    access_log_dropped_total); nas demais (um registro inválido) o lote é
+    gravado linha a linha e só os registros rejeitados são descartados.
+    stop() grava tudo o que ainda estiver pendente antes de retornar.
+    """
+    
+    RETRY_DELAY = 0.5
+    
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        max_batch_size: int,
+        flush_interval_ms: float,
+        max_pending: int,
+        max_retries: int = 3
+    ):
+        self.session_factory = session_factory
+        self.max_batch_size = max(1, max_batch_size)
+        self.flush_interval_ms = flush_interval_ms
+        self.max_retries = max_retries
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_pending)
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+        self._columns = [column.key for column in AccessLog.__table__.columns if column.key != "id"]
+        
+        self._pending = metrics.gauge("access_log_pending", "Registros aguardando gravação")
+        self._batch_size = metrics.histogram("access_log_batch_size", "Registros por INSERT")
+        self._flush_ms = metrics.histogram("access_log_flush_ms", "Duração do INSERT + commit")
+        self._lag_ms = metrics.histogram("access_log_lag_ms", "Tempo entre o registro e o commit")
+        self._written = metrics.counter("access_log_written_total", "Registros gravados")
+        self._dropped = metrics.counter("access_log_dropped_total", "Registros descartados (buffer cheio ou falha no banco)")
+    
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None:
+                self._stopping.clear()
+                self._thread = threading.Thread(target=self._run, name="access-log-writer", daemon=True)
+                self._thread.start()
+    
+    def write(self, **fields):
+        """
+        Enfileira um log de acesso sem bloquear (campos de AccessLog)
+        attempted_at é o momento da chamada, não o da gravação
+        """
+        self._ensure_started()
+        fields.setdefault("attempted_at", datetime.utcnow())
+        row = {column: fields.get(column) for column in self._columns}
+        
+        try:
+            self._queue.put_nowait((time.perf_counter(), row))
+        except queue.Full:
+            self._dropped.inc()
+            print(f"⚠️ Buffer de logs de acesso cheio, registro descartado: {row}")
+            return
+        self._pending.inc()
+    
+    def _collect(self, first) -> list:
+        batch = [first]
+        deadline = time.perf_counter() + self.flush_interval_ms / 1000.0
+        
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        
+        return batch
+    
+    @staticmethod
+    def _transient(error: Exception) -> bool:
+        """Falha do banco/conexão (vale repetir), não dos registros"""
+        return isinstance(error, (OperationalError, InterfaceError, PoolTimeoutError)) or getattr(
+            error, "connection_invalidated", False
+        )
+    
+    def _insert(self, batch: list):
+        rows = [row for _, row in batch]
+        start = time.perf_counter()
+        db = self.session_factory()
+        try:
+            db.execute(insert(AccessLog), rows)
+            # Rollups de estatísticas na mesma transação dos logs
+            AccessStatsService.apply(db, rows)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+        
+        committed_at = time.perf_counter()
+        self._flush_ms.observe((committed_at - start) * 1000)
+        self._batch_size.observe(len(rows))
+        for queued_at, _ in batch:
+            self._lag_ms.observe((committed_at - queued_at) * 1000)
+        self._written.inc(len(rows))
+    
+    def _flush_rows(self, batch: list):
+        """Grava um registro por transação, descartando só os rejeitados"""
+        for entry in batch:
+            try:
+                self._insert([entry])
+            except Exception as e:
+                self._dropped.inc()
+                print(f"❌ Log de acesso descartado: {str(e)} ({entry[1]})")
+    
+    def _flush(self, batch: list):
+        for attempt in range(self.max_retries):
+            try:
+                self._insert(batch)
+                return
+            except Exception as e:
+                if not self._transient(e):
+                    print(f"Erro ao gravar {len(batch)} logs de acesso, gravando um a um: {str(e)}")
+                    self._flush_rows(batch)
+                    return
+                print(f"Erro ao gravar logs de acesso (tentativa {attempt + 1}): {str(e)}")
+                time.sleep(self.RETRY_DELAY * (attempt + 1))
+        
+        self._dropped.inc(len(batch))
+        print(f"❌ {len(batch)} logs de acesso descartados após {self.max_retries} tentativas")
+    
+    def _run(self):
+        while True:
+            try:
+                first = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                # Só encerra com a fila vazia
+                if self._stopping.is_set():
+                    return
+                continue
+            
+            batch = self._collect(first)
+            self._pending.dec(len(batch))
+            self._flush(batch)
+    
+    def stop(self):
+        """Grava os registros pendentes e encerra a thread (shutdown)"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stopping.set()
+            thread.join(timeout=settings.ACCESS_LOG_SHUTDOWN_TIMEOUT)
+            if thread.is_alive():
+                print(f"⚠️ Logs de acesso ainda pendentes no encerramento: {self._queue.qsize()}")
+
+
+# Instância única por processo
+access_log_writer = AccessLogWriter(
+    SessionLocal,
+    settings.ACCESS_LOG_BATCH_MAX_SIZE,
+    settings.ACCESS_LOG_FLUSH_INTERVAL_MS,
+    settings.ACCESS_LOG_MAX_PENDING
+)
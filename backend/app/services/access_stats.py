@@ -0,0 +1,275 @@
+"""
+Estatísticas de acesso pré-agregadas
+Mantém contagens por hora e por dia (dispositivo x colaborador) atualizadas
+junto com a gravação dos logs; as consultas de estatísticas somam os
+buckets completos e só varrem access_logs nas bordas parciais da janela
+"""
+
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import and_, case, func, insert, or_, text, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models.access_stats import AccessStatsHourly, AccessStatsDaily
+from app.models.employee import AccessLog
+
+COUNTERS = ("attempts", "granted", "denied", "liveness_failed")
+
+HOUR = timedelta(hours=1)
+DAY = timedelta(days=1)
+
+
+def floor_hour(moment: datetime) -> datetime:
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def floor_day(moment: datetime) -> datetime:
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def ceil_to(moment: datetime, floor, step: timedelta) -> datetime:
+    start = floor(moment)
+    return start if start == moment else start + step
+
+
+class AccessStatsService:
+    """Manutenção e leitura das tabelas access_stats_hourly/daily"""
+    
+    @staticmethod
+    def _increments(row: Dict) -> Tuple[int, int, int, int]:
+        granted = 1 if row.get("access_granted") else 0
+        liveness_failed = 1 if row.get("liveness_passed") is False else 0
+        return 1, granted, 1 - granted, liveness_failed
+    
+    @staticmethod
+    def aggregate(rows: Iterable[Dict]) -> Dict[type, Dict[tuple, List[int]]]:
+        """
+        Soma os logs por bucket (hora e dia), dispositivo e colaborador
+        
+        Args:
+            rows: Logs de acesso como dicts (campos de AccessLog)
+        
+        Returns:
+            {modelo da tabela: {(bucket_start, device_id, employee_id): [contadores]}}
+        """
+        buckets = {AccessStatsHourly: defaultdict(lambda: [0, 0, 0, 0]), AccessStatsDaily: defaultdict(lambda: [0, 0, 0, 0])}
+        
+        for row in rows:
+            attempted_at = row["attempted_at"]
+            device_id = row.get("device_id") or ""
+            employee_id = row.get("employee_id") or 0
+            increments = AccessStatsService._increments(row)
+            
+            for model, floor in ((AccessStatsHourly, floor_hour), (AccessStatsDaily, floor_day)):
+                totals = buckets[model][(floor(attempted_at), device_id, employee_id)]
+                for index, value in enumerate(increments):
+                    totals[index] += value
+        
+        return buckets
+    
+    @staticmethod
+    def apply(db: Session, rows: List[Dict]):
+        """
+        Incrementa os rollups com os logs recém-gravados (upsert)
+        Deve rodar na mesma transação do INSERT dos logs
+        
+        PostgreSQL e SQLite usam INSERT ... ON CONFLICT em um comando por
+        tabela; nos demais bancos cada bucket é atualizado e, se ainda não
+        existir, inserido (ver _apply_each).
+        
+        Args:
+            db: Sessão do banco (commit a cargo de quem chama)
+            rows: Logs de acesso como dicts (campos de AccessLog)
+        """
+        dialect = db.get_bind().dialect.name
+        upsert = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}.get(dialect)
+        
+        for model, buckets in AccessStatsService.aggregate(rows).items():
+            if not buckets:
+                continue
+            
+            values = [
+                {"bucket_start": bucket, "device_id": device_id, "employee_id": employee_id, **dict(zip(COUNTERS, totals))}
+                for (bucket, device_id, employee_id), totals in sorted(buckets.items())
+            ]
+            if upsert is None:
+                AccessStatsService._apply_each(db, model, values)
+                continue
+            
+            statement = upsert(model).values(values)
+            statement = statement.on_conflict_do_update(
+                index_elements=["bucket_start", "device_id", "employee_id"],
+                set_={name: getattr(model, name) + getattr(statement.excluded, name) for name in COUNTERS}
+            )
+            db.execute(statement)
+    
+    @staticmethod
+    def _apply_each(db: Session, model, values: List[Dict]):
+        """
+        Upsert portável: UPDATE dos contadores e INSERT se nenhuma linha casou
+        
+        O INSERT roda em um savepoint; se outro processo criou o bucket entre
+        os dois comandos, a chave única recusa e o UPDATE é refeito.
+        """
+        for row in values:
+            key = and_(
+                model.bucket_start == row["bucket_start"],
+                model.device_id == row["device_id"],
+                model.employee_id == row["employee_id"]
+            )
+            increment = update(model).where(key).values(
+                {name: getattr(model, name) + row[name] for name in COUNTERS}
+            ).execution_options(synchronize_session=False)
+            
+            if db.execute(increment).rowcount:
+                continue
+            try:
+                with db.begin_nested():
+                    db.execute(insert(model).values(row))
+            except IntegrityError:
+                db.execute(increment)
+    
+    @staticmethod
+    def _filters(model, device_id: Optional[str], employee_id: Optional[int]) -> list:
+        """Filtros por dispositivo/colaborador (access_logs ou rollups)"""
+        filters = []
+        if device_id is not None:
+            filters.append(model.device_id == device_id)
+        if employee_id is not None:
+            filters.append(model.employee_id == employee_id)
+        return filters
+    
+    @staticmethod
+    def _rollup_totals(db: Session, model, ranges: List[Tuple[datetime, datetime]], filters: list) -> List[int]:
+        ranges = [(start, end) for start, end in ranges if start < end]
+        if not ranges:
+            return [0, 0, 0, 0]
+        
+        row = db.query(*[func.coalesce(func.sum(getattr(model, name)), 0) for name in COUNTERS]).filter(
+            or_(*[and_(model.bucket_start >= start, model.bucket_start < end) for start, end in ranges]),
+            *filters
+        ).one()
+        return [int(value) for value in row]
+    
+    @staticmethod
+    def _raw_totals(db: Session, ranges: List[Tuple[datetime, datetime]], filters: list) -> List[int]:
+        """Contagem direta em access_logs, em uma única consulta com agregados condicionais"""
+        ranges = [(start, end) for start, end in ranges if start < end]
+        if not ranges:
+            return [0, 0, 0, 0]
+        
+        row = db.query(
+            func.count(AccessLog.id),
+            func.coalesce(func.sum(case((AccessLog.access_granted == True, 1), else_=0)), 0),
+            func.coalesce(func.sum(case((AccessLog.access_granted == False, 1), else_=0)), 0),
+            func.coalesce(func.sum(case((AccessLog.liveness_passed == False, 1), else_=0)), 0)
+        ).filter(
+            or_(*[and_(AccessLog.attempted_at >= start, AccessLog.attempted_at < end) for start, end in ranges]),
+            *filters
+        ).one()
+        return [int(value) for value in row]
+    
+    @staticmethod
+    def get_stats(
+        db: Session,
+        date_from: datetime,
+        date_to: Optional[datetime] = None,
+        device_id: Optional[str] = None,
+        employee_id: Optional[int] = None
+    ) -> Dict[str, int]:
+        """
+        Totais de tentativas, liberados, negados e falhas de liveness
+        
+        A janela é dividida em dias completos (access_stats_daily), horas
+        completas nas pontas (access_stats_hourly) e os trechos parciais
+        antes da primeira e depois da última hora cheia (access_logs).
+        
+        Args:
+            db: Sessão do banco
+            date_from: Início da janela (UTC)
+            date_to: Fim da janela, exclusivo (padrão: agora)
+            device_id: Filtra por dispositivo
+            employee_id: Filtra por colaborador
+        
+        Returns:
+            Dict com attempts, granted, denied e liveness_failed
+        """
+        date_to = date_to or datetime.utcnow()
+        filters = lambda model: AccessStatsService._filters(model, device_id, employee_id)
+        
+        first_hour = ceil_to(date_from, floor_hour, HOUR)
+        last_hour = floor_hour(date_to)
+        
+        if first_hour >= last_hour:
+            totals = AccessStatsService._raw_totals(db, [(date_from, date_to)], filters(AccessLog))
+        else:
+            first_day = ceil_to(first_hour, floor_day, DAY)
+            last_day = floor_day(last_hour)
+            if first_day >= last_day:
+                first_day = last_day = last_hour
+            
+            totals = [
+                sum(values) for values in zip(
+                    AccessStatsService._raw_totals(
+                        db, [(date_from, first_hour), (last_hour, date_to)], filters(AccessLog)
+                    ),
+                    AccessStatsService._rollup_totals(
+                        db, AccessStatsHourly, [(first_hour, first_day), (last_day, last_hour)],
+                        filters(AccessStatsHourly)
+                    ),
+                    AccessStatsService._rollup_totals(
+                        db, AccessStatsDaily, [(first_day, last_day)], filters(AccessStatsDaily)
+                    )
+                )
+            ]
+        
+        return dict(zip(COUNTERS, totals))
+    
+    @staticmethod
+    def rebuild(db: Session, chunk_size: int = 5000) -> int:
+        """
+        Recalcula os rollups a partir de access_logs (logs anteriores aos
+        rollups ou correção após falha); apaga as contagens existentes
+        
+        Pode rodar com a API no ar: os rollups ficam bloqueados para escrita
+        até o commit (no PostgreSQL, LOCK TABLE; no SQLite a própria escrita
+        já bloqueia o banco), então o apply() do access_log_writer espera e
+        incrementa depois os logs que o recálculo não viu. Só entram logs até
+        o maior id visível após o bloqueio, para não contar duas vezes os
+        gravados durante o recálculo.
+        
+        Returns:
+            Quantidade de logs processados
+        """
+        if db.get_bind().dialect.name == "postgresql":
+            db.execute(text(
+                f"LOCK TABLE {AccessStatsHourly.__tablename__}, {AccessStatsDaily.__tablename__} IN EXCLUSIVE MODE"
+            ))
+        db.query(AccessStatsHourly).delete()
+        db.query(AccessStatsDaily).delete()
+        
+        cutoff = db.query(func.max(AccessLog.id)).scalar() or 0
+        processed = 0
+        last_id = 0
+        while True:
+            logs = db.query(
+                AccessLog.id,
+                AccessLog.attempted_at,
+                AccessLog.device_id,
+                AccessLog.employee_id,
+                AccessLog.access_granted,
+                AccessLog.liveness_passed
+            ).filter(AccessLog.id > last_id, AccessLog.id <= cutoff).order_by(AccessLog.id).limit(chunk_size).all()
+            if not logs:
+                break
+            
+            AccessStatsService.apply(db, [log._asdict() for log in logs if log.attempted_at is not None])
+            processed += len(logs)
+            last_id = logs[-1].id
+        
+        db.commit()
+        return processed
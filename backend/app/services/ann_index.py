@@ -0,0 +1,144 @@
+"""
+Índice aproximado (ANN) para galerias grandes
+IVF: os embeddings são particionados por k-means esférico e a busca
+percorre apenas as nprobe partições mais próximas do probe
+"""
+
+from typing import List, Optional
+
+import numpy as np
+
+
+class IVFIndex:
+    """
+    Índice IVF (inverted file) em NumPy puro
+    
+    Guarda apenas os números das linhas da matriz da galeria em cada
+    partição; os vetores continuam na FaceGallery. Os vetores devem estar
+    normalizados (L2), de modo que o produto interno é a similaridade
+    cosseno.
+    """
+    
+    TRAIN_ITERATIONS = 10
+    MAX_TRAINING_SAMPLES_PER_LIST = 256
+    ASSIGN_CHUNK = 8192
+    
+    def __init__(self, nlist: int, nprobe: int, seed: int = 0):
+        self.nlist = max(1, int(nlist))
+        self.nprobe = max(1, int(nprobe))
+        self.seed = seed
+        self.centroids: Optional[np.ndarray] = None
+        self._lists: List[List[int]] = []
+        self._arrays: List[np.ndarray] = []  # partições como array (somente leitura na busca)
+    
+    @staticmethod
+    def default_nlist(size: int) -> int:
+        """Quantidade de partições sugerida para uma galeria (~sqrt(n))"""
+        return max(1, int(np.sqrt(size)))
+    
+    @property
+    def is_trained(self) -> bool:
+        return self.centroids is not None
+    
+    def _assign(self, vectors: np.ndarray) -> np.ndarray:
+        """Partição mais próxima de cada vetor (em blocos para limitar memória)"""
+        assignments = np.empty(vectors.shape[0], dtype=np.int64)
+        for start in range(0, vectors.shape[0], self.ASSIGN_CHUNK):
+            block = vectors[start:start + self.ASSIGN_CHUNK]
+            assignments[start:start + block.shape[0]] = np.argmax(block @ self.centroids.T, axis=1)
+        return assignments
+    
+    def train(self, vectors: np.ndarray):
+        """
+        Treina os centróides com k-means esférico
+        
+        Args:
+            vectors: Embeddings normalizados (n, dim)
+        """
+        rng = np.random.default_rng(self.seed)
+        n = vectors.shape[0]
+        self.nlist = min(self.nlist, n)
+        
+        max_samples = self.nlist * self.MAX_TRAINING_SAMPLES_PER_LIST
+        if n > max_samples:
+            vectors = vectors[rng.choice(n, max_samples, replace=False)]
+            n = max_samples
+        
+        self.centroids = vectors[rng.choice(n, self.nlist, replace=False)].copy()
+        
+        for _ in range(self.TRAIN_ITERATIONS):
+            assignments = self._assign(vectors)
+            order = np.argsort(assignments, kind="stable")
+            counts = np.bincount(assignments, minlength=self.nlist)
+            starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+            
+            non_empty = counts > 0
+            sums = np.zeros_like(self.centroids)
+            sums[non_empty] = np.add.reduceat(vectors[order], starts[non_empty], axis=0)
+            
+            # Partições vazias recebem um vetor aleatório
+            empty = np.flatnonzero(~non_empty)
+            if empty.size:
+                sums[empty] = vectors[rng.choice(n, empty.size, replace=False)]
+            
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            self.centroids = (sums / norms).astype(np.float32)
+        
+        self._lists = [[] for _ in range(self.nlist)]
+        self._arrays = [np.zeros(0, dtype=np.int64)] * self.nlist
+    
+    def add_rows(self, rows: np.ndarray, vectors: np.ndarray):
+        """
+        Adiciona linhas da galeria às partições
+        
+        Args:
+            rows: Números das linhas na matriz da galeria
+            vectors: Vetores normalizados das linhas
+        """
+        if len(rows) == 0:
+            return
+        
+        touched = set()
+        for row, list_id in zip(np.asarray(rows).tolist(), self._assign(vectors).tolist()):
+            self._lists[list_id].append(row)
+            touched.add(list_id)
+        
+        # Troca o array inteiro: buscas concorrentes veem a versão antiga ou a nova
+        for list_id in touched:
+            self._arrays[list_id] = np.asarray(self._lists[list_id], dtype=np.int64)
+    
+    def reassigned(self, matrix: np.ndarray) -> "IVFIndex":
+        """
+        Cria um índice com os mesmos centróides para uma nova numeração de
+        linhas (usado após a compactação da galeria)
+        """
+        index = IVFIndex(self.nlist, self.nprobe, self.seed)
+        index.centroids = self.centroids
+        index._lists = [[] for _ in range(self.nlist)]
+        index._arrays = [np.zeros(0, dtype=np.int64)] * self.nlist
+        index.add_rows(np.arange(matrix.shape[0]), matrix)
+        return index
+    
+    def candidates(self, probe: np.ndarray, nprobe: Optional[int] = None) -> np.ndarray:
+        """
+        Linhas candidatas para o probe
+        
+        Args:
+            probe: Embedding normalizado
+            nprobe: Partições visitadas (maior = mais recall, mais latência)
+        
+        Returns:
+            Array com os números das linhas candidatas
+        """
+        nprobe = min(nprobe or self.nprobe, self.nlist)
+        centroid_scores = self.centroids @ probe
+        if nprobe < self.nlist:
+            probed = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+        else:
+            probed = np.arange(self.nlist)
+        
+        parts = [self._arrays[i] for i in probed.tolist()]
+        if not parts:
+            return np.zeros(0, dtype=np.int64)
+        return np.concatenate(parts)
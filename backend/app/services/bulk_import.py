@@ -0,0 +1,519 @@
+"""
+Importação em lote de colaboradores
+Lê um CSV e as fotos (diretório ou zip), distribui detecção e embedding
+entre processos e grava os colaboradores em INSERTs em lote, emitindo
+eventos de progresso e de falha por linha
+"""
+
+import csv
+import io
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+import cv2
+import numpy as np
+from pydantic import ValidationError
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.core.metrics import metrics
+from app.models.employee import Employee
+from app.schemas.employee import EmployeeCreate
+from app.services.face_recognition_service import FaceRecognitionService
+from app.services.frame_context import FrameContext
+from app.utils.embedding_codec import encode_embedding
+
+CSV_COLUMNS = ["full_name", "cpf", "email", "phone", "department", "position", "photo"]
+
+# Uma importação por processo: cada uma sobe seu próprio pool de processos
+import_lock = threading.Lock()
+
+
+def embed_photos(
+    contents: List[bytes],
+    model_name: Optional[str] = None
+) -> Tuple[List[int], Optional[np.ndarray], Dict[int, str]]:
+    """
+    Decodifica e valida cada foto e gera os embeddings das aceitas em um
+    único forward pass
+    
+    Args:
+        contents: Bytes de cada foto
+        model_name: Modelo de embedding (padrão o modelo ativo)
+    
+    Returns:
+        (índices aceitos, matriz de embeddings na mesma ordem, {índice: erro} das rejeitadas)
+    """
+    model_name = model_name or FaceRecognitionService.MODEL_NAME
+    accepted = []
+    crops = []
+    rejected = {}
+    
+    for index, content in enumerate(contents):
+        frame = FrameContext.from_bytes(content, model_name=model_name)
+        if frame.bgr is None:
+            rejected[index] = "Imagem inválida ou corrompida"
+            continue
+        
+        try:
+            validation = FaceRecognitionService.validate_detected_faces(frame.faces)
+            crop = frame.face_crop if validation["valid"] else None
+        except Exception as e:
+            validation = {"valid": False, "error": f"Erro ao processar imagem: {str(e)}"}
+            crop = None
+        
+        if crop is None:
+            rejected[index] = validation.get("error") or "Não foi possível processar a face na imagem"
+            continue
+        
+        accepted.append(index)
+        crops.append(crop)
+    
+    embeddings = FaceRecognitionService.embed_faces(crops, model_name) if crops else None
+    return accepted, embeddings, rejected
+
+
+def _init_worker(model_name: str, detector_backend: str):
+    """Processo do pool: uma thread de inferência e modelos carregados uma vez"""
+    # Paralelismo vem dos processos; threads internas só disputariam núcleos
+    cv2.setNumThreads(1)
+    try:
+        import tensorflow as tf
+        tf.config.threading.set_intra_op_parallelism_threads(1)
+        tf.config.threading.set_inter_op_parallelism_threads(1)
+    except Exception:
+        pass
+    
+    from app.services.model_registry import model_registry
+    FaceRecognitionService.use_model(model_name, detector_backend)
+    model_registry.warm_up()
+
+
+def embedding_pool(
+    workers: int,
+    model_name: Optional[str] = None,
+    detector_backend: Optional[str] = None
+) -> ProcessPoolExecutor:
+    """
+    Pool de processos para embed_chunk (spawn: não herda o estado do TensorFlow do pai)
+    
+    Args:
+        workers: Quantidade de processos
+        model_name: Modelo de embedding dos processos (padrão o modelo ativo)
+        detector_backend: Detector dos processos (padrão o detector ativo)
+    """
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(
+            model_name or FaceRecognitionService.MODEL_NAME,
+            detector_backend or FaceRecognitionService.DETECTOR_BACKEND
+        )
+    )
+
+
+def embed_chunk(contents: List[bytes]) -> List[Tuple[Optional[bytes], Optional[str]]]:
+    """Tarefa do pool: (encoding serializado, erro) para cada foto, na ordem de entrada"""
+    accepted, embeddings, rejected = embed_photos(contents)
+    
+    results: List[Tuple[Optional[bytes], Optional[str]]] = [(None, rejected.get(index)) for index in range(len(contents))]
+    for index, embedding in zip(accepted, embeddings if embeddings is not None else []):
+        results[index] = (encode_embedding(embedding, FaceRecognitionService.MODEL_NAME), None)
+    return results
+
+
+class ImportRow(NamedTuple):
+    """Linha válida do CSV"""
+    line: int
+    fields: Dict[str, Optional[str]]  # campos de EmployeeCreate
+    photo: str
+
+
+class PhotoSource:
+    """Fotos da importação, lidas pelo nome informado no CSV (diretório ou zip)"""
+    
+    def __init__(self, path: str, delete_on_close: bool = False):
+        self.path = path
+        self.delete_on_close = delete_on_close
+        self._zip: Optional[zipfile.ZipFile] = None
+        self._names: Dict[str, str] = {}
+        
+        if os.path.isdir(path):
+            self._root = os.path.realpath(path)
+        elif zipfile.is_zipfile(path):
+            self._zip = zipfile.ZipFile(path)
+            for name in self._zip.namelist():
+                if not name.endswith("/"):
+                    # Aceita o caminho completo ou só o nome do arquivo
+                    self._names.setdefault(name, name)
+                    self._names.setdefault(os.path.basename(name), name)
+        else:
+            raise ValueError(f"{path} não é um diretório nem um arquivo zip")
+    
+    def read(self, name: str) -> bytes:
+        """
+        Conteúdo da foto
+        
+        Raises:
+            ValueError: foto inexistente, fora do diretório ou maior que MAX_FILE_SIZE
+        """
+        if self._zip is not None:
+            entry = self._names.get(name)
+            if entry is None:
+                raise ValueError(f"Foto não encontrada: {name}")
+            if self._zip.getinfo(entry).file_size > settings.MAX_FILE_SIZE:
+                raise ValueError(f"Foto maior que o limite: {name}")
+            return self._zip.read(entry)
+        
+        path = os.path.realpath(os.path.join(self._root, name))
+        if os.path.commonpath([self._root, path]) != self._root or not os.path.isfile(path):
+            raise ValueError(f"Foto não encontrada: {name}")
+        if os.path.getsize(path) > settings.MAX_FILE_SIZE:
+            raise ValueError(f"Foto maior que o limite: {name}")
+        with open(path, "rb") as f:
+            return f.read()
+    
+    def close(self):
+        if self._zip is not None:
+            self._zip.close()
+        if self.delete_on_close:
+            os.remove(self.path)
+
+
+def parse_csv(text: str) -> Tuple[List[ImportRow], List[Dict]]:
+    """
+    Lê e valida as linhas do CSV (cabeçalho com CSV_COLUMNS; phone,
+    department e position são opcionais)
+    
+    Args:
+        text: Conteúdo do CSV
+    
+    Returns:
+        (linhas válidas, eventos de falha das linhas inválidas)
+    """
+    reader = csv.DictReader(io.StringIO(text))
+    missing = [column for column in ("full_name", "cpf", "email", "photo") if column not in (reader.fieldnames or [])]
+    if missing:
+        raise ValueError(f"Colunas obrigatórias ausentes no CSV: {', '.join(missing)}")
+    
+    rows = []
+    failures = []
+    for record in reader:
+        line = reader.line_num
+        values = {column: (record.get(column) or "").strip() or None for column in CSV_COLUMNS}
+        photo = values.pop("photo")
+        
+        try:
+            fields = EmployeeCreate(**values).model_dump()
+        except ValidationError as e:
+            error = "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+            failures.append(_failed(line, error))
+            continue
+        
+        if not photo:
+            failures.append(_failed(line, "Foto não informada"))
+            continue
+        
+        rows.append(ImportRow(line, fields, photo))
+    
+    return rows, failures
+
+
+def _failed(line: int, error: str) -> Dict:
+    return {"event": "row", "line": line, "status": "failed", "error": error}
+
+
+class BulkImporter:
+    """
+    Executa uma importação
+    
+    Detecção e embedding rodam em um ProcessPoolExecutor (spawn, uma thread
+    de inferência por processo), em tarefas de BULK_IMPORT_CHUNK_SIZE fotos
+    com um forward pass cada; no máximo duas tarefas por processo ficam em
+    voo, o que limita as fotos mantidas em memória. Os colaboradores
+    aceitos são gravados a cada BULK_IMPORT_BATCH_SIZE em um único commit.
+    
+    Diferente do pool de inferência da API, aqui cada processo carrega sua
+    cópia dos modelos: o custo de memória é aceitável em uma importação e
+    a vazão cresce com os núcleos.
+    
+    Se um processo morre (falta de memória, crash no decoder), as tarefas
+    em voo falham e o pool é recriado até MAX_POOL_RESTARTS vezes; depois
+    disso as linhas restantes falham e a importação termina normalmente.
+    """
+    
+    MAX_POOL_RESTARTS = 2
+    
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        on_employee: Optional[Callable[[int, np.ndarray, str], None]] = None,
+        workers: Optional[int] = None,
+        chunk_size: Optional[int] = None,
+        batch_size: Optional[int] = None
+    ):
+        self.session_factory = session_factory
+        self.on_employee = on_employee
+        self.workers = workers or settings.BULK_IMPORT_WORKERS or os.cpu_count() or 1
+        self.chunk_size = max(1, chunk_size or settings.BULK_IMPORT_CHUNK_SIZE)
+        self.batch_size = max(1, batch_size or settings.BULK_IMPORT_BATCH_SIZE)
+        
+        self._imported_total = metrics.counter("bulk_import_imported_total", "Colaboradores importados em lote")
+        self._failed_total = metrics.counter("bulk_import_failed_total", "Linhas rejeitadas na importação em lote")
+    
+    def run(self, rows: List[ImportRow], photos: PhotoSource, failures: Iterable[Dict] = ()) -> Iterator[Dict]:
+        """
+        Importa as linhas, emitindo eventos à medida que avançam
+        
+        Eventos: start, row (imported/failed, por linha), progress (a cada
+        tarefa concluída) e done.
+        
+        Args:
+            rows: Linhas válidas do CSV (ver parse_csv)
+            photos: Origem das fotos
+            failures: Falhas já conhecidas (linhas inválidas do CSV), repassadas como eventos
+        """
+        self.started_at = time.perf_counter()
+        self.imported = 0
+        self.failed = 0
+        failures = list(failures)
+        self.total = len(rows) + len(failures)
+        
+        yield {"event": "start", "total": self.total, "workers": self.workers}
+        for event in failures:
+            yield self._count(event)
+        
+        # reembedding importa este módulo
+        from app.services.reembedding import ReembeddingService
+        
+        db = self.session_factory()
+        # Modelo ativo no banco, não o deste processo (que pode ainda não ter
+        # recebido uma troca de modelo)
+        self.model_name, detector_backend = ReembeddingService.active_model(db)
+        self.aborted: Optional[str] = None
+        pool = embedding_pool(self.workers, self.model_name, detector_backend)
+        restarts = 0
+        try:
+            rows, duplicates = self._without_duplicates(db, rows)
+            for event in duplicates:
+                yield self._count(event)
+            
+            chunks = iter([rows[i:i + self.chunk_size] for i in range(0, len(rows), self.chunk_size)])
+            in_flight = {}
+            batch = []
+            exhausted = False
+            
+            while in_flight or not exhausted:
+                broken = None
+                while not exhausted and broken is None and len(in_flight) < self.workers * 2:
+                    chunk = next(chunks, None)
+                    if chunk is None:
+                        exhausted = True
+                        break
+                    
+                    items = []
+                    for row in chunk:
+                        try:
+                            items.append((row, photos.read(row.photo)))
+                        except ValueError as e:
+                            yield self._count(_failed(row.line, str(e)))
+                    
+                    if not items:
+                        continue
+                    try:
+                        future = pool.submit(embed_chunk, [content for _, content in items])
+                    except BrokenProcessPool as e:
+                        broken = e
+                        for row, _ in items:
+                            yield self._count(_failed(row.line, f"Erro ao processar foto: {str(e)}"))
+                    else:
+                        in_flight[future] = items
+                
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED) if in_flight else (set(), set())
+                for future in done:
+                    items = in_flight.pop(future)
+                    try:
+                        results = future.result()
+                    except Exception as e:
+                        if isinstance(e, BrokenProcessPool):
+                            broken = e
+                        results = [(None, f"Erro ao processar foto: {str(e)}")] * len(items)
+                    
+                    for (row, content), (encoding, error) in zip(items, results):
+                        if encoding is None:
+                            yield self._count(_failed(row.line, error))
+                        else:
+                            batch.append((row, content, encoding))
+                    
+                    if len(batch) >= self.batch_size:
+                        for event in self._write(db, batch):
+                            yield self._count(event)
+                        batch = []
+                    
+                    yield self._progress()
+                
+                if broken is not None and not self.aborted:
+                    # As demais tarefas do pool quebrado falham do mesmo jeito
+                    for items in in_flight.values():
+                        for row, _ in items:
+                            yield self._count(_failed(row.line, f"Erro ao processar foto: {str(broken)}"))
+                    in_flight.clear()
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    
+                    restarts += 1
+                    if restarts > self.MAX_POOL_RESTARTS:
+                        self.aborted = "Processos de importação interrompidos repetidamente; importe esta linha novamente"
+                    else:
+                        print(f"⚠️ Pool da importação interrompido ({str(broken)}); recriando ({restarts}/{self.MAX_POOL_RESTARTS})")
+                        pool = embedding_pool(self.workers, self.model_name, detector_backend)
+                    yield self._progress()
+                
+                if self.aborted:
+                    break
+            
+            for event in self._write(db, batch):
+                yield self._count(event)
+            
+            if self.aborted:
+                remaining = [row for items in in_flight.values() for row, _ in items]
+                remaining.extend(row for chunk in chunks for row in chunk)
+                for row in sorted(remaining, key=lambda row: row.line):
+                    yield self._count(_failed(row.line, self.aborted))
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+            db.close()
+        
+        yield {**self._progress(), "event": "done"}
+    
+    def _count(self, event: Dict) -> Dict:
+        if event["status"] == "imported":
+            self.imported += 1
+            self._imported_total.inc()
+        else:
+            self.failed += 1
+            self._failed_total.inc()
+        return event
+    
+    def _progress(self) -> Dict:
+        elapsed = time.perf_counter() - self.started_at
+        processed = self.imported + self.failed
+        return {
+            "event": "progress",
+            "processed": processed,
+            "total": self.total,
+            "imported": self.imported,
+            "failed": self.failed,
+            "elapsed_seconds": round(elapsed, 3),
+            "rows_per_second": round(processed / elapsed, 2) if elapsed > 0 else 0.0
+        }
+    
+    @staticmethod
+    def _without_duplicates(db: Session, rows: List[ImportRow]) -> Tuple[List[ImportRow], List[Dict]]:
+        """Descarta CPFs/emails já cadastrados ou repetidos no próprio CSV antes de processar as fotos"""
+        cpfs = set()
+        emails = set()
+        for start in range(0, len(rows), 500):
+            chunk = rows[start:start + 500]
+            existing = db.query(Employee.cpf, Employee.email).filter(
+                Employee.cpf.in_([row.fields["cpf"] for row in chunk]) |
+                Employee.email.in_([row.fields["email"] for row in chunk])
+            ).all()
+            for cpf, email in existing:
+                cpfs.add(cpf)
+                emails.add(email)
+        
+        unique = []
+        failures = []
+        for row in rows:
+            if row.fields["cpf"] in cpfs:
+                failures.append(_failed(row.line, "CPF já cadastrado"))
+            elif row.fields["email"] in emails:
+                failures.append(_failed(row.line, "Email já cadastrado"))
+            else:
+                cpfs.add(row.fields["cpf"])
+                emails.add(row.fields["email"])
+                unique.append(row)
+        
+        return unique, failures
+    
+    def _write(self, db: Session, batch: List[Tuple[ImportRow, bytes, bytes]]) -> List[Dict]:
+        """
+        Grava um lote em uma única transação; se houver conflito (cadastro
+        concorrente), regrava linha a linha para isolar as que falharam
+        """
+        from app.services.reembedding import ReembeddingService
+        
+        if not batch:
+            return []
+        
+        # Um job de re-embedding ativou outro modelo: os vetores deste lote
+        # ficariam fora da galeria nova
+        if self.aborted is None and ReembeddingService.active_model(db)[0] != self.model_name:
+            self.aborted = "O modelo de reconhecimento foi trocado durante a importação; importe esta linha novamente"
+        if self.aborted:
+            return [_failed(row.line, self.aborted) for row, _, _ in batch]
+        
+        os.makedirs(settings.FACES_DIR, exist_ok=True)
+        paths = []
+        for _, content, _ in batch:
+            path = os.path.join(settings.FACES_DIR, f"{uuid.uuid4()}.jpg")
+            with open(path, "wb") as f:
+                f.write(content)
+            paths.append(path)
+        
+        registered_at = datetime.utcnow()
+        
+        def build(row: ImportRow, encoding: bytes, path: str) -> Employee:
+            return Employee(
+                **row.fields,
+                face_encoding=encoding,
+                face_image_path=path,
+                face_registered_at=registered_at
+            )
+        
+        events = []
+        written = []
+        try:
+            employees = [build(row, encoding, path) for (row, _, encoding), path in zip(batch, paths)]
+            db.add_all(employees)
+            db.flush()
+            ids = [employee.id for employee in employees]
+            db.commit()
+            written = list(zip(batch, paths, ids))
+        except IntegrityError:
+            db.rollback()
+            for (row, content, encoding), path in zip(batch, paths):
+                try:
+                    employee = build(row, encoding, path)
+                    db.add(employee)
+                    db.flush()
+                    employee_id = employee.id
+                    db.commit()
+                    written.append(((row, content, encoding), path, employee_id))
+                except IntegrityError:
+                    db.rollback()
+                    os.remove(path)
+                    events.append(_failed(row.line, "CPF ou email já cadastrado"))
+        
+        for (row, _, encoding), _, employee_id in written:
+            if self.on_employee is not None:
+                self.on_employee(employee_id, FaceRecognitionService.decode_encoding(encoding), self.model_name)
+            events.append({
+                "event": "row",
+                "line": row.line,
+                "status": "imported",
+                "employee_id": employee_id,
+                "full_name": row.fields["full_name"]
+            })
+        
+        return sorted(events, key=lambda event: event["line"])
@@ -0,0 +1,168 @@
+"""
+Cadastro de dispositivos (entradas) em memória
+Mapeia o device_id enviado pelo app para o controlador de porta, o número
+da porta e os thresholds da entrada sem consultar o banco a cada requisição
+"""
+
+import json
+import logging
+import os
+import socket
+import threading
+import uuid
+from typing import Callable, Dict, NamedTuple, Optional
+
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.device import Device
+from app.services.gallery_sync import ChangeFeedBackend
+
+logger = logging.getLogger(__name__)
+
+
+class DeviceConfig(NamedTuple):
+    """Configuração efetiva de uma entrada (valores globais já aplicados)"""
+    device_id: Optional[str]
+    controller_url: str
+    door_number: int
+    recognition_tolerance: float
+    liveness_threshold: float
+    location: Optional[str] = None
+    is_active: bool = True
+    
+    @classmethod
+    def from_model(cls, device: Device) -> "DeviceConfig":
+        return cls(
+            device_id=device.device_id,
+            controller_url=device.controller_url or settings.DOOR_CONTROLLER_BASE_URL,
+            door_number=device.door_number or 1,
+            recognition_tolerance=(
+                device.recognition_tolerance
+                if device.recognition_tolerance is not None
+                else settings.FACE_RECOGNITION_TOLERANCE
+            ),
+            liveness_threshold=(
+                device.liveness_threshold
+                if device.liveness_threshold is not None
+                else settings.LIVENESS_THRESHOLD
+            ),
+            location=device.location,
+            is_active=bool(device.is_active)
+        )
+    
+    @classmethod
+    def default(cls, device_id: Optional[str] = None) -> "DeviceConfig":
+        """Dispositivo não cadastrado: controlador padrão, porta 1, thresholds globais"""
+        return cls(
+            device_id=device_id,
+            controller_url=settings.DOOR_CONTROLLER_BASE_URL,
+            door_number=1,
+            recognition_tolerance=settings.FACE_RECOGNITION_TOLERANCE,
+            liveness_threshold=settings.LIVENESS_THRESHOLD
+        )
+
+
+class DeviceRegistry:
+    """
+    Dispositivos do processo, carregados no startup
+    
+    get() só consulta um dicionário. Alterações feitas pelos endpoints de
+    dispositivos são aplicadas localmente e publicadas no canal
+    DEVICE_SYNC_CHANNEL (mesmo backend da sincronização da galeria) para
+    os demais workers; após uma reconexão o cadastro é recarregado do banco.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._devices: Dict[str, DeviceConfig] = {}
+        self._backend: Optional[ChangeFeedBackend] = None
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+    
+    def __len__(self) -> int:
+        return len(self._devices)
+    
+    def load(self, db: Session) -> int:
+        """
+        Recarrega todos os dispositivos do banco
+        
+        Returns:
+            Quantidade de dispositivos carregados
+        """
+        devices = {
+            device.device_id: DeviceConfig.from_model(device)
+            for device in db.query(Device).all()
+        }
+        with self._lock:
+            self._devices = devices
+        return len(devices)
+    
+    def get(self, device_id: Optional[str]) -> DeviceConfig:
+        """Configuração do dispositivo ou a padrão se não cadastrado"""
+        if device_id:
+            config = self._devices.get(device_id)
+            if config is not None:
+                return config
+        return DeviceConfig.default(device_id)
+    
+    def start(self, backend: Optional[ChangeFeedBackend], on_reconnect: Optional[Callable[[], None]] = None):
+        """Inscreve o worker no canal de alterações de dispositivos"""
+        self._backend = backend
+        if backend is not None:
+            backend.subscribe(self._on_message, on_reconnect)
+    
+    def stop(self):
+        if self._backend is not None:
+            self._backend.close()
+            self._backend = None
+    
+    def put(self, device: Device):
+        """Aplica e publica a configuração atual de um dispositivo"""
+        config = DeviceConfig.from_model(device)
+        self._apply("put", config.device_id, config)
+        self._publish("put", config.device_id, config)
+    
+    def remove(self, device_id: str):
+        self._apply("remove", device_id)
+        self._publish("remove", device_id)
+    
+    def _apply(self, op: str, device_id: str, config: Optional[DeviceConfig] = None):
+        with self._lock:
+            if op == "put":
+                self._devices[device_id] = config
+            else:
+                self._devices.pop(device_id, None)
+    
+    def _publish(self, op: str, device_id: str, config: Optional[DeviceConfig] = None):
+        if self._backend is None:
+            return
+        
+        message = {"worker": self.worker_id, "op": op, "device_id": device_id}
+        if config is not None:
+            message["config"] = config._asdict()
+        
+        try:
+            self._backend.publish(json.dumps(message))
+        except Exception as e:
+            logger.error(f"Erro ao publicar alteração de dispositivo: {str(e)}")
+    
+    def _on_message(self, raw: str):
+        try:
+            message = json.loads(raw)
+            if message["worker"] == self.worker_id:
+                return
+            
+            op = message["op"]
+            if op == "put":
+                self._apply(op, message["device_id"], DeviceConfig(**message["config"]))
+            elif op == "remove":
+                self._apply(op, message["device_id"])
+            else:
+                logger.warning(f"Operação de dispositivo desconhecida: {op}")
+        
+        except Exception as e:
+            logger.error(f"Erro ao aplicar alteração de dispositivo: {str(e)}")
+
+
+# Instância única por processo
+device_registry = DeviceRegistry()
@@ -0,0 +1,246 @@
+"""
+Fila de comandos de abertura por porta
+Agrupa aberturas repetidas, refaz tentativas com backoff limitado e usa um
+circuit breaker para falhar rápido enquanto o controlador está fora do ar
+"""
+
+import asyncio
+import re
+import time
+from typing import Dict, List
+from urllib.parse import urlsplit
+
+from app.config import settings
+from app.core.metrics import metrics
+from app.services.door_control_service import DoorControlService, door_control_service
+from app.services.device_registry import DeviceConfig
+import logging
+
+logger = logging.getLogger(__name__)
+
+class CircuitBreaker:
+    """
+    Circuit breaker simples (fechado -> aberto -> meio-aberto)
+    
+    Após failure_threshold falhas consecutivas abre e recusa chamadas por
+    reset_timeout segundos; depois deixa passar uma única tentativa
+    (meio-aberto), que fecha o circuito se der certo ou o reabre se falhar.
+    """
+    
+    CLOSED = "closed"
+    HALF_OPEN = "half_open"
+    OPEN = "open"
+    
+    _STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+    
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        
+        self._state_gauge = metrics.gauge(f"{name}_breaker_state", "0 fechado, 1 meio-aberto, 2 aberto")
+        self._trips = metrics.counter(f"{name}_breaker_trips_total", "Vezes que o circuito abriu")
+    
+    def _set_state(self, state: str):
+        self.state = state
+        self._state_gauge.set(self._STATE_VALUES[state])
+    
+    @property
+    def rejecting(self) -> bool:
+        """Aberto e ainda dentro de reset_timeout"""
+        return self.state == self.OPEN and time.monotonic() - self._opened_at < self.reset_timeout
+    
+    def allow(self) -> bool:
+        """Indica se uma chamada pode ser feita agora"""
+        if self.state == self.OPEN:
+            if self.rejecting:
+                return False
+            self._set_state(self.HALF_OPEN)
+        
+        if self.state == self.HALF_OPEN:
+            # Apenas uma tentativa de teste por vez
+            if self._probing:
+                return False
+            self._probing = True
+        
+        return True
+    
+    def record_success(self):
+        self._failures = 0
+        self._probing = False
+        if self.state != self.CLOSED:
+            self._set_state(self.CLOSED)
+    
+    def record_failure(self):
+        self._failures += 1
+        self._probing = False
+        if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self._trips.inc()
+            self._opened_at = time.monotonic()
+            self._set_state(self.OPEN)
+
+
+class DoorCommandQueue:
+    """
+    Comandos de abertura pendentes, um por porta
+    
+    Uma porta aberta permanece aberta por DOOR_OPEN_DURATION segundos, então
+    um pedido de abertura que chega enquanto outro está em andamento, ou
+    dentro dessa janela após uma abertura bem-sucedida, é agrupado ao
+    anterior em vez de gerar outro comando. Cada comando é tentado até
+    DOOR_RETRY_ATTEMPTS vezes com backoff exponencial limitado; o circuit
+    breaker é compartilhado porque todas as portas estão no mesmo controlador.
+    """
+    
+    def __init__(self, door: DoorControlService, name: str = "door"):
+        self.door = door
+        self.breaker = CircuitBreaker(
+            name,
+            settings.DOOR_BREAKER_FAILURES,
+            settings.DOOR_BREAKER_RESET_SECONDS
+        )
+        self._tasks: Dict[int, asyncio.Task] = {}
+        self._opened_at: Dict[int, float] = {}
+        
+        self._pending = metrics.gauge("door_queue_pending", "Comandos de abertura em andamento (todos os controladores)")
+        self._requested = metrics.counter("door_commands_total", "Pedidos de abertura recebidos")
+        self._coalesced = metrics.counter("door_commands_coalesced_total", "Pedidos agrupados a uma abertura recente ou em andamento")
+        self._rejected = metrics.counter("door_commands_rejected_total", "Pedidos recusados com o circuito aberto")
+        self._retries = metrics.counter("door_command_retries_total", "Novas tentativas após falha")
+        self._dropped = metrics.counter("door_commands_failed_total", "Comandos que esgotaram as tentativas")
+    
+    def request_open(self, door_number: int = 1) -> str:
+        """
+        Agenda a abertura da porta sem aguardar o controlador
+        Deve ser chamado de dentro do event loop
+        
+        Args:
+            door_number: Número da porta
+        
+        Returns:
+            "queued", "coalesced" ou "rejected" (circuito aberto)
+        """
+        self._requested.inc()
+        
+        task = self._tasks.get(door_number)
+        if task is not None and not task.done():
+            self._coalesced.inc()
+            return "coalesced"
+        
+        opened_at = self._opened_at.get(door_number)
+        if opened_at is not None and time.monotonic() - opened_at < settings.DOOR_OPEN_DURATION:
+            self._coalesced.inc()
+            return "coalesced"
+        
+        if self.breaker.rejecting:
+            self._rejected.inc()
+            logger.warning(f"Controlador indisponível, abertura da porta #{door_number} recusada")
+            return "rejected"
+        
+        self._pending.inc()
+        self._tasks[door_number] = asyncio.get_running_loop().create_task(self._run(door_number))
+        return "queued"
+    
+    def _active(self) -> List[asyncio.Task]:
+        return [task for task in self._tasks.values() if not task.done()]
+    
+    async def _run(self, door_number: int) -> bool:
+        attempts = 0
+        try:
+            # Pelo menos uma tentativa, mesmo com DOOR_RETRY_ATTEMPTS <= 0
+            for attempt in range(max(1, settings.DOOR_RETRY_ATTEMPTS)):
+                if attempt > 0:
+                    self._retries.inc()
+                    delay = min(
+                        settings.DOOR_RETRY_BACKOFF_SECONDS * 2 ** (attempt - 1),
+                        settings.DOOR_RETRY_MAX_BACKOFF_SECONDS
+                    )
+                    await asyncio.sleep(delay)
+                
+                if not self.breaker.allow():
+                    logger.warning(f"Circuito aberto, desistindo da porta #{door_number}")
+                    break
+                
+                attempts += 1
+                try:
+                    opened = await self.door.open_door(door_number)
+                except Exception as e:
+                    # Sem isso uma tentativa de teste (meio-aberto) que levanta
+                    # exceção deixaria o circuito recusando chamadas para sempre
+                    logger.error(f"Erro ao abrir a porta #{door_number}: {str(e)}")
+                    opened = False
+                
+                if opened:
+                    self.breaker.record_success()
+                    self._opened_at[door_number] = time.monotonic()
+                    return True
+                
+                self.breaker.record_failure()
+            
+            self._dropped.inc()
+            logger.error(f"Porta #{door_number} não abriu após {attempts} tentativa(s)")
+            return False
+        
+        finally:
+            self._pending.dec()
+    
+    async def stop(self):
+        """Cancela comandos pendentes e fecha o cliente do controlador"""
+        tasks = self._active()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks.clear()
+        await self.door.aclose()
+
+
+class DoorDispatcher:
+    """
+    Encaminha aberturas para o controlador de cada dispositivo
+    
+    Mantém uma DoorCommandQueue (com seu cliente HTTP, pool de conexões,
+    sessão e circuit breaker) por URL de controlador, criada no primeiro
+    uso. O controlador padrão usa a instância door_control_service e as
+    métricas door_breaker_*; os demais usam door_<host>_<porta>_breaker_*.
+    """
+    
+    def __init__(self):
+        self._queues: Dict[str, DoorCommandQueue] = {}
+    
+    @staticmethod
+    def _metric_name(controller_url: str) -> str:
+        if controller_url == settings.DOOR_CONTROLLER_BASE_URL:
+            return "door"
+        return "door_" + re.sub(r"\W+", "_", urlsplit(controller_url).netloc or controller_url).strip("_")
+    
+    def queue_for(self, controller_url: str) -> DoorCommandQueue:
+        queue = self._queues.get(controller_url)
+        if queue is None:
+            if controller_url == settings.DOOR_CONTROLLER_BASE_URL:
+                door = door_control_service
+            else:
+                door = DoorControlService(controller_url)
+            queue = DoorCommandQueue(door, self._metric_name(controller_url))
+            self._queues[controller_url] = queue
+        return queue
+    
+    def request_open(self, device: DeviceConfig) -> str:
+        """
+        Agenda a abertura da porta do dispositivo no seu controlador
+        
+        Returns:
+            "queued", "coalesced" ou "rejected" (ver DoorCommandQueue)
+        """
+        return self.queue_for(device.controller_url).request_open(device.door_number)
+    
+    async def stop(self):
+        queues, self._queues = list(self._queues.values()), {}
+        await asyncio.gather(*(queue.stop() for queue in queues), return_exceptions=True)
+
+
+# Instância única por processo
+door_dispatcher = DoorDispatcher()
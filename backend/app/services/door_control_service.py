@@ -3,49 +3,86 @@ Serviço de Controle de Porta
 Integra com o controlador físico via HTTP
 """
 
-import requests
-import tempfile
-import os
+import asyncio
+import time
 from typing import Optional
+
+import httpx
+
 from app.config import settings
+from app.core.metrics import metrics
 import logging
 
 logger = logging.getLogger(__name__)
 
+class DoorAuthError(Exception):
+    """O controlador recusou a sessão (cookie expirado ou ausente)"""
+    pass
+
 class DoorControlService:
     """
     Serviço para controlar portas via HTTP
     Baseado no comando curl fornecido
+    
+    Mantém um único cliente assíncrono por processo, com conexões keep-alive
+    e os cookies da sessão em memória. O login só é refeito quando o
+    controlador recusa a sessão; no caminho comum abrir a porta custa um
+    único round trip.
     """
     
-    def __init__(self):
-        self.base_url = settings.DOOR_CONTROLLER_BASE_URL
+    LOGIN_PATH = "/ACT_ID_1"
+    OPEN_PATH = "/ACT_ID_701"
+    
+    def __init__(self, base_url: str = None, transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.base_url = base_url or settings.DOOR_CONTROLLER_BASE_URL
         self.username = settings.DOOR_CONTROLLER_USERNAME
         self.password = settings.DOOR_CONTROLLER_PASSWORD
-        self.cookie_file = None
-        self.session = requests.Session()
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._login_lock: Optional[asyncio.Lock] = None
+        self._authenticated = False
+        
+        self._open_ms = metrics.histogram("door_open_ms", "Latência do comando de abertura")
+        self._logins = metrics.counter("door_login_total", "Logins no controlador de porta")
+        self._failures = metrics.counter("door_open_failures_total", "Comandos de abertura que falharam")
     
-    def _login(self) -> bool:
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                transport=self._transport,
+                timeout=httpx.Timeout(
+                    settings.DOOR_REQUEST_TIMEOUT,
+                    connect=settings.DOOR_CONNECT_TIMEOUT
+                ),
+                limits=httpx.Limits(
+                    max_connections=settings.DOOR_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.DOOR_MAX_CONNECTIONS
+                ),
+                follow_redirects=False
+            )
+            self._login_lock = asyncio.Lock()
+        return self._client
+    
+    @staticmethod
+    def _is_auth_failure(response: httpx.Response) -> bool:
+        """Sessão recusada: 401/403 ou redirecionamento para a tela de login"""
+        return response.status_code in (401, 403) or response.is_redirect
+    
+    async def _login(self) -> bool:
         """
         Realiza login no controlador de porta
+        Os cookies da sessão ficam no cliente (em memória)
         
         Returns:
             True se login bem-sucedido
         """
+        client = self._get_client()
+        
         try:
             logger.info("Tentando login no controlador de porta...")
-            
-            # Cria arquivo temporário para cookie
-            self.cookie_file = tempfile.NamedTemporaryFile(
-                mode='w', 
-                delete=False, 
-                suffix='.cookie'
-            )
-            cookie_path = self.cookie_file.name
-            self.cookie_file.close()
-            
-            # Endpoint de login
-            login_url = f"{self.base_url}/ACT_ID_1"
+            self._logins.inc()
+            client.cookies.clear()
             
             # Dados de login
             data = {
@@ -54,78 +91,81 @@ class DoorControlService:
                 "logId": "20101222"
             }
             
-            # Faz requisição de login
-            response = self.session.post(
-                login_url,
-                data=data,
-                timeout=10,
-                allow_redirects=True
-            )
+            response = await client.post(self.LOGIN_PATH, data=data, follow_redirects=True)
             
             if response.status_code == 200:
-                # Salva cookies no arquivo
-                with open(cookie_path, 'w') as f:
-                    for cookie in self.session.cookies:
-                        f.write(f"{cookie.name}={cookie.value}\n")
-                
+                self._authenticated = True
                 logger.info("Login realizado com sucesso")
                 return True
             else:
                 logger.error(f"Falha no login. Status: {response.status_code}")
                 return False
-            
-        except requests.exceptions.Timeout:
+        
+        except httpx.TimeoutException:
             logger.error("Timeout ao tentar login no controlador")
             return False
-        except Exception as e:
+        except httpx.HTTPError as e:
             logger.error(f"Erro no login do controlador: {str(e)}")
             return False
     
-    def open_door(self, door_number: int = 1) -> bool:
+    async def _ensure_login(self, stale: bool = False) -> bool:
+        """
+        Garante uma sessão válida; requisições simultâneas compartilham o
+        mesmo login em vez de cada uma abrir o seu
+        
+        Args:
+            stale: A sessão atual foi recusada e precisa ser renovada
+        """
+        self._get_client()
+        if stale:
+            self._authenticated = False
+        
+        async with self._login_lock:
+            if self._authenticated:
+                return True
+            return await self._login()
+    
+    async def _send_open(self, door_number: int) -> httpx.Response:
+        # Dados do comando
+        data = {
+            f"UNCLOSE{door_number}": f"Remote Open #{door_number} Door"
+        }
+        
+        response = await self._get_client().post(self.OPEN_PATH, data=data)
+        if self._is_auth_failure(response):
+            raise DoorAuthError()
+        return response
+    
+    async def open_door(self, door_number: int = 1) -> bool:
         """
         Abre a porta especificada
         
         Args:
             door_number: Número da porta (padrão: 1)
-            
+        
         Returns:
             True se comando enviado com sucesso
         """
+        start = time.perf_counter()
+        
         try:
             logger.info(f"Tentando abrir porta #{door_number}...")
             
-            # Faz login primeiro
-            if not self._login():
+            if not await self._ensure_login():
                 logger.error("Não foi possível fazer login para abrir porta")
+                self._failures.inc()
                 return False
             
-            # Lê cookies do arquivo
-            cookies = {}
-            if self.cookie_file:
-                try:
-                    with open(self.cookie_file.name, 'r') as f:
-                        for line in f:
-                            if '=' in line:
-                                name, value = line.strip().split('=', 1)
-                                cookies[name] = value
-                except FileNotFoundError:
-                    logger.warning("Arquivo de cookie não encontrado, usando session cookies")
-            
-            # Endpoint para abrir porta
-            open_url = f"{self.base_url}/ACT_ID_701"
-            
-            # Dados do comando
-            data = {
-                f"UNCLOSE{door_number}": f"Remote Open #{door_number} Door"
-            }
-            
-            # Envia comando para abrir porta
-            response = self.session.post(
-                open_url,
-                data=data,
-                cookies=cookies if cookies else None,
-                timeout=10
-            )
+            try:
+                response = await self._send_open(door_number)
+            except DoorAuthError:
+                # Sessão expirou no controlador: renova e tenta uma vez
+                logger.info("Sessão do controlador expirada, refazendo login")
+                if not await self._ensure_login(stale=True):
+                    logger.error("Não foi possível fazer login para abrir porta")
+                    self._failures.inc()
+                    return False
+                response = await self._send_open(door_number)
             
             success = response.status_code == 200
             
@@ -133,32 +173,33 @@ class DoorControlService:
                 logger.info(f"Porta #{door_number} aberta com sucesso")
             else:
                 logger.error(f"Falha ao abrir porta. Status: {response.status_code}")
-            
-            # Limpa arquivo de cookie
-            self._cleanup()
+                self._failures.inc()
             
             return success
-            
-        except requests.exceptions.Timeout:
+        
+        except DoorAuthError:
+            logger.error("Controlador recusou a sessão logo após o login")
+            self._authenticated = False
+            self._failures.inc()
+            return False
+        except httpx.TimeoutException:
             logger.error("Timeout ao enviar comando para abrir porta")
-            self._cleanup()
+            self._failures.inc()
             return False
-        except Exception as e:
+        except httpx.HTTPError as e:
             logger.error(f"Erro ao abrir porta: {str(e)}")
-            self._cleanup()
+            self._failures.inc()
             return False
+        finally:
+            self._open_ms.observe((time.perf_counter() - start) * 1000)
     
-    def _cleanup(self):
-        """Limpa recursos temporários"""
-        try:
-            if self.cookie_file and os.path.exists(self.cookie_file.name):
-                os.unlink(self.cookie_file.name)
-                logger.debug("Arquivo de cookie removido")
-        except Exception as e:
-            logger.warning(f"Erro ao limpar cookie: {str(e)}")
-    
-    def __del__(self):
-        """Destrutor - garante limpeza de recursos"""
-        self._cleanup()
-        if hasattr(self, 'session'):
-            self.session.close()
+    async def aclose(self):
+        """Fecha as conexões do cliente (shutdown da aplicação)"""
+        client, self._client = self._client, None
+        self._authenticated = False
+        if client is not None:
+            await client.aclose()
+
+
+# Instância única por processo
+door_control_service = DoorControlService()
@@ -0,0 +1,139 @@
+"""
+Agrupamento (micro-batching) das inferências de embedding
+Junta os recortes de faces de requisições simultâneas por alguns
+milissegundos e executa um único forward pass para todos
+"""
+
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, List, Optional
+
+import numpy as np
+
+from app.config import settings
+from app.core.metrics import metrics
+from app.services.face_recognition_service import FaceRecognitionService
+
+_STOP = object()
+
+
+class EmbeddingBatcher:
+    """
+    Fila de recortes consumida por uma thread que monta os lotes
+    
+    O primeiro recorte que chega abre uma janela de max_wait_ms; o lote é
+    executado quando a janela fecha ou quando atinge max_batch_size. Com
+    uma única requisição o custo extra é no máximo max_wait_ms. Recortes
+    de modelos diferentes (troca de modelo em andamento) vão em forward
+    passes separados.
+    """
+    
+    def __init__(
+        self,
+        embed_fn: Callable[[List[np.ndarray], Optional[str]], np.ndarray],
+        max_batch_size: int,
+        max_wait_ms: float
+    ):
+        self.embed_fn = embed_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait_ms = max_wait_ms
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        
+        self._batch_size = metrics.histogram("embedding_batch_size", "Recortes por forward pass")
+        self._batch_ms = metrics.histogram("embedding_batch_ms", "Duração do forward pass em lote")
+    
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+                self._thread.start()
+    
+    def submit(self, face: np.ndarray, model_name: Optional[str] = None) -> Future:
+        """
+        Enfileira um recorte preparado por detect_probe_face_array
+        
+        Args:
+            face: Recorte no formato de entrada do modelo
+            model_name: Modelo para o qual o recorte foi preparado (padrão o ativo)
+        
+        Returns:
+            Future com o embedding (float32) do recorte
+        """
+        self._ensure_started()
+        future: Future = Future()
+        self._queue.put((face, model_name or FaceRecognitionService.MODEL_NAME, future))
+        return future
+    
+    async def embed(self, face: np.ndarray, model_name: Optional[str] = None) -> np.ndarray:
+        """Versão assíncrona de submit, para uso nos endpoints"""
+        return await asyncio.wrap_future(self.submit(face, model_name))
+    
+    def _collect(self, first) -> list:
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait_ms / 1000.0
+        
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is _STOP:
+                # Reenfileira para o laço principal encerrar após este lote
+                self._queue.put(_STOP)
+                break
+            batch.append(item)
+        
+        return batch
+    
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is _STOP:
+                return
+            
+            # Requisições canceladas (cliente desconectou) não entram no lote
+            groups = {}
+            for face, model_name, future in self._collect(first):
+                if future.set_running_or_notify_cancel():
+                    groups.setdefault(model_name, []).append((face, future))
+            
+            for model_name, batch in groups.items():
+                self._embed_batch(model_name, batch)
+    
+    def _embed_batch(self, model_name: str, batch: list):
+        start = time.perf_counter()
+        try:
+            embeddings = self.embed_fn([face for face, _ in batch], model_name)
+        except Exception as e:
+            print(f"Erro no lote de embeddings: {str(e)}")
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        
+        self._batch_ms.observe((time.perf_counter() - start) * 1000)
+        self._batch_size.observe(len(batch))
+        for (_, future), embedding in zip(batch, embeddings):
+            future.set_result(embedding)
+    
+    def stop(self):
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join(timeout=5)
+
+
+# Instância única por processo
+embedding_batcher = EmbeddingBatcher(
+    FaceRecognitionService.embed_faces,
+    settings.EMBEDDING_BATCH_MAX_SIZE,
+    settings.EMBEDDING_BATCH_MAX_WAIT_MS
+)
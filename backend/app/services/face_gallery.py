@@ -0,0 +1,593 @@
+"""
+Galeria de embeddings em memória
+Mantém os embeddings (templates) dos colaboradores ativos em uma única
+matriz NumPy para que a busca seja um único produto matriz-vetor
+"""
+
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.employee import Employee, FaceTemplate
+from app.services.ann_index import IVFIndex
+from app.services.face_recognition_service import FaceRecognitionService
+from app.utils.embedding_codec import decode_embeddings, read_header
+
+
+class GalleryModelMismatch(ValueError):
+    """O probe foi gerado por um modelo diferente do da galeria (troca em andamento)"""
+    pass
+
+
+class FaceGallery:
+    """
+    Galeria de faces do processo
+    
+    Os embeddings são armazenados normalizados (L2) em float32, de modo que
+    o produto interno com um probe normalizado é a similaridade cosseno.
+    Cada colaborador pode ter vários templates (a foto do cadastro e as de
+    face_templates), um por linha da matriz; a busca pontua todas as linhas
+    e agrega por colaborador (GALLERY_TEMPLATE_AGGREGATION) na mesma
+    passada vetorizada.
+    
+    Alterações incrementais não reescrevem a matriz: novas linhas são
+    adicionadas no fim (capacidade dobrada quando necessário) e remoções
+    apenas marcam a linha como inválida (tombstone). A compactação ocorre
+    quando os tombstones passam do limite configurado.
+    
+    Com GALLERY_ANN_ENABLED e ao menos GALLERY_ANN_MIN_SIZE templates, a
+    busca usa um índice IVF (ver ann_index) em vez da varredura completa.
+    O treino é feito na carga; quando uma alteração incremental exige
+    retreinar, ele roda em uma thread e as buscas continuam com o índice
+    anterior (ou a varredura exata) até a troca.
+    """
+    
+    INITIAL_CAPACITY = 16
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._matrix = np.zeros((0, 0), dtype=np.float32)
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._slots = np.zeros(0, dtype=np.int64)  # índice denso do colaborador de cada linha
+        self._valid = np.zeros(0, dtype=bool)
+        self._size = 0
+        self._tombstones = 0
+        self._rows_of: Dict[int, List[int]] = {}
+        self._slot_of: Dict[int, int] = {}
+        self._slot_ids = np.zeros(0, dtype=np.int64)
+        self._active: set = set()
+        self._version = 0
+        self._loaded = False
+        self._layout = 0  # muda sempre que as linhas são renumeradas
+        self._ann: Optional[IVFIndex] = None
+        self._ann_trained_size = 0
+        self._ann_thread: Optional[threading.Thread] = None
+        self._model_name = FaceRecognitionService.MODEL_NAME
+    
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        """Normaliza vetores (linhas) para norma L2 unitária em float32"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+    
+    @property
+    def is_loaded(self) -> bool:
+        return self._loaded
+    
+    @property
+    def model_name(self) -> str:
+        """Modelo que gerou os embeddings da galeria"""
+        return self._model_name
+    
+    def use_model(self, model_name: str):
+        """
+        Define o modelo de uma galeria ainda não carregada (scripts que só
+        publicam alterações); galerias carregadas trocam de modelo por load()
+        """
+        with self._lock:
+            if self._loaded and model_name != self._model_name:
+                raise ValueError(f"Galeria carregada com {self._model_name}; recarregue com {model_name}")
+            self._model_name = model_name
+    
+    @property
+    def version(self) -> int:
+        """Versão da galeria, incrementada a cada alteração"""
+        return self._version
+    
+    @property
+    def tombstones(self) -> int:
+        return self._tombstones
+    
+    @property
+    def rows(self) -> int:
+        """Templates válidos (linhas da matriz)"""
+        return self._size - self._tombstones
+    
+    def __len__(self) -> int:
+        """Colaboradores ativos"""
+        return len(self._active)
+    
+    def load(self, db: Session, model_name: Optional[str] = None) -> int:
+        """
+        Carrega (ou recarrega) os embeddings de todos os colaboradores ativos:
+        o da foto do cadastro e os templates adicionais
+        
+        A troca do conteúdo (e do modelo) é atômica para as buscas.
+        Embeddings gerados por outro modelo são ignorados.
+        
+        Args:
+            db: Sessão do banco
+            model_name: Modelo dos embeddings carregados (padrão o modelo ativo)
+        
+        Returns:
+            Quantidade de colaboradores carregados
+        """
+        model_name = model_name or FaceRecognitionService.MODEL_NAME
+        
+        primary = (
+            db.query(Employee.id, Employee.face_encoding)
+            .filter(Employee.is_active == True)
+            .order_by(Employee.id)
+            .yield_per(1000)
+        )
+        templates = (
+            db.query(FaceTemplate.employee_id, FaceTemplate.embedding)
+            .join(Employee, FaceTemplate.employee_id == Employee.id)
+            .filter(Employee.is_active == True)
+            .order_by(FaceTemplate.employee_id, FaceTemplate.id)
+            .yield_per(1000)
+        )
+        
+        all_ids = []
+        blobs = []
+        for rows in (primary, templates):
+            for employee_id, encoding in rows:
+                all_ids.append(employee_id)
+                blobs.append(bytes(encoding))
+        
+        # Caminho rápido: todos no mesmo formato binário e do mesmo modelo
+        try:
+            if not blobs or read_header(blobs[0]).model_name == model_name:
+                return self.load_embeddings(all_ids, decode_embeddings(blobs), model_name)
+        except ValueError:
+            pass
+        
+        ids = []
+        vectors = []
+        skipped = 0
+        for employee_id, encoding in zip(all_ids, blobs):
+            try:
+                vector = FaceRecognitionService.decode_encoding_for(encoding, model_name)
+                if vector is None:
+                    skipped += 1
+                    continue
+                vectors.append(vector)
+                ids.append(employee_id)
+            except Exception as e:
+                print(f"Erro ao carregar encoding do colaborador {employee_id}: {str(e)}")
+        
+        if skipped:
+            print(f"⚠️ {skipped} embeddings de outro modelo ignorados (modelo da galeria: {model_name})")
+        
+        return self.load_embeddings(ids, vectors, model_name)
+    
+    def load_embeddings(self, ids: List[int], vectors: List[np.ndarray], model_name: Optional[str] = None) -> int:
+        """
+        Substitui o conteúdo da galeria pelos embeddings informados
+        
+        Args:
+            ids: ID do colaborador de cada embedding (repetido para vários templates)
+            vectors: Embeddings na mesma ordem de ids
+            model_name: Modelo que gerou os embeddings (padrão: mantém o atual)
+        
+        Returns:
+            Quantidade de colaboradores carregados
+        """
+        size = len(ids)
+        capacity = max(size, self.INITIAL_CAPACITY)
+        
+        if size:
+            normalized = self._normalize(np.vstack(vectors))
+            matrix = np.zeros((capacity, normalized.shape[1]), dtype=np.float32)
+            matrix[:size] = normalized
+        else:
+            matrix = np.zeros((0, 0), dtype=np.float32)
+        
+        ids_array = np.zeros(capacity, dtype=np.int64)
+        ids_array[:size] = ids
+        valid = np.zeros(capacity, dtype=bool)
+        valid[:size] = True
+        
+        slot_ids, slots = np.unique(ids_array[:size], return_inverse=True)
+        slots_array = np.zeros(capacity, dtype=np.int64)
+        slots_array[:size] = slots.reshape(-1)
+        
+        rows_of: Dict[int, List[int]] = {}
+        for row, employee_id in enumerate(ids):
+            rows_of.setdefault(int(employee_id), []).append(row)
+        
+        with self._lock:
+            self._matrix = matrix
+            self._ids = ids_array
+            self._slots = slots_array
+            self._valid = valid
+            self._size = size
+            self._tombstones = 0
+            self._rows_of = rows_of
+            self._slot_ids = slot_ids.astype(np.int64)
+            self._slot_of = {int(employee_id): slot for slot, employee_id in enumerate(slot_ids)}
+            self._active = set(rows_of)
+            self._model_name = model_name or self._model_name
+            self._version += 1
+            self._loaded = True
+            self._layout += 1
+            self._ann = None
+        
+        self._refresh_ann()
+        return len(rows_of)
+    
+    def _ensure_capacity(self, dim: int, count: int):
+        """Garante espaço para mais count linhas, dobrando a capacidade. Requer o lock."""
+        if self._matrix.shape[1] == 0:
+            # Galeria vazia: a dimensão é definida pelo primeiro embedding
+            self._matrix = np.zeros((self._ids.shape[0], dim), dtype=np.float32)
+        elif self._matrix.shape[1] != dim:
+            raise ValueError(f"Dimensão do embedding ({dim}) difere da galeria ({self._matrix.shape[1]})")
+        
+        capacity = self._ids.shape[0]
+        if self._size + count <= capacity:
+            return
+        
+        new_capacity = max(capacity, self.INITIAL_CAPACITY)
+        while new_capacity < self._size + count:
+            new_capacity *= 2
+        
+        matrix = np.zeros((new_capacity, dim), dtype=np.float32)
+        matrix[:self._size] = self._matrix[:self._size]
+        ids = np.zeros(new_capacity, dtype=np.int64)
+        ids[:self._size] = self._ids[:self._size]
+        slots = np.zeros(new_capacity, dtype=np.int64)
+        slots[:self._size] = self._slots[:self._size]
+        valid = np.zeros(new_capacity, dtype=bool)
+        valid[:self._size] = self._valid[:self._size]
+        
+        self._matrix, self._ids, self._slots, self._valid = matrix, ids, slots, valid
+    
+    def _slot(self, employee_id: int) -> int:
+        """Índice denso do colaborador, criado no primeiro template. Requer o lock."""
+        slot = self._slot_of.get(employee_id)
+        if slot is None:
+            slot = len(self._slot_of)
+            if slot >= self._slot_ids.shape[0]:
+                slot_ids = np.zeros(max(slot * 2, self.INITIAL_CAPACITY), dtype=np.int64)
+                slot_ids[:slot] = self._slot_ids[:slot]
+                self._slot_ids = slot_ids
+            self._slot_ids[slot] = employee_id
+            self._slot_of[employee_id] = slot
+        return slot
+    
+    def _append_rows(self, employee_id: int, vectors: np.ndarray):
+        """Grava templates no fim da matriz. Requer o lock."""
+        self._ensure_capacity(vectors.shape[1], vectors.shape[0])
+        
+        rows = np.arange(self._size, self._size + vectors.shape[0])
+        self._matrix[rows] = vectors
+        self._ids[rows] = employee_id
+        self._slots[rows] = self._slot(employee_id)
+        self._valid[rows] = True
+        self._rows_of.setdefault(employee_id, []).extend(rows.tolist())
+        self._active.add(employee_id)
+        self._size += vectors.shape[0]
+        
+        if self._ann is not None:
+            self._ann.add_rows(rows, vectors)
+    
+    def _tombstone_row(self, row: int):
+        """Marca uma linha como removida. Requer o lock."""
+        if self._valid[row]:
+            self._valid[row] = False
+            self._tombstones += 1
+    
+    def _maybe_compact(self):
+        """Compacta a matriz se os tombstones passaram do limite. Requer o lock."""
+        limit = max(
+            settings.GALLERY_COMPACTION_MIN_TOMBSTONES,
+            int(self._size * settings.GALLERY_COMPACTION_RATIO)
+        )
+        if self._tombstones > limit:
+            self._compact()
+    
+    def _compact(self):
+        """Remove fisicamente as linhas marcadas como removidas. Requer o lock."""
+        keep = np.flatnonzero(self._valid[:self._size])
+        size = keep.shape[0]
+        capacity = max(size * 2, self.INITIAL_CAPACITY)
+        
+        matrix = np.zeros((capacity, self._matrix.shape[1]), dtype=np.float32)
+        matrix[:size] = self._matrix[keep]
+        ids = np.zeros(capacity, dtype=np.int64)
+        ids[:size] = self._ids[keep]
+        valid = np.zeros(capacity, dtype=bool)
+        valid[:size] = True
+        
+        slot_ids, slots = np.unique(ids[:size], return_inverse=True)
+        slots_array = np.zeros(capacity, dtype=np.int64)
+        slots_array[:size] = slots.reshape(-1)
+        
+        rows_of: Dict[int, List[int]] = {}
+        for row, employee_id in enumerate(ids[:size].tolist()):
+            rows_of.setdefault(employee_id, []).append(row)
+        
+        # Arrays novos: buscas em andamento continuam usando o snapshot antigo
+        self._matrix, self._ids, self._slots, self._valid = matrix, ids, slots_array, valid
+        self._size = size
+        self._tombstones = 0
+        self._rows_of = rows_of
+        self._slot_ids = slot_ids.astype(np.int64)
+        self._slot_of = {int(employee_id): slot for slot, employee_id in enumerate(slot_ids)}
+        self._layout += 1
+        
+        # Mantém os centróides; apenas redistribui as novas linhas
+        if self._ann is not None:
+            self._ann = self._ann.reassigned(matrix[:size])
+    
+    def compact(self):
+        """Força a compactação da galeria"""
+        with self._lock:
+            self._compact()
+    
+    def _after_change(self) -> int:
+        """Versão nova + compactação e, se necessário, treino do índice em background"""
+        with self._lock:
+            self._version += 1
+            self._maybe_compact()
+            version = self._version
+        
+        if self._ann_needs_refresh():
+            self._schedule_ann_refresh()
+        
+        return version
+    
+    def add(self, employee_id: int, embedding: np.ndarray) -> int:
+        """
+        Adiciona (ou substitui) os templates de um colaborador
+        
+        As linhas antigas, se existirem, viram tombstones e os novos
+        embeddings são gravados no fim da matriz, sem alterar linhas
+        visíveis a buscas em andamento.
+        
+        Args:
+            employee_id: ID do colaborador
+            embedding: Embedding da face ou matriz (n, dim) com todos os templates
+        
+        Returns:
+            Nova versão da galeria
+        """
+        vectors = self._normalize(np.atleast_2d(embedding))
+        
+        with self._lock:
+            for row in self._rows_of.pop(employee_id, []):
+                self._tombstone_row(row)
+            self._append_rows(employee_id, vectors)
+        
+        return self._after_change()
+    
+    def add_templates(self, employee_id: int, embeddings: np.ndarray) -> int:
+        """
+        Acrescenta templates a um colaborador, mantendo os existentes
+        
+        Args:
+            employee_id: ID do colaborador
+            embeddings: Matriz (n, dim) com os novos templates
+        
+        Returns:
+            Nova versão da galeria
+        """
+        vectors = self._normalize(np.atleast_2d(embeddings))
+        
+        with self._lock:
+            self._append_rows(employee_id, vectors)
+        
+        return self._after_change()
+    
+    def remove(self, employee_id: int) -> int:
+        """
+        Remove um colaborador da galeria (tombstone de todos os templates)
+        
+        Args:
+            employee_id: ID do colaborador
+        
+        Returns:
+            Nova versão da galeria
+        """
+        with self._lock:
+            for row in self._rows_of.get(employee_id, []):
+                self._tombstone_row(row)
+            self._active.discard(employee_id)
+            self._version += 1
+            
+            self._maybe_compact()
+            return self._version
+    
+    def reactivate(self, employee_id: int, embedding: Optional[np.ndarray] = None) -> int:
+        """
+        Reativa um colaborador removido
+        
+        Se as linhas ainda não foram compactadas basta desmarcar os
+        tombstones; caso contrário os embeddings informados são adicionados
+        novamente.
+        
+        Args:
+            employee_id: ID do colaborador
+            embedding: Embeddings armazenados do colaborador (um ou matriz (n, dim))
+        
+        Returns:
+            Nova versão da galeria
+        """
+        with self._lock:
+            rows = self._rows_of.get(employee_id)
+            if rows:
+                for row in rows:
+                    if not self._valid[row]:
+                        self._valid[row] = True
+                        self._tombstones -= 1
+                self._active.add(employee_id)
+                self._version += 1
+                return self._version
+        
+        if embedding is None:
+            raise ValueError(f"Colaborador {employee_id} não está na galeria e nenhum embedding foi informado")
+        
+        return self.add(employee_id, embedding)
+    
+    def _ann_needs_refresh(self) -> bool:
+        """Índice inexistente acima do limite ou galeria dobrou desde o treino"""
+        if not settings.GALLERY_ANN_ENABLED or self.rows < settings.GALLERY_ANN_MIN_SIZE:
+            return False
+        return self._ann is None or self.rows >= 2 * self._ann_trained_size
+    
+    def _schedule_ann_refresh(self):
+        """
+        Treina o índice em uma thread, sem bloquear quem alterou a galeria
+        
+        O k-means leva segundos em galerias grandes e add/remove rodam na
+        thread da requisição. Um treino por vez; alterações durante o
+        treino são reavaliadas na próxima alteração.
+        """
+        with self._lock:
+            if self._ann_thread is not None and self._ann_thread.is_alive():
+                return
+            self._ann_thread = threading.Thread(target=self._run_ann_refresh, name="gallery-ann", daemon=True)
+            self._ann_thread.start()
+    
+    def _run_ann_refresh(self):
+        try:
+            self._refresh_ann()
+        except Exception as e:
+            print(f"⚠️ Erro ao treinar o índice ANN da galeria: {str(e)}")
+    
+    def _refresh_ann(self):
+        """
+        (Re)treina o índice IVF sobre as linhas válidas
+        
+        O treino roda fora do lock sobre um snapshot; linhas adicionadas
+        durante o treino são incluídas antes da troca do índice.
+        """
+        if not settings.GALLERY_ANN_ENABLED:
+            return
+        
+        with self._lock:
+            size = self._size
+            matrix = self._matrix[:size]
+            valid = self._valid[:size].copy()
+            layout = self._layout
+        
+        rows = np.flatnonzero(valid)
+        if rows.shape[0] < settings.GALLERY_ANN_MIN_SIZE:
+            return
+        
+        nlist = settings.GALLERY_ANN_NLIST or IVFIndex.default_nlist(rows.shape[0])
+        index = IVFIndex(nlist=nlist, nprobe=settings.GALLERY_ANN_NPROBE)
+        index.train(matrix[rows])
+        index.add_rows(rows, matrix[rows])
+        
+        with self._lock:
+            if self._layout != layout:
+                # Linhas renumeradas durante o treino; tenta novamente na próxima alteração
+                return
+            if self._size > size:
+                extra = np.arange(size, self._size)
+                index.add_rows(extra, self._matrix[size:self._size])
+            self._ann = index
+            self._ann_trained_size = rows.shape[0]
+    
+    def search(
+        self,
+        probe_embedding: np.ndarray,
+        k: int = 1,
+        exact: bool = False,
+        nprobe: Optional[int] = None,
+        model_name: Optional[str] = None
+    ) -> List[Tuple[int, float]]:
+        """
+        Retorna os k colaboradores mais similares ao probe
+        
+        Todos os templates são pontuados em um único produto matriz-vetor e
+        agregados por colaborador: "max" usa o template mais parecido e
+        "mean" a média das similaridades (produto interno com o centróide
+        dos templates). Com o índice ANN a agregação considera apenas os
+        templates candidatos.
+        
+        Args:
+            probe_embedding: Embedding da face capturada
+            k: Quantidade de resultados
+            exact: Força a varredura completa mesmo com índice ANN
+            nprobe: Partições visitadas pelo índice ANN (padrão GALLERY_ANN_NPROBE)
+            model_name: Modelo que gerou o probe; se diferente do da galeria
+                levanta GalleryModelMismatch
+        
+        Returns:
+            Lista de (employee_id, similaridade) em ordem decrescente
+        """
+        with self._lock:
+            if model_name is not None and model_name != self._model_name:
+                raise GalleryModelMismatch(
+                    f"Probe gerado por {model_name}, galeria usa {self._model_name}"
+                )
+            size = self._size
+            matrix = self._matrix[:size]
+            slots = self._slots[:size]
+            slot_ids = self._slot_ids
+            valid = self._valid[:size].copy()
+            active = size - self._tombstones
+            ann = self._ann
+        
+        if active == 0:
+            return []
+        
+        probe = self._normalize(probe_embedding).reshape(-1)
+        if probe.shape[0] != matrix.shape[1]:
+            raise ValueError(
+                f"Dimensão do probe ({probe.shape[0]}) difere da galeria ({matrix.shape[1]})"
+            )
+        
+        if ann is not None and not exact and active >= settings.GALLERY_ANN_MIN_SIZE:
+            rows = ann.candidates(probe, nprobe)
+            rows = rows[rows < size]
+            rows = rows[valid[rows]]
+            scores = matrix[rows] @ probe
+        else:
+            rows = np.flatnonzero(valid)
+            scores = (matrix @ probe)[rows]
+        
+        if rows.shape[0] == 0:
+            return []
+        
+        row_slots = slots[rows]
+        slot_count = int(row_slots.max()) + 1
+        
+        if settings.GALLERY_TEMPLATE_AGGREGATION == "mean":
+            counts = np.bincount(row_slots, minlength=slot_count)
+            totals = np.bincount(row_slots, weights=scores, minlength=slot_count)
+            aggregated = np.full(slot_count, -np.inf)
+            scored = counts > 0
+            aggregated[scored] = totals[scored] / counts[scored]
+        else:
+            aggregated = np.full(slot_count, -np.inf, dtype=np.float32)
+            np.maximum.at(aggregated, row_slots, scores)
+        
+        candidates = np.flatnonzero(np.isfinite(aggregated))
+        k = min(k, candidates.shape[0])
+        top = candidates[np.argpartition(-aggregated[candidates], k - 1)[:k]]
+        top = top[np.argsort(-aggregated[top])]
+        
+        return [(int(slot_ids[i]), float(aggregated[i])) for i in top]
+
+
+# Instância única por processo
+face_gallery = FaceGallery()
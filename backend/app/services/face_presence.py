@@ -0,0 +1,65 @@
+"""
+Verificação rápida de presença de face
+Detector Haar do OpenCV sobre o frame reduzido, usado para descartar
+frames vazios antes do pipeline completo (liveness, DeepFace, galeria)
+"""
+
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from app.config import settings
+from app.core.metrics import metrics
+
+_local = threading.local()
+
+
+class FacePresenceService:
+    """
+    Detector barato e permissivo: só responde se há algo parecido com uma
+    face. A detecção e o alinhamento de verdade continuam no DeepFace.
+    """
+    
+    CASCADE_PATH = cv2.data.haarcascades + "haarcascade_frontalface_default.xml"
+    
+    @staticmethod
+    def _classifier() -> cv2.CascadeClassifier:
+        # CascadeClassifier não é thread-safe: uma instância por thread do pool
+        classifier = getattr(_local, "classifier", None)
+        if classifier is None:
+            classifier = cv2.CascadeClassifier(FacePresenceService.CASCADE_PATH)
+            _local.classifier = classifier
+        return classifier
+    
+    @staticmethod
+    def has_face(gray: np.ndarray) -> bool:
+        """
+        Indica se há ao menos uma face no frame
+        
+        Args:
+            gray: Frame em escala de cinza já reduzido (FACE_PRESENCE_MAX_SIDE)
+        
+        Returns:
+            True se o detector encontrou alguma face
+        """
+        start = time.perf_counter()
+        
+        min_side = max(int(min(gray.shape[:2]) * settings.FACE_PRESENCE_MIN_FACE_RATIO), 20)
+        faces = FacePresenceService._classifier().detectMultiScale(
+            gray,
+            scaleFactor=1.2,
+            minNeighbors=3,
+            minSize=(min_side, min_side)
+        )
+        present = len(faces) > 0
+        
+        elapsed = (time.perf_counter() - start) * 1000
+        metrics.counter("face_presence_checked_total", "Frames verificados pelo filtro de presença").inc()
+        if not present:
+            metrics.counter("face_presence_rejected_total", "Frames descartados sem face").inc()
+        if elapsed > settings.FACE_PRESENCE_BUDGET_MS:
+            metrics.counter("face_presence_over_budget_total", "Verificações acima de FACE_PRESENCE_BUDGET_MS").inc()
+        
+        return present
@@ -6,36 +6,68 @@ Mais moderno, preciso e fácil de instalar que dlib
 from deepface import DeepFace
 import numpy as np
 import cv2
-from typing import Optional, Tuple, Dict
-import pickle
+from typing import Optional, Tuple, Dict, List
 from app.config import settings
+from app.utils.embedding_codec import encode_embedding, decode_embedding, decode_legacy_pickle, is_encoded, read_header
 import os
 
 class FaceRecognitionService:
     
-    # Modelo a ser usado (pode ser: VGG-Face, Facenet, OpenFace, DeepFace, DeepID, ArcFace, Dlib, SFace)
-    MODEL_NAME = "Facenet"  # Facenet é rápido e preciso
-    DETECTOR_BACKEND = "opencv"  # opencv, ssd, dlib, mtcnn, retinaface
+    SUPPORTED_MODELS = [
+        "VGG-Face", "Facenet", "Facenet512", "OpenFace", "DeepFace",
+        "DeepID", "ArcFace", "Dlib", "SFace", "GhostFaceNet"
+    ]
+    SUPPORTED_DETECTORS = [
+        "opencv", "ssd", "dlib", "mtcnn", "fastmtcnn", "retinaface",
+        "mediapipe", "yolov8", "yunet", "centerface"
+    ]
+    
+    # Modelo ativo do processo: começa com o configurado e é trocado
+    # (use_model) quando um job de re-embedding é ativado
+    MODEL_NAME = settings.FACE_RECOGNITION_MODEL
+    DETECTOR_BACKEND = settings.FACE_DETECTOR_BACKEND
     
     @staticmethod
-    def encode_face(image_path: str) -> Optional[bytes]:
+    def use_model(model_name: str, detector_backend: str):
+        """Troca o modelo de embedding e o detector usados por padrão"""
+        FaceRecognitionService.MODEL_NAME = model_name
+        FaceRecognitionService.DETECTOR_BACKEND = detector_backend
+    
+    @staticmethod
+    def _load(image_path: str) -> Optional[np.ndarray]:
+        """Lê a imagem do disco para as versões *_array (entradas por caminho)"""
+        if not os.path.exists(image_path):
+            print(f"Arquivo não encontrado: {image_path}")
+            return None
+        
+        return cv2.imread(image_path)
+    
+    @staticmethod
+    def _represent(image_path: str) -> Optional[np.ndarray]:
         """
-        Gera embedding da face usando DeepFace
+        Versão de _represent_array que lê a imagem do disco
+        """
+        image = FaceRecognitionService._load(image_path)
+        if image is None:
+            return None
+        
+        return FaceRecognitionService._represent_array(image)
+    
+    @staticmethod
+    def _represent_array(image: np.ndarray) -> Optional[np.ndarray]:
+        """
+        Executa detecção + modelo de embedding sobre a imagem
         
         Args:
-            image_path: Caminho para a imagem
-            
+            image: Imagem BGR já decodificada
+        
         Returns:
-            bytes serializados com o embedding da face ou None se falhar
+            Embedding da primeira face detectada ou None se falhar
         """
         try:
-            if not os.path.exists(image_path):
-                print(f"Arquivo não encontrado: {image_path}")
-                return None
-            
             # Extrai embedding da face
             embedding_objs = DeepFace.represent(
-                img_path=image_path,
+                img_path=image,
                 model_name=FaceRecognitionService.MODEL_NAME,
                 enforce_detection=True,
                 detector_backend=FaceRecognitionService.DETECTOR_BACKEND
@@ -45,11 +77,8 @@ class FaceRecognitionService:
                 return None
             
             # Pega o primeiro embedding (primeira face detectada)
-            embedding = np.array(embedding_objs[0]["embedding"])
-            
-            # Serializa para bytes
-            return pickle.dumps(embedding)
-            
+            return np.array(embedding_objs[0]["embedding"])
+        
         except ValueError as e:
             print(f"Nenhuma face detectada: {str(e)}")
             return None
@@ -58,125 +87,369 @@ class FaceRecognitionService:
             return None
     
     @staticmethod
-    def compare_faces(known_encoding: bytes, unknown_image_path: str) -> Tuple[bool, float]:
+    def encode_face(image_path: str) -> Optional[bytes]:
         """
-        Compara face conhecida com imagem desconhecida
+        Versão de encode_face_array que lê a imagem do disco
+        """
+        image = FaceRecognitionService._load(image_path)
+        if image is None:
+            return None
+        
+        return FaceRecognitionService.encode_face_array(image)
+    
+    @staticmethod
+    def encode_face_array(image: np.ndarray) -> Optional[bytes]:
+        """
+        Gera embedding da face usando DeepFace
         
         Args:
-            known_encoding: Encoding serializado da face conhecida
-            unknown_image_path: Caminho para a imagem a ser comparada
+            image: Imagem BGR já decodificada
+        
+        Returns:
+            bytes serializados com o embedding da face ou None se falhar
+        """
+        embedding = FaceRecognitionService._represent_array(image)
+        
+        if embedding is None:
+            return None
+        
+        # Serializa no formato binário float32 (ver embedding_codec)
+        return encode_embedding(embedding, FaceRecognitionService.MODEL_NAME)
+    
+    @staticmethod
+    def encode_face_crop(face_crop: np.ndarray, model_name: Optional[str] = None) -> bytes:
+        """
+        Gera o encoding a partir de um recorte já detectado e preparado
+        (ver prepare_face), sem detectar a face novamente
+        
+        Args:
+            face_crop: Recorte no formato de entrada do modelo
+            model_name: Modelo para o qual o recorte foi preparado (padrão MODEL_NAME)
+        
+        Returns:
+            bytes serializados com o embedding da face
+        """
+        model_name = model_name or FaceRecognitionService.MODEL_NAME
+        embedding = FaceRecognitionService.embed_faces([face_crop], model_name)[0]
+        return encode_embedding(embedding, model_name)
+    
+    @staticmethod
+    def decode_encoding(face_encoding: bytes) -> np.ndarray:
+        """
+        Deserializa um encoding armazenado em Employee.face_encoding
+        
+        Args:
+            face_encoding: bytes gerados por encode_face
+        
+        Returns:
+            Embedding como array NumPy (float32, sem cópia)
+        """
+        if is_encoded(face_encoding):
+            return decode_embedding(face_encoding)
+        
+        # Linhas ainda não convertidas pela migração 002_embedding_float32
+        return decode_legacy_pickle(face_encoding)
+    
+    @staticmethod
+    def decode_encoding_for(face_encoding: bytes, model_name: str) -> Optional[np.ndarray]:
+        """
+        decode_encoding só para embeddings do modelo informado
+        
+        Fotos que um re-embedding não conseguiu reprocessar mantêm o vetor
+        do modelo anterior; pickles legados não guardam o modelo e são
+        considerados do modelo informado.
+        
+        Returns:
+            Embedding, ou None se foi gerado por outro modelo
+        """
+        if is_encoded(face_encoding) and read_header(face_encoding).model_name != model_name:
+            return None
+        return FaceRecognitionService.decode_encoding(face_encoding)
+    
+    @staticmethod
+    def embed_probe(image_path: str) -> Optional[np.ndarray]:
+        """
+        Gera o embedding da face desconhecida (probe)
+        
+        Deve ser chamado uma única vez por requisição; o resultado é
+        reutilizado em match_embedding para cada colaborador.
+        
+        Args:
+            image_path: Caminho para a imagem capturada
+        
+        Returns:
+            Embedding da face ou None se nenhuma face for detectada
+        """
+        return FaceRecognitionService._represent(image_path)
+    
+    @staticmethod
+    def embed_probe_array(image: np.ndarray) -> Optional[np.ndarray]:
+        """
+        Versão de embed_probe para imagem já decodificada
+        
+        Args:
+            image: Imagem BGR do probe
+        
+        Returns:
+            Embedding da face ou None se nenhuma face for detectada
+        """
+        return FaceRecognitionService._represent_array(image)
+    
+    @staticmethod
+    def detect_probe_face(image_path: str) -> Optional[np.ndarray]:
+        """
+        Versão de detect_probe_face_array que lê a imagem do disco
+        """
+        image = FaceRecognitionService._load(image_path)
+        if image is None:
+            return None
+        
+        return FaceRecognitionService.detect_probe_face_array(image)
+    
+    @staticmethod
+    def detect_faces(image: np.ndarray) -> List[Dict]:
+        """
+        Detecta e alinha as faces da imagem
+        
+        Args:
+            image: Imagem BGR já decodificada
+        
+        Returns:
+            Lista no formato de DeepFace.extract_faces (face RGB em [0, 1],
+            facial_area, confidence); vazia se nenhuma face for detectada
+        """
+        try:
+            return DeepFace.extract_faces(
+                img_path=image,
+                detector_backend=FaceRecognitionService.DETECTOR_BACKEND,
+                enforce_detection=True,
+                align=True
+            )
+        except ValueError as e:
+            print(f"Nenhuma face detectada: {str(e)}")
+            return []
+    
+    @staticmethod
+    def detect_probe_face_array(image: np.ndarray) -> Optional[np.ndarray]:
+        """
+        Detecta a face do probe e a prepara para o modelo de embedding
+        
+        Separa a detecção do forward pass para que os recortes de várias
+        requisições possam ser processados juntos em embed_faces.
+        
+        Args:
+            image: Imagem BGR do probe
+        
+        Returns:
+            Recorte BGR float32 em [0, 1] no tamanho de entrada do modelo
+            ou None se nenhuma face for detectada
+        """
+        try:
+            face_objs = FaceRecognitionService.detect_faces(image)
             
+            if not face_objs:
+                return None
+            
+            return FaceRecognitionService.prepare_face(face_objs[0]["face"])
+        
+        except Exception as e:
+            print(f"Erro ao processar face: {str(e)}")
+            return None
+    
+    @staticmethod
+    def prepare_face(face_rgb: np.ndarray, model_name: Optional[str] = None) -> np.ndarray:
+        """
+        Converte um recorte de extract_faces (RGB em [0, 1]) para a entrada do
+        modelo, com o mesmo pré-processamento de DeepFace.represent
+        
+        Args:
+            face_rgb: Face retornada por DeepFace.extract_faces
+            model_name: Modelo de destino (padrão MODEL_NAME)
+        
+        Returns:
+            Array (altura, largura, 3) float32
+        """
+        from deepface.modules import preprocessing
+        
+        model = DeepFace.build_model(model_name or FaceRecognitionService.MODEL_NAME)
+        target_size = model.input_shape
+        
+        face = preprocessing.resize_image(
+            img=face_rgb[:, :, ::-1],
+            target_size=(target_size[1], target_size[0])
+        )
+        return face[0].astype(np.float32)
+    
+    @staticmethod
+    def embed_faces(faces: List[np.ndarray], model_name: Optional[str] = None) -> np.ndarray:
+        """
+        Gera os embeddings de vários recortes em um único forward pass
+        
+        Args:
+            faces: Recortes retornados por detect_probe_face_array
+            model_name: Modelo para o qual os recortes foram preparados (padrão MODEL_NAME)
+        
+        Returns:
+            Matriz (len(faces), dimensão) float32, na ordem de entrada
+        """
+        model = DeepFace.build_model(model_name or FaceRecognitionService.MODEL_NAME)
+        batch = np.stack(faces).astype(np.float32, copy=False)
+        
+        # model.forward só devolve o primeiro item; chama o modelo Keras direto.
+        # Dlib e SFace não são Keras: um forward por recorte
+        if not callable(getattr(getattr(model, "model", None), "predict", None)):
+            return np.asarray([model.forward(face[np.newaxis]) for face in batch], dtype=np.float32)
+        
+        return np.asarray(model.model(batch, training=False), dtype=np.float32)
+    
+    @staticmethod
+    def match_embedding(known_encoding: bytes, probe_embedding: np.ndarray) -> Tuple[bool, float]:
+        """
+        Compara um encoding armazenado com o embedding já calculado do probe
+        
+        Args:
+            known_encoding: Encoding serializado da face conhecida
+            probe_embedding: Embedding retornado por embed_probe
+        
         Returns:
             Tupla (match: bool, confidence: float)
         """
         try:
             # Deserializa o encoding conhecido
-            known_face = pickle.loads(known_encoding)
-            
-            # Processa a imagem desconhecida
-            unknown_encoding = FaceRecognitionService.encode_face(unknown_image_path)
+            known_face = FaceRecognitionService.decode_encoding(known_encoding)
+            probe = np.asarray(probe_embedding, dtype=np.float64)
             
-            if unknown_encoding is None:
-                return False, 0.0
-            
-            # Deserializa o encoding desconhecido
-            unknown_face = pickle.loads(unknown_encoding)
-            
-            # Calcula distância cosine entre os embeddings
-            from scipy.spatial.distance import cosine
-            distance = cosine(known_face, unknown_face)
-            
-            # Converte distância para similaridade (0-1, onde 1 é idêntico)
+            # Similaridade cosseno (0-1, onde 1 é idêntico)
             # Para Facenet, threshold típico de distância é 0.4
             # Convertendo: similarity = 1 - distance
-            similarity = 1 - distance
+            norm = np.linalg.norm(known_face) * np.linalg.norm(probe)
+            if norm == 0:
+                return False, 0.0
+            similarity = float(np.dot(known_face, probe) / norm)
             
             # Verifica se passou no threshold
             # Se FACE_RECOGNITION_TOLERANCE = 0.6, significa que aceitamos 60% de similaridade
             threshold = settings.FACE_RECOGNITION_TOLERANCE
             matches = similarity >= threshold
             
-            return matches, float(similarity)
-            
+            return matches, similarity
+        
         except Exception as e:
             print(f"Erro na comparação: {str(e)}")
             return False, 0.0
     
+    @staticmethod
+    def compare_faces(known_encoding: bytes, unknown_image_path: str) -> Tuple[bool, float]:
+        """
+        Compara face conhecida com imagem desconhecida
+        
+        Para comparar um probe com vários colaboradores use embed_probe
+        uma vez e match_embedding para cada encoding.
+        
+        Args:
+            known_encoding: Encoding serializado da face conhecida
+            unknown_image_path: Caminho para a imagem a ser comparada
+        
+        Returns:
+            Tupla (match: bool, confidence: float)
+        """
+        probe_embedding = FaceRecognitionService.embed_probe(unknown_image_path)
+        
+        if probe_embedding is None:
+            return False, 0.0
+        
+        return FaceRecognitionService.match_embedding(known_encoding, probe_embedding)
+    
     @staticmethod
     def validate_face_image(image_path: str) -> Dict:
+        """
+        Versão de validate_face_array que lê a imagem do disco
+        """
+        if not os.path.exists(image_path):
+            return {
+                "valid": False,
+                "error": "Arquivo de imagem não encontrado"
+            }
+        
+        return FaceRecognitionService.validate_face_array(cv2.imread(image_path))
+    
+    @staticmethod
+    def validate_face_array(image: Optional[np.ndarray]) -> Dict:
         """
         Valida se a imagem contém uma face válida
         
         Args:
-            image_path: Caminho para a imagem
-            
+            image: Imagem BGR já decodificada (None se a decodificação falhou)
+        
         Returns:
             Dict com resultado da validação
         """
         try:
-            if not os.path.exists(image_path):
+            if image is None:
                 return {
                     "valid": False,
-                    "error": "Arquivo de imagem não encontrado"
+                    "error": "Imagem inválida ou corrompida"
                 }
             
-            # Extrai faces da imagem
-            result = DeepFace.extract_faces(
-                img_path=image_path,
-                enforce_detection=True,
-                detector_backend=FaceRecognitionService.DETECTOR_BACKEND,
-                align=True
+            return FaceRecognitionService.validate_detected_faces(
+                FaceRecognitionService.detect_faces(image)
             )
-            
-            if not result:
-                return {
-                    "valid": False,
-                    "error": "Nenhuma face detectada na imagem"
-                }
-            
-            if len(result) > 1:
-                return {
-                    "valid": False,
-                    "error": "Múltiplas faces detectadas. Use uma imagem com apenas uma pessoa"
-                }
-            
-            # Verifica tamanho da face
-            face_info = result[0]
-            facial_area = face_info.get("facial_area", {})
-            
-            width = facial_area.get("w", 0)
-            height = facial_area.get("h", 0)
-            
-            if width < settings.MIN_FACE_SIZE or height < settings.MIN_FACE_SIZE:
-                return {
-                    "valid": False,
-                    "error": f"Face muito pequena. Tamanho mínimo: {settings.MIN_FACE_SIZE}px"
-                }
-            
-            # Verifica confiança da detecção
-            confidence = face_info.get("confidence", 0)
-            if confidence < 0.8:  # 80% de confiança mínima
-                return {
-                    "valid": False,
-                    "error": f"Baixa confiança na detecção facial: {confidence:.2%}"
-                }
-            
+        
+        except Exception as e:
+            return {
+                "valid": False,
+                "error": f"Erro ao processar imagem: {str(e)}"
+            }
+    
+    @staticmethod
+    def validate_detected_faces(faces: List[Dict]) -> Dict:
+        """
+        Valida o resultado de uma detecção já feita (ver detect_faces)
+        
+        Args:
+            faces: Faces no formato de DeepFace.extract_faces
+        
+        Returns:
+            Dict com resultado da validação
+        """
+        if not faces:
             return {
-                "valid": True,
-                "face_location": facial_area,
-                "confidence": confidence
+                "valid": False,
+                "error": "Nenhuma face detectada na imagem"
             }
-            
-        except ValueError as e:
+        
+        if len(faces) > 1:
             return {
                 "valid": False,
-                "error": f"Nenhuma face detectada: {str(e)}"
+                "error": "Múltiplas faces detectadas. Use uma imagem com apenas uma pessoa"
             }
-        except Exception as e:
+        
+        # Verifica tamanho da face
+        face_info = faces[0]
+        facial_area = face_info.get("facial_area", {})
+        
+        width = facial_area.get("w", 0)
+        height = facial_area.get("h", 0)
+        
+        if width < settings.MIN_FACE_SIZE or height < settings.MIN_FACE_SIZE:
             return {
                 "valid": False,
-                "error": f"Erro ao processar imagem: {str(e)}"
+                "error": f"Face muito pequena. Tamanho mínimo: {settings.MIN_FACE_SIZE}px"
             }
+        
+        # Verifica confiança da detecção
+        confidence = face_info.get("confidence", 0)
+        if confidence < 0.8:  # 80% de confiança mínima
+            return {
+                "valid": False,
+                "error": f"Baixa confiança na detecção facial: {confidence:.2%}"
+            }
+        
+        return {
+            "valid": True,
+            "face_location": facial_area,
+            "confidence": confidence
+        }
     
     @staticmethod
     def analyze_face(image_path: str) -> Dict:
@@ -186,7 +459,7 @@ class FaceRecognitionService:
         
         Args:
             image_path: Caminho para a imagem
-            
+        
         Returns:
             Dict com análise facial
         """
@@ -202,7 +475,7 @@ class FaceRecognitionService:
                 return {}
             
             return analysis[0] if isinstance(analysis, list) else analysis
-            
+        
         except Exception as e:
             print(f"Erro na análise facial: {str(e)}")
             return {}
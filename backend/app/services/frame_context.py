@@ -0,0 +1,196 @@
+"""
+Contexto de um frame ao longo do pipeline de reconhecimento
+Calcula sob demanda e memoriza as representações derivadas da imagem
+(BGR, escala de cinza, faces detectadas, recorte alinhado, espectro FFT)
+para que liveness, detecção e embedding não refaçam o mesmo trabalho
+"""
+
+import time
+from contextlib import contextmanager
+from functools import cached_property
+from typing import Dict, List, Optional
+
+import cv2
+import numpy as np
+
+from app.config import settings
+from app.core.metrics import metrics
+from app.services.face_recognition_service import FaceRecognitionService
+from app.services.face_presence import FacePresenceService
+from app.utils.image_processing import decode_image, limit_size
+
+
+class FrameContext:
+    """
+    Frame compartilhado entre as etapas do pipeline
+    
+    Cada propriedade é calculada no primeiro acesso e reaproveitada nos
+    seguintes. O tempo gasto em cada etapa fica em timings (ms); etapas
+    aninhadas (ex: decode disparado dentro de liveness) são descontadas da
+    etapa externa, então a soma dos tempos é o tempo total do frame.
+    """
+    
+    def __init__(
+        self,
+        bgr: Optional[np.ndarray] = None,
+        data: Optional[bytes] = None,
+        parent: Optional["FrameContext"] = None,
+        max_side: Optional[int] = None,
+        model_name: Optional[str] = None
+    ):
+        self._bgr = bgr
+        self._data = data
+        self._max_side = max_side
+        
+        # Frames derivados (ex: face_frame) registram os tempos no frame original
+        if parent is not None:
+            self.timings = parent.timings
+            self._nested = parent._nested
+            self.model_name = parent.model_name
+        else:
+            self.timings: Dict[str, float] = {}
+            self._nested: List[float] = []
+            # Modelo fixado na criação: uma troca de modelo durante a
+            # requisição não mistura recortes e embeddings de modelos diferentes
+            self.model_name = model_name or FaceRecognitionService.MODEL_NAME
+    
+    @classmethod
+    def from_bytes(
+        cls,
+        data: bytes,
+        max_side: Optional[int] = None,
+        model_name: Optional[str] = None
+    ) -> "FrameContext":
+        """
+        Frame a partir dos bytes do upload (decodificados no primeiro uso)
+        
+        Args:
+            data: Conteúdo do arquivo enviado
+            max_side: Maior lado após a decodificação (padrão MAX_IMAGE_SIDE)
+            model_name: Modelo de embedding do recorte (padrão o modelo ativo)
+        """
+        return cls(data=data, max_side=max_side or settings.MAX_IMAGE_SIDE, model_name=model_name)
+    
+    @classmethod
+    def from_path(cls, image_path: str) -> "FrameContext":
+        return cls(bgr=cv2.imread(image_path))
+    
+    @contextmanager
+    def timed(self, stage: str):
+        """Soma a duração do bloco (sem as etapas aninhadas) em timings[stage]"""
+        self._nested.append(0.0)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            nested = self._nested.pop()
+            self.timings[stage] = self.timings.get(stage, 0.0) + elapsed - nested
+            if self._nested:
+                self._nested[-1] += elapsed
+    
+    @cached_property
+    def bgr(self) -> Optional[np.ndarray]:
+        """Imagem BGR uint8 ou None se os bytes não forem uma imagem válida"""
+        if self._bgr is not None or self._data is None:
+            return self._bgr
+        
+        with self.timed("decode"):
+            image = decode_image(self._data, self._max_side)
+        self._data = None
+        return image
+    
+    @cached_property
+    def gray(self) -> Optional[np.ndarray]:
+        if self.bgr is None:
+            return None
+        
+        with self.timed("gray"):
+            return cv2.cvtColor(self.bgr, cv2.COLOR_BGR2GRAY)
+    
+    @cached_property
+    def has_face(self) -> bool:
+        """Filtro barato de presença (Haar no frame reduzido a FACE_PRESENCE_MAX_SIDE)"""
+        if self.gray is None:
+            return False
+        
+        with self.timed("presence"):
+            return FacePresenceService.has_face(limit_size(self.gray, settings.FACE_PRESENCE_MAX_SIDE))
+    
+    @cached_property
+    def faces(self) -> List[Dict]:
+        """Faces detectadas e alinhadas (formato de DeepFace.extract_faces)"""
+        if self.bgr is None:
+            return []
+        
+        with self.timed("detect"):
+            return FaceRecognitionService.detect_faces(self.bgr)
+    
+    @cached_property
+    def face_boxes(self) -> List[Dict]:
+        """facial_area (x, y, w, h) de cada face detectada"""
+        return [face["facial_area"] for face in self.faces]
+    
+    @cached_property
+    def face_crop(self) -> Optional[np.ndarray]:
+        """Recorte da primeira face já no formato de entrada do modelo"""
+        if not self.faces:
+            return None
+        
+        with self.timed("align"):
+            return FaceRecognitionService.prepare_face(self.faces[0]["face"], self.model_name)
+    
+    @cached_property
+    def face_frame(self) -> Optional["FrameContext"]:
+        """
+        Frame da primeira face alinhada, redimensionada para o tamanho
+        canônico LIVENESS_CROP_SIZE; com LIVENESS_ON_FACE_CROP as análises
+        de liveness rodam sobre ele em vez do frame completo
+        """
+        if not self.faces:
+            return None
+        
+        with self.timed("crop"):
+            # extract_faces devolve RGB float em [0, 1]
+            face = (self.faces[0]["face"][:, :, ::-1] * 255).astype(np.uint8)
+            size = settings.LIVENESS_CROP_SIZE
+            crop = cv2.resize(face, (size, size), interpolation=cv2.INTER_AREA)
+        
+        return FrameContext(bgr=crop, parent=self)
+    
+    def crop(self, box: Dict, size: int) -> Optional[np.ndarray]:
+        """
+        Recorta a região box (x, y, w, h) do frame, sem alinhamento, e a
+        redimensiona para size x size; usado para recortar vários frames
+        de uma rajada na face detectada em um deles
+        """
+        if self.bgr is None:
+            return None
+        
+        height, width = self.bgr.shape[:2]
+        x0, y0 = max(int(box["x"]), 0), max(int(box["y"]), 0)
+        x1, y1 = min(x0 + int(box["w"]), width), min(y0 + int(box["h"]), height)
+        if x1 <= x0 or y1 <= y0:
+            return None
+        
+        with self.timed("crop"):
+            return cv2.resize(self.bgr[y0:y1, x0:x1], (size, size), interpolation=cv2.INTER_AREA)
+    
+    @cached_property
+    def fft_magnitude(self) -> Optional[np.ndarray]:
+        """
+        Espectro de magnitude (dB) da escala de cinza, centralizado, calculado
+        na imagem reduzida a LIVENESS_FFT_MAX_SIDE
+        """
+        if self.gray is None:
+            return None
+        
+        with self.timed("fft"):
+            gray = limit_size(self.gray, settings.LIVENESS_FFT_MAX_SIDE)
+            spectrum = np.fft.fftshift(np.fft.fft2(gray))
+            return 20 * np.log(np.abs(spectrum) + 1)
+    
+    def record_metrics(self, prefix: str = "recognition_stage"):
+        """Publica os tempos por etapa como histogramas {prefix}_{etapa}_ms"""
+        for stage, elapsed in self.timings.items():
+            metrics.histogram(f"{prefix}_{stage}_ms", f"Tempo da etapa {stage}").observe(elapsed)
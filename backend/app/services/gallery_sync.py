@@ -0,0 +1,348 @@
+"""
+Sincronização da galeria de faces entre workers
+Cada worker do uvicorn mantém sua própria FaceGallery; alterações feitas
+em um worker são publicadas em um canal (Redis pub/sub) e aplicadas pelos
+demais, sem consultar a tabela employees
+"""
+
+import base64
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+
+from app.config import settings
+from app.services.face_gallery import FaceGallery, face_gallery
+
+logger = logging.getLogger(__name__)
+
+MessageHandler = Callable[[str], None]
+
+
+class ChangeFeedBackend:
+    """
+    Interface do canal de alterações
+    
+    publish envia uma mensagem para todos os inscritos (inclusive o próprio
+    processo); subscribe registra o handler e começa a consumir.
+    """
+    
+    def publish(self, message: str):
+        raise NotImplementedError
+    
+    def subscribe(self, handler: MessageHandler, on_reconnect: Optional[Callable[[], None]] = None):
+        raise NotImplementedError
+    
+    def close(self):
+        pass
+
+
+class InMemoryChangeFeed(ChangeFeedBackend):
+    """
+    Canal em memória para testes offline e execução com um único worker
+    
+    Várias instâncias de GallerySync podem compartilhar o mesmo objeto para
+    simular workers distintos. A entrega é síncrona.
+    """
+    
+    def __init__(self):
+        self._handlers: List[MessageHandler] = []
+        self._lock = threading.Lock()
+    
+    def publish(self, message: str):
+        with self._lock:
+            handlers = list(self._handlers)
+        for handler in handlers:
+            handler(message)
+    
+    def subscribe(self, handler: MessageHandler, on_reconnect: Optional[Callable[[], None]] = None):
+        with self._lock:
+            self._handlers.append(handler)
+    
+    def close(self):
+        with self._lock:
+            self._handlers.clear()
+
+
+class RedisChangeFeed(ChangeFeedBackend):
+    """
+    Canal sobre Redis pub/sub (REDIS_HOST/REDIS_PORT)
+    
+    O consumo roda em uma thread daemon. Como pub/sub não guarda mensagens,
+    após uma reconexão on_reconnect é chamado para que o worker recarregue
+    a galeria e não perca alterações feitas enquanto estava desconectado.
+    """
+    
+    RECONNECT_DELAY = 1.0
+    
+    def __init__(self, host: str, port: int, channel: str):
+        import redis
+        
+        self._redis = redis
+        self._client = redis.Redis(host=host, port=port, socket_timeout=2, socket_connect_timeout=2)
+        self._channel = channel
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+    
+    def publish(self, message: str):
+        self._client.publish(self._channel, message)
+    
+    def subscribe(self, handler: MessageHandler, on_reconnect: Optional[Callable[[], None]] = None):
+        self._thread = threading.Thread(
+            target=self._listen,
+            args=(handler, on_reconnect),
+            name="gallery-sync",
+            daemon=True
+        )
+        self._thread.start()
+    
+    def _listen(self, handler: MessageHandler, on_reconnect: Optional[Callable[[], None]]):
+        first_connection = True
+        
+        while not self._stop.is_set():
+            pubsub = None
+            try:
+                pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self._channel)
+                
+                if not first_connection and on_reconnect:
+                    on_reconnect()
+                first_connection = False
+                
+                while not self._stop.is_set():
+                    message = pubsub.get_message(timeout=1.0)
+                    if message and message.get("type") == "message":
+                        data = message["data"]
+                        handler(data.decode() if isinstance(data, bytes) else data)
+            
+            except self._redis.RedisError as e:
+                logger.warning(f"Canal de sincronização da galeria indisponível: {str(e)}")
+                # Alterações podem ter sido perdidas: recarrega ao reconectar
+                first_connection = False
+                self._stop.wait(self.RECONNECT_DELAY)
+            finally:
+                if pubsub is not None:
+                    try:
+                        pubsub.close()
+                    except Exception:
+                        pass
+    
+    def close(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=2)
+        self._client.close()
+
+
+def create_change_feed(channel: Optional[str] = None) -> Optional[ChangeFeedBackend]:
+    """
+    Cria o canal configurado em GALLERY_SYNC_BACKEND (redis, memory ou none)
+    
+    Args:
+        channel: Canal Redis (padrão GALLERY_SYNC_CHANNEL)
+    """
+    backend = settings.GALLERY_SYNC_BACKEND.lower()
+    
+    if backend == "redis":
+        return RedisChangeFeed(settings.REDIS_HOST, settings.REDIS_PORT, channel or settings.GALLERY_SYNC_CHANNEL)
+    if backend == "memory":
+        return InMemoryChangeFeed()
+    return None
+
+
+class GallerySync:
+    """
+    Aplica alterações na galeria local e as publica para os demais workers
+    
+    Cada mensagem carrega o ID do worker de origem, o ID do colaborador, a
+    operação, os embeddings (matriz float32 em base64, com a dimensão em
+    "dim"), o modelo que os gerou e a versão da galeria de origem.
+    Mensagens do próprio worker, de outro modelo (troca em andamento; a
+    recarga da galeria já traz esses dados) e versões já vistas para o
+    mesmo colaborador são ignoradas. A operação "model" avisa os workers
+    que o modelo ativo mudou (ver reembedding).
+    
+    As últimas versões vistas ficam em um LRU de LAST_SEEN_MAX_ENTRIES
+    pares (worker, colaborador), esvaziado a cada recarga da galeria
+    (reconexão ou troca de modelo): workers reiniciados ganham um ID novo
+    e as entradas dos antigos deixariam de ser usadas.
+    """
+    
+    LAST_SEEN_MAX_ENTRIES = 100_000
+    
+    def __init__(self, gallery: FaceGallery):
+        self.gallery = gallery
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._backend: Optional[ChangeFeedBackend] = None
+        self._on_model_change: Optional[Callable[[], None]] = None
+        self._last_seen: "OrderedDict[Tuple[str, int], int]" = OrderedDict()
+        self._published = 0
+        self._publish_lock = threading.Lock()
+        self.applied = 0
+        self.last_applied_at: Optional[float] = None
+    
+    @property
+    def enabled(self) -> bool:
+        return self._backend is not None
+    
+    def start(
+        self,
+        backend: Optional[ChangeFeedBackend],
+        on_reconnect: Optional[Callable[[], None]] = None,
+        on_model_change: Optional[Callable[[], None]] = None
+    ):
+        """
+        Inscreve o worker no canal de alterações
+        
+        Args:
+            backend: Canal (None desativa a sincronização)
+            on_reconnect: Chamado após uma reconexão (recarregar a galeria)
+            on_model_change: Chamado quando o modelo ativo muda (trocar modelo e galeria)
+        """
+        self._backend = backend
+        self._on_model_change = on_model_change
+        if backend is not None:
+            backend.subscribe(self._on_message, lambda: self._reload(on_reconnect))
+    
+    def _reload(self, callback: Optional[Callable[[], None]]):
+        # Chamado na thread do canal, a mesma que atualiza _last_seen; a
+        # galeria recarregada do banco já contém tudo o que foi visto
+        self._last_seen.clear()
+        if callback is not None:
+            callback()
+    
+    def stop(self):
+        if self._backend is not None:
+            self._backend.close()
+            self._backend = None
+    
+    def _apply_local(self, model_name: Optional[str]) -> bool:
+        # Embedding do modelo já ativado no banco enquanto este worker ainda
+        # não trocou: não entra na galeria local (a recarga da troca o traz)
+        return model_name is None or model_name == self.gallery.model_name
+    
+    def add(self, employee_id: int, embedding: np.ndarray, model_name: Optional[str] = None) -> int:
+        version = self.gallery.add(employee_id, embedding) if self._apply_local(model_name) else self.gallery.version
+        self._publish("add", employee_id, version, embedding, model_name)
+        return version
+    
+    def remove(self, employee_id: int) -> int:
+        version = self.gallery.remove(employee_id)
+        self._publish("remove", employee_id, version)
+        return version
+    
+    def add_templates(self, employee_id: int, embeddings: np.ndarray, model_name: Optional[str] = None) -> int:
+        version = self.gallery.add_templates(employee_id, embeddings) if self._apply_local(model_name) else self.gallery.version
+        self._publish("add_templates", employee_id, version, embeddings, model_name)
+        return version
+    
+    def reactivate(self, employee_id: int, embedding: np.ndarray, model_name: Optional[str] = None) -> int:
+        version = self.gallery.reactivate(employee_id, embedding) if self._apply_local(model_name) else self.gallery.version
+        self._publish("reactivate", employee_id, version, embedding, model_name)
+        return version
+    
+    def switch_model(self):
+        """Aplica a troca do modelo ativo neste worker e avisa os demais"""
+        if self._on_model_change is not None:
+            self._on_model_change()
+        self._publish("model", 0, 0)
+    
+    def _publish(
+        self,
+        op: str,
+        employee_id: int,
+        version: int,
+        embedding: Optional[np.ndarray] = None,
+        model_name: Optional[str] = None
+    ):
+        if self._backend is None:
+            return
+        
+        # Versão estritamente crescente por worker, mesmo quando a alteração
+        # não foi aplicada na galeria local (versão da galeria inalterada)
+        with self._publish_lock:
+            self._published = version = max(self._published + 1, version)
+        
+        message = {
+            "worker": self.worker_id,
+            "op": op,
+            "employee_id": employee_id,
+            "version": version,
+            "model": model_name or self.gallery.model_name
+        }
+        if embedding is not None:
+            matrix = np.atleast_2d(np.asarray(embedding, dtype="<f4"))
+            message["embedding"] = base64.b64encode(matrix.tobytes()).decode("ascii")
+            message["dim"] = matrix.shape[1]
+        
+        try:
+            self._backend.publish(json.dumps(message))
+        except Exception as e:
+            # A alteração local já foi aplicada; os demais workers se
+            # recuperam ao recarregar a galeria na reconexão
+            logger.error(f"Erro ao publicar alteração da galeria: {str(e)}")
+    
+    def _on_message(self, raw: str):
+        try:
+            message = json.loads(raw)
+            worker = message["worker"]
+            
+            if worker == self.worker_id:
+                return
+            
+            op = message["op"]
+            if op == "model":
+                self._reload(self._on_model_change)
+                return
+            
+            # Embeddings de outro modelo: a galeria deste worker ainda não
+            # trocou (ou já trocou) de modelo e será recarregada do banco
+            if message.get("model", self.gallery.model_name) != self.gallery.model_name:
+                return
+            
+            employee_id = int(message["employee_id"])
+            version = int(message["version"])
+            
+            # Descarta mensagens repetidas ou atrasadas para o mesmo colaborador
+            key = (worker, employee_id)
+            if version <= self._last_seen.get(key, 0):
+                return
+            self._last_seen[key] = version
+            self._last_seen.move_to_end(key)
+            if len(self._last_seen) > self.LAST_SEEN_MAX_ENTRIES:
+                self._last_seen.popitem(last=False)
+            
+            embedding = None
+            if "embedding" in message:
+                embedding = np.frombuffer(base64.b64decode(message["embedding"]), dtype="<f4")
+                if "dim" in message:
+                    embedding = embedding.reshape(-1, int(message["dim"]))
+            
+            if op == "add":
+                self.gallery.add(employee_id, embedding)
+            elif op == "add_templates":
+                self.gallery.add_templates(employee_id, embedding)
+            elif op == "remove":
+                self.gallery.remove(employee_id)
+            elif op == "reactivate":
+                self.gallery.reactivate(employee_id, embedding)
+            else:
+                logger.warning(f"Operação de galeria desconhecida: {op}")
+                return
+            
+            self.applied += 1
+            self.last_applied_at = time.time()
+        
+        except Exception as e:
+            logger.error(f"Erro ao aplicar alteração da galeria: {str(e)}")
+
+
+# Instância única por processo
+gallery_sync = GallerySync(face_gallery)
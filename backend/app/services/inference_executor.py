@@ -0,0 +1,118 @@
+"""
+Pool dedicado para inferência (liveness, detecção e embedding)
+Tira o trabalho de CPU do event loop e limita a fila para responder 503
+rapidamente quando o servidor está saturado
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from app.config import settings
+from app.core.metrics import metrics
+
+
+class InferenceQueueFull(Exception):
+    """A fila de inferência atingiu o limite configurado"""
+    pass
+
+
+class InferenceExecutor:
+    """
+    Pool de threads com fila limitada
+    
+    TensorFlow e OpenCV liberam o GIL durante o processamento, então
+    threads dão paralelismo real sem duplicar os modelos na memória (o que
+    um pool de processos exigiria). No máximo workers tarefas executam ao
+    mesmo tempo e queue_size aguardam; além disso run() levanta
+    InferenceQueueFull imediatamente.
+    """
+    
+    def __init__(self, workers: int, queue_size: int):
+        self.workers = workers
+        self.queue_size = queue_size
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._running = 0
+        
+        self._queue_depth = metrics.gauge("inference_queue_depth", "Tarefas aguardando uma thread livre")
+        self._in_flight = metrics.gauge("inference_in_flight", "Tarefas em execução")
+        self._wait_ms = metrics.histogram("inference_wait_ms", "Tempo na fila antes de executar")
+        self._run_ms = metrics.histogram("inference_run_ms", "Tempo de execução")
+        self._rejected = metrics.counter("inference_rejected_total", "Tarefas recusadas por fila cheia")
+    
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="inference")
+        return self._executor
+    
+    @property
+    def pending(self) -> int:
+        return self._pending
+    
+    def _update_gauges(self):
+        """Atualiza fila e tarefas em execução (chamar com o lock)"""
+        self._queue_depth.set(max(self._pending - self._running, 0))
+        self._in_flight.set(self._running)
+    
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Executa fn no pool e aguarda o resultado sem bloquear o event loop
+        
+        Raises:
+            InferenceQueueFull: se já há workers + queue_size tarefas pendentes
+        """
+        with self._lock:
+            if self._pending >= self.workers + self.queue_size:
+                self._rejected.inc()
+                raise InferenceQueueFull()
+            self._pending += 1
+            self._update_gauges()
+            executor = self._get_executor()
+        
+        submitted_at = time.perf_counter()
+        
+        def task():
+            started_at = time.perf_counter()
+            self._wait_ms.observe((started_at - submitted_at) * 1000)
+            with self._lock:
+                self._running += 1
+                self._update_gauges()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self._running -= 1
+                    self._update_gauges()
+                self._run_ms.observe((time.perf_counter() - started_at) * 1000)
+        
+        def release(_future=None):
+            with self._lock:
+                self._pending -= 1
+                self._update_gauges()
+        
+        try:
+            future = executor.submit(task)
+        except BaseException:
+            release()
+            raise
+        
+        # A vaga é liberada quando o future termina, e não quando esta
+        # corrotina sai: se o cliente desconectar antes de a tarefa começar
+        # o future é cancelado (callback imediato); se ela já está rodando,
+        # a thread continua ocupada e a vaga só volta ao fim da tarefa
+        future.add_done_callback(release)
+        return await asyncio.wrap_future(future)
+    
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+# Instância única por processo
+inference_executor = InferenceExecutor(settings.INFERENCE_WORKERS, settings.INFERENCE_QUEUE_SIZE)
@@ -5,140 +5,194 @@ Previne spoofing com fotos ou vídeos
 
 import cv2
 import numpy as np
-from typing import Dict
+from typing import Dict, Optional, Tuple
 from app.config import settings
+from app.core.metrics import metrics
+from app.services.frame_context import FrameContext
 
 class LivenessDetectionService:
     
+    # Verificações do cascade: (métrica, casas decimais, contribuição mínima,
+    # contribuição máxima). Os limites de contribuição permitem ao cascade
+    # saber quando o resultado já está decidido.
+    CHECKS = {
+        "brightness": ("brightness", 2, 0.0, 0.3),
+        "contrast": ("contrast", 2, 0.0, 0.1),
+        "laplacian": ("laplacian_variance", 2, 0.0, 0.4),
+        "histogram": ("histogram_variance", 6, 0.0, 0.3),
+        "moire": ("moire_peaks", 0, -settings.LIVENESS_MOIRE_PENALTY, 0.0),
+    }
+    
     @staticmethod
     def check_liveness(image_path: str) -> Dict:
+        """
+        Versão de check_liveness_array que lê a imagem do disco
+        
+        Args:
+            image_path: Caminho para a imagem
+        
+        Returns:
+            Dict com resultado da análise de vivacidade
+        """
+        return LivenessDetectionService.check_liveness_array(cv2.imread(image_path))
+    
+    @staticmethod
+    def check_liveness_array(image: Optional[np.ndarray]) -> Dict:
+        """
+        Versão de check_liveness_frame para imagem já decodificada
+        
+        Args:
+            image: Imagem BGR (None se a decodificação falhou)
+        
+        Returns:
+            Dict com resultado da análise de vivacidade
+        """
+        return LivenessDetectionService.check_liveness_frame(FrameContext(bgr=image))
+    
+    @staticmethod
+    def _check_brightness(frame: FrameContext) -> Tuple[float, float, Optional[str]]:
+        # Telas tendem a ter brilho muito uniforme
+        brightness = float(np.mean(frame.gray))
+        if brightness < 20 or brightness > 235:
+            return 0.0, brightness, "Brilho anormal (muito escuro ou claro)"
+        if brightness < 30 or brightness > 220:
+            return 0.1, brightness, "Brilho nos limites"
+        return 0.3, brightness, None
+    
+    @staticmethod
+    def _check_contrast(frame: FrameContext) -> Tuple[float, float, Optional[str]]:
+        # Fotos de foto tendem a ter contraste reduzido
+        contrast = float(frame.gray.std())
+        if contrast < 30:
+            return 0.0, contrast, "Contraste muito baixo"
+        if contrast < 45:
+            return 0.1, contrast, None
+        return 0.0, contrast, None  # Não adiciona pontos, apenas não penaliza
+    
+    @staticmethod
+    def _check_laplacian(frame: FrameContext) -> Tuple[float, float, Optional[str]]:
+        # Imagens de foto de foto tendem a ser mais borradas
+        laplacian_var = float(cv2.Laplacian(frame.gray, cv2.CV_64F).var())
+        if laplacian_var < 50:
+            return 0.0, laplacian_var, "Imagem muito borrada (foto de foto?)"
+        if laplacian_var < 100:
+            return 0.2, laplacian_var, "Imagem com blur moderado"
+        return 0.4, laplacian_var, None
+    
+    @staticmethod
+    def _check_histogram(frame: FrameContext) -> Tuple[float, float, Optional[str]]:
+        # Fotos impressas têm menos variedade de cores
+        hist = cv2.calcHist([frame.bgr], [0, 1, 2], None, [8, 8, 8], [0, 256, 0, 256, 0, 256])
+        hist = cv2.normalize(hist, hist).flatten()
+        hist_variance = float(np.var(hist))
+        if hist_variance < 0.0005:
+            return 0.0, hist_variance, "Baixíssima variedade de cores (suspeito)"
+        if hist_variance < 0.001:
+            return 0.15, hist_variance, "Baixa variedade de cores"
+        return 0.3, hist_variance, None
+    
+    @staticmethod
+    def _check_moire(frame: FrameContext) -> Tuple[float, float, Optional[str]]:
+        # Fotografar uma tela gera picos isolados de alta frequência no espectro
+        peaks = LivenessDetectionService._moire_peaks(frame.fft_magnitude)
+        if peaks > settings.LIVENESS_MOIRE_MAX_PEAKS:
+            return -settings.LIVENESS_MOIRE_PENALTY, peaks, "Padrão Moiré detectado (foto de tela?)"
+        return 0.0, peaks, None
+    
+    @staticmethod
+    def _moire_peaks(magnitude_spectrum: np.ndarray) -> int:
+        """
+        Conta os picos de alta frequência do espectro (fora do disco central
+        de baixas frequências) acima de média + 4 desvios
+        """
+        height, width = magnitude_spectrum.shape
+        y, x = np.ogrid[:height, :width]
+        radius = np.hypot(y - height / 2, x - width / 2)
+        high = magnitude_spectrum[radius > min(height, width) / 8]
+        return int(np.sum(high > high.mean() + 4 * high.std()))
+    
+    @staticmethod
+    def check_liveness_frame(frame: FrameContext, threshold: Optional[float] = None) -> Dict:
         """
         Detecta se a imagem é de uma pessoa real ou foto/vídeo (spoofing)
         
-        Usa múltiplas técnicas:
-        1. Análise de Laplaciano (detecta blur de foto de foto)
-        2. Análise de Histograma de Cores (detecta uniformidade suspeita)
-        3. Análise de Brilho (detecta reflexos de tela)
-        4. Análise de Textura (detecta padrões de impressão)
+        As verificações rodam em cascata, na ordem de LIVENESS_CASCADE_ORDER
+        (das mais baratas para as mais caras):
+        1. Brilho e contraste (média e desvio da escala de cinza)
+        2. Laplaciano (detecta blur de foto de foto)
+        3. Histograma de cores (detecta uniformidade suspeita)
+        4. Moiré em FFT reduzida (detecta foto de tela; penaliza o score)
+        
+        Antes de cada verificação o cascade compara o score acumulado com o
+        mínimo e o máximo que as verificações restantes ainda podem somar;
+        se o resultado contra o threshold já está garantido, as restantes
+        são puladas.
         
         Args:
-            image_path: Caminho para a imagem
-            
+            frame: Contexto do frame (imagem e representações derivadas)
+            threshold: Score mínimo (padrão LIVENESS_THRESHOLD; por dispositivo)
+        
         Returns:
             Dict com resultado da análise de vivacidade
         """
         try:
-            # Lê a imagem
-            image = cv2.imread(image_path)
-            
-            if image is None:
+            if frame.bgr is None:
                 return {
                     "is_live": False,
                     "confidence": 0.0,
                     "reason": "Imagem inválida ou corrompida"
                 }
             
-            # Converte para escala de cinza
-            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+            if threshold is None:
+                threshold = settings.LIVENESS_THRESHOLD
+            checks = LivenessDetectionService.CHECKS
+            order = [name for name in settings.LIVENESS_CASCADE_ORDER if name in checks]
+            remaining_min = sum(checks[name][2] for name in order)
+            remaining_max = sum(checks[name][3] for name in order)
             
-            # 1. ANÁLISE DE VARIAÇÃO LAPLACIANA
-            # Imagens de foto de foto tendem a ser mais borradas
-            laplacian_var = cv2.Laplacian(gray, cv2.CV_64F).var()
-            laplacian_score = 0.0
-            laplacian_reason = ""
-            
-            if laplacian_var < 50:
-                laplacian_reason = "Imagem muito borrada (foto de foto?)"
-            elif laplacian_var < 100:
-                laplacian_score = 0.2
-                laplacian_reason = "Imagem com blur moderado"
-            else:
-                laplacian_score = 0.4
-                laplacian_reason = "Nitidez adequada"
-            
-            # 2. ANÁLISE DE HISTOGRAMA DE CORES
-            # Fotos impressas têm menos variedade de cores
-            hist = cv2.calcHist([image], [0, 1, 2], None, [8, 8, 8], [0, 256, 0, 256, 0, 256])
-            hist = cv2.normalize(hist, hist).flatten()
-            hist_variance = np.var(hist)
-            hist_score = 0.0
-            hist_reason = ""
-            
-            if hist_variance < 0.0005:
-                hist_reason = "Baixíssima variedade de cores (suspeito)"
-            elif hist_variance < 0.001:
-                hist_score = 0.15
-                hist_reason = "Baixa variedade de cores"
-            else:
-                hist_score = 0.3
-                hist_reason = "Variedade de cores adequada"
-            
-            # 3. ANÁLISE DE BRILHO
-            # Telas tendem a ter brilho muito uniforme
-            brightness = np.mean(gray)
-            brightness_score = 0.0
-            brightness_reason = ""
-            
-            if brightness < 20 or brightness > 235:
-                brightness_reason = "Brilho anormal (muito escuro ou claro)"
-            elif brightness < 30 or brightness > 220:
-                brightness_score = 0.1
-                brightness_reason = "Brilho nos limites"
-            else:
-                brightness_score = 0.3
-                brightness_reason = "Brilho adequado"
-            
-            # 4. ANÁLISE DE CONTRASTE
-            # Fotos de foto tendem a ter contraste reduzido
-            contrast = gray.std()
-            contrast_score = 0.0
-            contrast_reason = ""
+            liveness_score = 0.0
+            scores = {}
+            check_metrics = {}
+            reasons = []
+            skipped = []
             
-            if contrast < 30:
-                contrast_reason = "Contraste muito baixo"
-            elif contrast < 45:
-                contrast_score = 0.1
-                contrast_reason = "Contraste baixo"
-            else:
-                contrast_score = 0.0  # Não adiciona pontos, apenas não penaliza
-                contrast_reason = "Contraste adequado"
+            for index, name in enumerate(order):
+                if liveness_score + remaining_min >= threshold or liveness_score + remaining_max < threshold:
+                    skipped = order[index:]
+                    break
+                
+                metric_name, digits, low, high = checks[name]
+                check = getattr(LivenessDetectionService, f"_check_{name}")
+                score, value, reason = check(frame)
+                
+                liveness_score += score
+                scores[name] = score
+                check_metrics[metric_name] = round(value, digits)
+                if reason:
+                    reasons.append(reason)
+                
+                remaining_min -= low
+                remaining_max -= high
+                metrics.counter(f"liveness_{name}_runs_total", f"Execuções da verificação {name}").inc()
             
-            # CÁLCULO DO SCORE FINAL
-            liveness_score = laplacian_score + hist_score + brightness_score + contrast_score
+            for name in skipped:
+                metrics.counter(f"liveness_{name}_skipped_total", f"Verificação {name} pulada pelo cascade").inc()
+            if skipped:
+                metrics.counter("liveness_early_exit_total", "Análises decididas antes da última verificação").inc()
             
             # Verifica se passou no threshold
-            is_live = liveness_score >= settings.LIVENESS_THRESHOLD
-            
-            # Monta lista de razões
-            reasons = []
-            if laplacian_score < 0.3:
-                reasons.append(laplacian_reason)
-            if hist_score < 0.2:
-                reasons.append(hist_reason)
-            if brightness_score < 0.2:
-                reasons.append(brightness_reason)
-            if contrast_score == 0 and contrast < 30:
-                reasons.append(contrast_reason)
+            is_live = liveness_score >= threshold
             
             return {
                 "is_live": is_live,
                 "confidence": round(liveness_score, 3),
-                "threshold": settings.LIVENESS_THRESHOLD,
-                "metrics": {
-                    "laplacian_variance": round(float(laplacian_var), 2),
-                    "histogram_variance": round(float(hist_variance), 6),
-                    "brightness": round(float(brightness), 2),
-                    "contrast": round(float(contrast), 2)
-                },
-                "scores": {
-                    "laplacian": laplacian_score,
-                    "histogram": hist_score,
-                    "brightness": brightness_score,
-                    "contrast": contrast_score
-                },
+                "threshold": threshold,
+                "metrics": check_metrics,
+                "scores": scores,
+                "skipped": skipped,
                 "reason": " | ".join(reasons) if reasons else "Todas as verificações passaram"
             }
-            
+        
         except Exception as e:
             return {
                 "is_live": False,
@@ -149,31 +203,180 @@ class LivenessDetectionService:
     @staticmethod
     def check_moiré_pattern(image_path: str) -> bool:
         """
-        Detecta padrões Moiré que aparecem quando se fotografa uma tela
+        Versão de check_moiré_pattern_array que lê a imagem do disco
         
         Args:
             image_path: Caminho para a imagem
-            
+        
         Returns:
             True se detectou padrão Moiré (indica foto de tela)
         """
+        return LivenessDetectionService.check_moiré_pattern_array(cv2.imread(image_path))
+    
+    @staticmethod
+    def check_moiré_pattern_array(image: np.ndarray) -> bool:
+        """
+        Versão de check_moiré_pattern_frame para imagem já decodificada
+        """
+        return LivenessDetectionService.check_moiré_pattern_frame(FrameContext(bgr=image))
+    
+    @staticmethod
+    def check_moiré_pattern_frame(frame: FrameContext) -> bool:
+        """
+        Detecta padrões Moiré que aparecem quando se fotografa uma tela
+        
+        Args:
+            frame: Contexto do frame (reaproveita a escala de cinza e a FFT)
+        
+        Returns:
+            True se detectou padrão Moiré (indica foto de tela)
+        """
+        try:
+            # FFT (reduzida) para detectar padrões repetitivos
+            peaks = LivenessDetectionService._moire_peaks(frame.fft_magnitude)
+            return peaks > settings.LIVENESS_MOIRE_MAX_PEAKS
+        
+        except Exception as e:
+            print(f"Erro na detecção de Moiré: {str(e)}")
+            return False
+    
+    @staticmethod
+    def _burst_metrics(frames: np.ndarray) -> Dict[str, np.ndarray]:
+        """
+        Calcula as métricas de liveness de todos os frames de uma vez
+        
+        Args:
+            frames: Array (N, altura, largura, 3) BGR uint8
+        
+        Returns:
+            Dict de arrays (N,) com as métricas de cada frame, os picos de
+            Moiré da rajada (int) e a energia de movimento entre frames
+            consecutivos (N-1,)
+        """
+        count, height, width = frames.shape[:3]
+        
+        # Os frames empilhados formam uma única imagem (N*altura, largura),
+        # então cada operação do OpenCV é uma chamada só para a rajada toda
+        tall = frames.reshape(count * height, width, 3)
+        gray = cv2.cvtColor(tall, cv2.COLOR_BGR2GRAY)
+        
+        # Laplaciano; a primeira e a última linha de cada frame (emendas
+        # entre frames) ficam de fora da variância
+        laplacian = cv2.Laplacian(gray, cv2.CV_32F).reshape(count, height, width)[:, 1:-1]
+        laplacian_var = laplacian.reshape(count, -1).var(axis=1, dtype=np.float64)
+        
+        # Histograma 8x8x8 de cada frame com um único bincount, em pixels
+        # alternados (a distribuição de cores não muda com a subamostragem)
+        bins = frames[:, ::2, ::2] >> 5
+        cells = (bins[..., 0].astype(np.uint16) << 6) | (bins[..., 1].astype(np.uint16) << 3) | bins[..., 2]
+        cells = cells.reshape(count, -1) + (np.arange(count, dtype=np.uint16) * 512)[:, None]
+        hist = np.bincount(cells.ravel(), minlength=count * 512).reshape(count, 512).astype(np.float64)
+        hist /= np.linalg.norm(hist, axis=1, keepdims=True)  # NORM_L2, como cv2.normalize
+        hist_variance = hist.var(axis=1)
+        
+        gray = gray.reshape(count, height, width)
+        flat = gray.reshape(count, -1)
+        brightness = flat.mean(axis=1)
+        contrast = flat.std(axis=1)
+        
+        # Moiré: o padrão de uma tela é fixo, então uma única FFT da média
+        # temporal basta (e o ruído do sensor se cancela na média)
+        spectrum = 20 * np.log(np.abs(np.fft.fftshift(np.fft.fft2(flat.mean(axis=0).reshape(height, width)))) + 1)
+        moire_peaks = LivenessDetectionService._moire_peaks(spectrum)
+        
+        # Energia de movimento: diferença média absoluta entre frames consecutivos
+        motion = np.abs(np.diff(flat.astype(np.int16), axis=0)).mean(axis=1)
+        
+        return {
+            "laplacian_variance": laplacian_var,
+            "histogram_variance": hist_variance,
+            "brightness": brightness,
+            "contrast": contrast,
+            "moire_peaks": moire_peaks,
+            "motion_energy": motion
+        }
+    
+    @staticmethod
+    def check_liveness_burst(frames: np.ndarray, threshold: Optional[float] = None) -> Dict:
+        """
+        Liveness de uma sequência curta de frames (rajada do quiosque)
+        
+        As métricas de check_liveness_frame são calculadas para todos os
+        frames em uma única passada vetorizada, com as mesmas faixas de
+        pontuação, e o teste de Moiré roda uma vez sobre a média da rajada.
+        Além disso usa a energia de movimento entre frames: uma sequência
+        sem nenhum movimento indica imagem estática (foto ou injeção do
+        mesmo frame).
+        
+        Args:
+            frames: Array (N, altura, largura, 3) BGR uint8, N >= 2, de
+                preferência já recortado na face
+            threshold: Score mínimo (padrão LIVENESS_THRESHOLD; por dispositivo)
+        
+        Returns:
+            Dict com resultado da análise de vivacidade da rajada
+        """
         try:
-            image = cv2.imread(image_path)
-            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+            if frames.ndim != 4 or frames.shape[0] < 2:
+                return {
+                    "is_live": False,
+                    "confidence": 0.0,
+                    "reason": "A rajada precisa de pelo menos 2 frames do mesmo tamanho"
+                }
+            
+            if threshold is None:
+                threshold = settings.LIVENESS_THRESHOLD
+            
+            burst = LivenessDetectionService._burst_metrics(frames)
+            laplacian_var = burst["laplacian_variance"]
+            hist_variance = burst["histogram_variance"]
+            brightness = burst["brightness"]
+            contrast = burst["contrast"]
+            
+            # Mesmas faixas de check_liveness_frame, aplicadas a todos os frames
+            laplacian_score = np.select([laplacian_var < 50, laplacian_var < 100], [0.0, 0.2], 0.4)
+            hist_score = np.select([hist_variance < 0.0005, hist_variance < 0.001], [0.0, 0.15], 0.3)
+            brightness_score = np.select(
+                [(brightness < 20) | (brightness > 235), (brightness < 30) | (brightness > 220)],
+                [0.0, 0.1],
+                0.3
+            )
+            contrast_score = np.where((contrast >= 30) & (contrast < 45), 0.1, 0.0)
             
-            # Aplica FFT para detectar padrões repetitivos
-            f = np.fft.fft2(gray)
-            fshift = np.fft.fftshift(f)
-            magnitude_spectrum = 20 * np.log(np.abs(fshift) + 1)
+            frame_scores = laplacian_score + hist_score + brightness_score + contrast_score
+            liveness_score = float(np.median(frame_scores))
             
-            # Padrões Moiré geram picos específicos no espectro de frequência
-            # Esta é uma implementação simplificada
-            threshold = np.mean(magnitude_spectrum) + 2 * np.std(magnitude_spectrum)
-            peaks = np.sum(magnitude_spectrum > threshold)
+            moire_detected = burst["moire_peaks"] > settings.LIVENESS_MOIRE_MAX_PEAKS
+            motion_energy = float(burst["motion_energy"].mean())
             
-            # Se há muitos picos, pode indicar padrão Moiré
-            return peaks > 100
+            reasons = []
+            if liveness_score < threshold:
+                reasons.append("Pontuação dos frames abaixo do limite")
+            if moire_detected:
+                reasons.append("Padrão Moiré detectado (foto de tela?)")
+            if motion_energy < settings.LIVENESS_BURST_MIN_MOTION:
+                reasons.append("Nenhum movimento entre os frames (imagem estática?)")
             
+            return {
+                "is_live": not reasons,
+                "confidence": round(liveness_score, 3),
+                "threshold": threshold,
+                "frames": len(frames),
+                "metrics": {
+                    "laplacian_variance": np.round(laplacian_var, 2).tolist(),
+                    "histogram_variance": np.round(hist_variance, 6).tolist(),
+                    "brightness": np.round(brightness, 2).tolist(),
+                    "contrast": np.round(contrast, 2).tolist(),
+                    "moire_peaks": burst["moire_peaks"],
+                    "motion_energy": round(motion_energy, 3)
+                },
+                "frame_scores": np.round(frame_scores, 3).tolist(),
+                "reason": " | ".join(reasons) if reasons else "Todas as verificações passaram"
+            }
+        
         except Exception as e:
-            print(f"Erro na detecção de Moiré: {str(e)}")
-            return False
+            return {
+                "is_live": False,
+                "confidence": 0.0,
+                "reason": f"Erro na análise: {str(e)}"
+            }
@@ -0,0 +1,126 @@
+"""
+Registro dos modelos de visão computacional
+Carrega e aquece o modelo de reconhecimento, o detector e (opcionalmente)
+os modelos de atributos no startup, para que a primeira requisição após
+um deploy não pague a construção do grafo TensorFlow
+"""
+
+import threading
+import time
+from typing import Dict, Optional
+
+import numpy as np
+from deepface import DeepFace
+
+from app.config import settings
+from app.core.metrics import metrics
+from app.services.face_recognition_service import FaceRecognitionService
+
+
+class ModelRegistry:
+    """
+    Mantém as instâncias dos modelos do processo
+    
+    O DeepFace guarda os modelos construídos em caches internos; o registro
+    garante que eles sejam construídos e executados uma vez (warm-up) antes
+    de o worker se declarar pronto.
+    """
+    
+    ATTRIBUTE_MODELS = ["Age", "Gender", "Emotion"]
+    
+    def __init__(self):
+        self.recognition_model = None
+        self.detector = None
+        self.attribute_models: Dict[str, object] = {}
+        self.time_to_ready: Optional[float] = None
+        self.error: Optional[str] = None
+        self._ready = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+    
+    @property
+    def model_name(self) -> str:
+        return FaceRecognitionService.MODEL_NAME
+    
+    @property
+    def detector_backend(self) -> str:
+        return FaceRecognitionService.DETECTOR_BACKEND
+    
+    @property
+    def is_ready(self) -> bool:
+        return self._ready.is_set()
+    
+    def wait_until_ready(self, timeout: Optional[float] = None) -> bool:
+        return self._ready.wait(timeout)
+    
+    def warm_up(self):
+        """
+        Constrói os modelos e executa uma inferência de aquecimento
+        
+        Bloqueia até terminar; use start_warm_up para rodar em background.
+        """
+        start = time.perf_counter()
+        
+        try:
+            self.recognition_model, self.detector = self.preload(self.model_name, self.detector_backend)
+            
+            if settings.MODEL_WARMUP_ATTRIBUTES:
+                for name in self.ATTRIBUTE_MODELS:
+                    self.attribute_models[name] = DeepFace.build_model(name)
+            
+            self.time_to_ready = time.perf_counter() - start
+            metrics.gauge("model_time_to_ready_seconds", "Tempo de carga + warm-up dos modelos").set(
+                round(self.time_to_ready, 3)
+            )
+            self._ready.set()
+            print(f"✅ Modelos prontos em {self.time_to_ready:.1f}s")
+        
+        except Exception as e:
+            self.error = str(e)
+            metrics.counter("model_warmup_errors_total").inc()
+            print(f"❌ Erro no warm-up dos modelos: {str(e)}")
+    
+    @staticmethod
+    def preload(model_name: str, detector_backend: str):
+        """
+        Constrói e aquece um modelo e um detector (caches do DeepFace)
+        Usado também antes de trocar o modelo ativo, para que a troca não
+        deixe o worker sem modelo pronto
+        
+        Returns:
+            (modelo de reconhecimento, detector)
+        """
+        from deepface.detectors import DetectorWrapper
+        
+        print(f"🔥 Carregando modelo {model_name} e detector {detector_backend}...")
+        recognition_model = DeepFace.build_model(model_name)
+        detector = DetectorWrapper.build_model(detector_backend)
+        
+        # Inferência com imagem neutra para inicializar kernels e grafo
+        height, width = recognition_model.input_shape
+        dummy_face = np.full((height, width, 3), 128, dtype=np.uint8)
+        DeepFace.represent(
+            img_path=dummy_face,
+            model_name=model_name,
+            enforce_detection=False,
+            detector_backend="skip"
+        )
+        
+        dummy_frame = np.full((480, 640, 3), 128, dtype=np.uint8)
+        DeepFace.extract_faces(
+            img_path=dummy_frame,
+            detector_backend=detector_backend,
+            enforce_detection=False
+        )
+        
+        return recognition_model, detector
+    
+    def start_warm_up(self):
+        """Executa o warm-up em uma thread, sem bloquear o startup da API"""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self.warm_up, name="model-warmup", daemon=True)
+        self._thread.start()
+
+
+# Instância única por processo
+model_registry = ModelRegistry()
@@ -0,0 +1,257 @@
+"""
+Cache de resultados de probe
+Reenvios do mesmo upload (retry do quiosque após timeout, rede instável)
+reaproveitam a detecção, o liveness e o embedding da primeira análise e
+vão direto para a busca na galeria
+"""
+
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import List, NamedTuple, Optional, Tuple
+
+import numpy as np
+from starlette.concurrency import run_in_threadpool
+
+from app.config import settings
+from app.core.metrics import metrics
+from app.services.face_recognition_service import FaceRecognitionService
+
+logger = logging.getLogger(__name__)
+
+
+class ProbeResult(NamedTuple):
+    """Análise reaproveitável de um probe"""
+    face_present: bool
+    liveness_result: Optional[dict]
+    embedding: Optional[np.ndarray]  # None: sem face, liveness reprovado ou ainda não calculado
+
+
+def _json_default(value):
+    # Métricas do liveness vêm como tipos do numpy
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"Tipo não serializável: {type(value).__name__}")
+
+
+def _dumps(result: ProbeResult) -> bytes:
+    embedding = None
+    if result.embedding is not None:
+        embedding = base64.b64encode(result.embedding.astype("<f4").tobytes()).decode()
+    
+    return json.dumps({
+        "face_present": result.face_present,
+        "liveness_result": result.liveness_result,
+        "embedding": embedding
+    }, default=_json_default).encode()
+
+
+def _loads(data: bytes) -> ProbeResult:
+    payload = json.loads(data)
+    embedding = None
+    if payload["embedding"] is not None:
+        embedding = np.frombuffer(base64.b64decode(payload["embedding"]), dtype="<f4").astype(np.float32)
+    return ProbeResult(payload["face_present"], payload["liveness_result"], embedding)
+
+
+class RedisProbeTier:
+    """
+    Segundo nível no Redis (REDIS_HOST/REDIS_PORT), compartilhado entre os
+    workers: o retry pode cair em outro worker que o da primeira tentativa.
+    Entradas em JSON (sem pickle) com a expiração do próprio Redis.
+    """
+    
+    PREFIX = "facial:probe:"
+    
+    def __init__(self, host: str, port: int, ttl_seconds: float):
+        import redis
+        
+        # Timeout curto: com o Redis lento, recalcular sai mais barato
+        self._client = redis.Redis(host=host, port=port, socket_timeout=0.2, socket_connect_timeout=0.2)
+        self.ttl_seconds = max(1, math.ceil(ttl_seconds))
+    
+    def get(self, key: str) -> Optional[ProbeResult]:
+        data = self._client.get(self.PREFIX + key)
+        return _loads(data) if data is not None else None
+    
+    def set(self, key: str, result: ProbeResult):
+        self._client.set(self.PREFIX + key, _dumps(result), ex=self.ttl_seconds)
+    
+    def close(self):
+        self._client.close()
+
+
+def create_shared_tier() -> Optional[RedisProbeTier]:
+    """Cria o segundo nível se PROBE_CACHE_SHARED estiver ligado"""
+    if not settings.PROBE_CACHE_SHARED:
+        return None
+    return RedisProbeTier(settings.REDIS_HOST, settings.REDIS_PORT, settings.PROBE_CACHE_TTL_SECONDS)
+
+
+class ProbeCache:
+    """
+    LRU com TTL em memória + segundo nível opcional no Redis
+    
+    A chave é o SHA-256 dos bytes do upload junto com o que muda o
+    resultado da análise: modelo, detector e threshold de liveness. Só a
+    análise fica em cache; a busca na galeria sempre roda, então cadastros,
+    desativações e a tolerância do dispositivo valem na hora. Falhas do
+    Redis são contadas e ignoradas (o probe é analisado normalmente).
+    """
+    
+    SHARED_RETRY_DELAY = 5.0
+    
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[float, ProbeResult]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._shared: Optional[RedisProbeTier] = None
+        self._shared_retry_at = 0.0
+        
+        self._hits = metrics.counter("probe_cache_hits_total", "Probes reaproveitados do cache em memória")
+        self._shared_hits = metrics.counter("probe_cache_shared_hits_total", "Probes reaproveitados do Redis")
+        self._misses = metrics.counter("probe_cache_misses_total", "Probes sem resultado em cache")
+        self._evictions = metrics.counter("probe_cache_evictions_total", "Entradas removidas pelo limite do LRU")
+        self._expired = metrics.counter("probe_cache_expired_total", "Entradas descartadas pelo TTL")
+        self._shared_errors = metrics.counter("probe_cache_shared_errors_total", "Falhas de acesso ao Redis (ignoradas)")
+        self._size = metrics.gauge("probe_cache_entries", "Entradas no cache em memória")
+    
+    @property
+    def enabled(self) -> bool:
+        return settings.PROBE_CACHE_ENABLED and self.max_entries > 0
+    
+    def start(self, shared: Optional[RedisProbeTier] = None):
+        self._shared = shared
+    
+    def stop(self):
+        shared, self._shared = self._shared, None
+        if shared is not None:
+            shared.close()
+        self.clear()
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size.set(0)
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    @staticmethod
+    def key(content: bytes, model_name: str, liveness_threshold: Optional[float] = None) -> str:
+        """
+        Chave do upload
+        
+        Args:
+            content: Bytes do arquivo enviado
+            model_name: Modelo do embedding (o do frame)
+            liveness_threshold: Threshold de liveness do dispositivo
+        """
+        digest = hashlib.sha256(content).hexdigest()
+        return f"{model_name}:{FaceRecognitionService.DETECTOR_BACKEND}:{liveness_threshold}:{digest}"
+    
+    def _get_local(self, key: str) -> Optional[ProbeResult]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            
+            expires_at, result = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self._expired.inc()
+                self._size.set(len(self._entries))
+                return None
+            
+            self._entries.move_to_end(key)
+        
+        self._hits.inc()
+        return result
+    
+    def _put_local(self, key: str, result: ProbeResult):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, result)
+            self._entries.move_to_end(key)
+            
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions.inc()
+            self._size.set(len(self._entries))
+    
+    def _available_shared(self) -> Optional[RedisProbeTier]:
+        # Após uma falha o Redis fica de fora por SHARED_RETRY_DELAY, sem
+        # pagar o timeout em cada requisição
+        if self._shared is None or time.monotonic() < self._shared_retry_at:
+            return None
+        return self._shared
+    
+    def _shared_failed(self, error: Exception):
+        self._shared_errors.inc()
+        self._shared_retry_at = time.monotonic() + self.SHARED_RETRY_DELAY
+        logger.warning(f"Cache de probes no Redis indisponível: {str(error)}")
+    
+    def _get_shared(self, key: str) -> Optional[ProbeResult]:
+        shared = self._available_shared()
+        if shared is None:
+            return None
+        
+        try:
+            result = shared.get(key)
+        except Exception as e:
+            self._shared_failed(e)
+            return None
+        
+        if result is not None:
+            self._shared_hits.inc()
+            self._put_local(key, result)
+        return result
+    
+    def _put_shared(self, keys: List[str], result: ProbeResult):
+        shared = self._available_shared()
+        if shared is None:
+            return
+        
+        try:
+            for key in keys:
+                shared.set(key, result)
+        except Exception as e:
+            self._shared_failed(e)
+    
+    @staticmethod
+    def _frozen(result: ProbeResult) -> ProbeResult:
+        # Compartilhado entre requisições: ninguém pode alterar o vetor guardado
+        if result.embedding is not None:
+            embedding = np.array(result.embedding, dtype=np.float32)
+            embedding.setflags(write=False)
+            result = result._replace(embedding=embedding)
+        return result
+    
+    async def lookup(self, key: str) -> Optional[ProbeResult]:
+        """Versão de get para os endpoints: o Redis é consultado fora do event loop"""
+        result = self._get_local(key)
+        if result is None and self._shared is not None:
+            result = await run_in_threadpool(self._get_shared, key)
+        if result is None:
+            self._misses.inc()
+        return result
+    
+    def store(self, keys: List[str], result: ProbeResult):
+        """Versão de put para os endpoints: a escrita no Redis não atrasa a resposta"""
+        result = self._frozen(result)
+        for key in keys:
+            self._put_local(key, result)
+        if self._shared is not None:
+            asyncio.get_running_loop().run_in_executor(None, self._put_shared, keys, result)
+
+
+# Instância única por processo
+probe_cache = ProbeCache(settings.PROBE_CACHE_MAX_ENTRIES, settings.PROBE_CACHE_TTL_SECONDS)
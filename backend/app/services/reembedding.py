@@ -0,0 +1,512 @@
+"""
+Re-embedding dos colaboradores para troca de modelo ou detector
+Recalcula os embeddings de todas as fotos (cadastro e templates) com o
+modelo novo em um pool de processos, com checkpoint a cada lote, e troca
+o modelo ativo de forma atômica quando termina
+"""
+
+import os
+import threading
+from datetime import datetime
+from typing import Callable, List, Optional, Tuple
+
+from sqlalchemy import and_, exists, insert, literal, or_, select, update
+from sqlalchemy.orm import Session, aliased
+
+from app.config import settings
+from app.core.metrics import metrics
+from app.models.employee import Employee, FaceTemplate
+from app.models.reembedding import FaceEmbedding, ReembeddingJob
+from app.services.bulk_import import embed_chunk, embedding_pool
+from app.services.face_gallery import FaceGallery, face_gallery
+from app.services.face_recognition_service import FaceRecognitionService
+from app.services.gallery_sync import gallery_sync
+from app.services.model_registry import ModelRegistry, model_registry
+from app.utils.embedding_codec import is_encoded, read_header
+
+# Um job por processo da API (o job também pode rodar pelo script)
+job_lock = threading.Lock()
+
+# (employee_id, template_id, caminho da foto); template_id 0 = foto do cadastro
+Source = Tuple[int, int, str]
+
+
+class ReembeddingService:
+    """
+    Job de re-embedding e troca do modelo ativo
+    
+    O job percorre employees em ordem de id, BULK_IMPORT_CHUNK_SIZE fotos
+    por tarefa do pool, e grava os vetores novos em face_embeddings junto
+    com o checkpoint (last_employee_id) em uma única transação por lote:
+    após uma queda, start() retoma do último lote gravado.
+    
+    Na ativação os vetores atuais vão para face_embeddings marcados com o
+    modelo anterior, os novos são copiados para employees/face_templates e
+    o job passa a ser o ativo, tudo em uma transação. Cada worker então
+    aquece o modelo novo, carrega a galeria nova e só depois troca os dois
+    (ver load_gallery); até lá continua atendendo com o modelo anterior.
+    """
+    
+    @staticmethod
+    def active_model(db: Session) -> Tuple[str, str]:
+        """(modelo, detector) do último job ativado ou os configurados"""
+        job = db.query(ReembeddingJob).filter(
+            ReembeddingJob.status == "active"
+        ).order_by(ReembeddingJob.activated_at.desc()).first()
+        
+        if job is not None:
+            return job.model_name, job.detector_backend
+        return settings.FACE_RECOGNITION_MODEL, settings.FACE_DETECTOR_BACKEND
+    
+    @staticmethod
+    def use_active_model(db: Session) -> Tuple[str, str]:
+        """
+        Aplica o modelo ativo neste processo (scripts)
+        
+        A galeria local também passa a usar o modelo: as mensagens do
+        gallery_sync levam o modelo dela, e os workers descartam as de
+        outro modelo.
+        """
+        model_name, detector_backend = ReembeddingService.active_model(db)
+        FaceRecognitionService.use_model(model_name, detector_backend)
+        face_gallery.use_model(model_name)
+        return model_name, detector_backend
+    
+    @staticmethod
+    def load_gallery(db: Session, gallery: FaceGallery = face_gallery) -> int:
+        """
+        Carrega a galeria com o modelo ativo
+        
+        Se o modelo mudou com o worker já em operação, o modelo novo é
+        construído e aquecido antes; a galeria é trocada de uma vez e só
+        então o modelo padrão do processo muda. Requisições que geraram o
+        probe com o modelo anterior no meio da troca são refeitas com o
+        novo (ver GalleryModelMismatch).
+        
+        Returns:
+            Quantidade de colaboradores carregados
+        """
+        model_name, detector_backend = ReembeddingService.active_model(db)
+        changed = (model_name, detector_backend) != (
+            FaceRecognitionService.MODEL_NAME,
+            FaceRecognitionService.DETECTOR_BACKEND
+        )
+        
+        if changed and model_registry.is_ready:
+            ModelRegistry.preload(model_name, detector_backend)
+        
+        total = gallery.load(db, model_name)
+        FaceRecognitionService.use_model(model_name, detector_backend)
+        
+        if changed:
+            metrics.counter("model_switches_total", "Trocas do modelo ativo neste worker").inc()
+            print(f"🔄 Modelo ativo: {model_name} / {detector_backend}")
+        
+        return total
+    
+    @staticmethod
+    def start(db: Session, model_name: str, detector_backend: str) -> ReembeddingJob:
+        """
+        Cria o job ou retoma um interrompido (running/failed) para o mesmo modelo e detector
+        
+        Raises:
+            ValueError: modelo/detector não suportado ou já ativo
+        """
+        if model_name not in FaceRecognitionService.SUPPORTED_MODELS:
+            raise ValueError(f"Modelo não suportado: {model_name}")
+        if detector_backend not in FaceRecognitionService.SUPPORTED_DETECTORS:
+            raise ValueError(f"Detector não suportado: {detector_backend}")
+        
+        job = db.query(ReembeddingJob).filter(
+            ReembeddingJob.model_name == model_name,
+            ReembeddingJob.detector_backend == detector_backend,
+            ReembeddingJob.status.in_(["running", "failed"])
+        ).order_by(ReembeddingJob.id.desc()).first()
+        
+        if job is None:
+            if (model_name, detector_backend) == ReembeddingService.active_model(db):
+                raise ValueError(f"{model_name} / {detector_backend} já é o modelo ativo")
+            
+            job = ReembeddingJob(
+                model_name=model_name,
+                detector_backend=detector_backend,
+                total=db.query(Employee).count()
+            )
+            db.add(job)
+        
+        job.status = "running"
+        job.error = None
+        job.updated_at = datetime.utcnow()
+        db.commit()
+        db.refresh(job)
+        return job
+    
+    @staticmethod
+    def run(
+        session_factory: Callable[[], Session],
+        job_id: int,
+        workers: Optional[int] = None,
+        batch_size: Optional[int] = None,
+        activate: bool = True
+    ) -> ReembeddingJob:
+        """
+        Executa (ou continua) o job a partir do checkpoint
+        
+        Args:
+            session_factory: Fábrica de sessões do banco
+            job_id: Job criado por start()
+            workers: Processos do pool (padrão REEMBEDDING_WORKERS ou núcleos)
+            batch_size: Colaboradores por checkpoint (padrão REEMBEDDING_BATCH_SIZE)
+            activate: Ativa o modelo novo ao terminar
+        
+        Returns:
+            O job ao final (completed ou active)
+        """
+        workers = workers or settings.REEMBEDDING_WORKERS or os.cpu_count() or 1
+        batch_size = batch_size or settings.REEMBEDDING_BATCH_SIZE
+        
+        db = session_factory()
+        job = db.get(ReembeddingJob, job_id)
+        try:
+            print(
+                f"🔁 Re-embedding {job.model_name} / {job.detector_backend}: "
+                f"retomando após o colaborador {job.last_employee_id}"
+            )
+            pool = embedding_pool(workers, job.model_name, job.detector_backend)
+            try:
+                while True:
+                    employees = db.query(Employee.id, Employee.face_image_path).filter(
+                        Employee.id > job.last_employee_id
+                    ).order_by(Employee.id).limit(batch_size).all()
+                    if not employees:
+                        break
+                    
+                    failed = ReembeddingService._process(db, pool, job, [employee.id for employee in employees])
+                    job.last_employee_id = employees[-1].id
+                    job.processed += len(employees)
+                    job.failed += failed
+                    job.updated_at = datetime.utcnow()
+                    db.commit()
+                    
+                    print(f"   {job.processed}/{job.total} colaboradores ({job.failed} fotos com falha)")
+                
+                # Fotos cadastradas ou trocadas depois de o lote passar por elas
+                stale = ReembeddingService._stale_employees(db, job.model_name)
+                if stale:
+                    print(f"   Reprocessando {len(stale)} colaboradores alterados durante o job")
+                    ReembeddingService._process(db, pool, job, stale)
+                
+                job.status = "completed"
+                job.finished_at = datetime.utcnow()
+                job.updated_at = job.finished_at
+                db.commit()
+                
+                if activate:
+                    ReembeddingService.activate(db, job, pool)
+            finally:
+                pool.shutdown(wait=True, cancel_futures=True)
+            
+            return job
+        
+        except Exception as e:
+            db.rollback()
+            job.status = "failed"
+            job.error = str(e)
+            job.updated_at = datetime.utcnow()
+            db.commit()
+            raise
+        
+        finally:
+            db.close()
+    
+    @staticmethod
+    def _sources(db: Session, employee_ids: List[int]) -> List[Source]:
+        sources = [
+            (employee_id, 0, path)
+            for employee_id, path in db.query(Employee.id, Employee.face_image_path).filter(
+                Employee.id.in_(employee_ids)
+            )
+        ]
+        sources.extend(
+            (employee_id, template_id, path)
+            for employee_id, template_id, path in db.query(
+                FaceTemplate.employee_id, FaceTemplate.id, FaceTemplate.image_path
+            ).filter(FaceTemplate.employee_id.in_(employee_ids))
+        )
+        return sources
+    
+    @staticmethod
+    def _process(db: Session, pool, job: ReembeddingJob, employee_ids: List[int]) -> int:
+        """
+        Gera e grava (sem commit) os embeddings de todas as fotos dos colaboradores
+        
+        Returns:
+            Quantidade de fotos com falha
+        """
+        sources = ReembeddingService._sources(db, employee_ids)
+        chunk_size = max(1, settings.BULK_IMPORT_CHUNK_SIZE)
+        failures = []
+        tasks = []
+        
+        for start in range(0, len(sources), chunk_size):
+            items = []
+            for source in sources[start:start + chunk_size]:
+                try:
+                    with open(source[2], "rb") as f:
+                        items.append((source, f.read()))
+                except (OSError, TypeError):
+                    failures.append((source, "Foto não encontrada"))
+            if items:
+                tasks.append((items, pool.submit(embed_chunk, [content for _, content in items])))
+        
+        now = datetime.utcnow()
+        rows = []
+        for items, future in tasks:
+            try:
+                results = future.result()
+            except Exception as e:
+                results = [(None, f"Erro ao processar foto: {str(e)}")] * len(items)
+            
+            for ((employee_id, template_id, _), _), (encoding, error) in zip(items, results):
+                if encoding is None:
+                    failures.append(((employee_id, template_id, None), error))
+                    continue
+                rows.append({
+                    "employee_id": employee_id,
+                    "template_id": template_id,
+                    "model_name": job.model_name,
+                    "detector_backend": job.detector_backend,
+                    "embedding": encoding,
+                    "created_at": now
+                })
+        
+        for (employee_id, template_id, _), error in failures:
+            origin = f"template {template_id}" if template_id else "foto do cadastro"
+            print(f"⚠️ Colaborador {employee_id} ({origin}): {error}")
+        
+        # Idempotente: um lote repetido após uma queda substitui o anterior
+        db.query(FaceEmbedding).filter(
+            FaceEmbedding.model_name == job.model_name,
+            FaceEmbedding.employee_id.in_(employee_ids)
+        ).delete(synchronize_session=False)
+        if rows:
+            db.execute(insert(FaceEmbedding), rows)
+        
+        return len(failures)
+    
+    @staticmethod
+    def _stale_employees(db: Session, model_name: str) -> List[int]:
+        """Colaboradores com alguma foto sem embedding do modelo ou com embedding anterior à foto"""
+        embedding = aliased(FaceEmbedding)
+        
+        primary = db.query(Employee.id).outerjoin(
+            embedding,
+            and_(
+                embedding.employee_id == Employee.id,
+                embedding.template_id == 0,
+                embedding.model_name == model_name
+            )
+        ).filter(
+            or_(embedding.id.is_(None), embedding.created_at < Employee.face_registered_at)
+        )
+        templates = db.query(FaceTemplate.employee_id).outerjoin(
+            embedding,
+            and_(
+                embedding.template_id == FaceTemplate.id,
+                embedding.model_name == model_name
+            )
+        ).filter(
+            or_(embedding.id.is_(None), embedding.created_at < FaceTemplate.created_at)
+        )
+        
+        return sorted({employee_id for employee_id, in primary.union(templates).all()})
+    
+    @staticmethod
+    def _current_vectors(db: Session, model_name: str):
+        """
+        Vetores das colunas de employees/face_templates gerados por model_name
+        
+        Fotos que falharam em um re-embedding anterior continuam com o vetor
+        de um modelo mais antigo e ficam de fora; pickles legados não têm
+        cabeçalho e são do modelo configurado antes dos jobs.
+        """
+        rows = db.query(Employee.id, literal(0), Employee.face_encoding).filter(
+            Employee.face_encoding.isnot(None)
+        ).union_all(
+            db.query(FaceTemplate.employee_id, FaceTemplate.id, FaceTemplate.embedding)
+        )
+        
+        for employee_id, template_id, embedding in rows.yield_per(1000):
+            encoded_model = read_header(embedding).model_name if is_encoded(embedding) else model_name
+            if encoded_model == model_name:
+                yield employee_id, template_id, embedding
+    
+    @staticmethod
+    def _outdated_employees(db: Session, model_name: str) -> List[int]:
+        """
+        Colaboradores com alguma foto cujo vetor nas colunas não é de model_name
+        
+        São as fotos que falharam no re-embedding: mantêm o vetor antigo,
+        ignorado pela galeria, e precisam de um novo cadastro de foto.
+        """
+        rows = db.query(Employee.id, Employee.face_encoding).filter(
+            Employee.face_encoding.isnot(None)
+        ).union_all(
+            db.query(FaceTemplate.employee_id, FaceTemplate.embedding)
+        )
+        
+        return sorted({
+            employee_id
+            for employee_id, embedding in rows.yield_per(1000)
+            if is_encoded(embedding) and read_header(embedding).model_name != model_name
+        })
+    
+    @staticmethod
+    def _copy_to_columns(db: Session, model_name: str):
+        """Copia (sem commit) os vetores do modelo para employees/face_templates"""
+        primary = and_(
+            FaceEmbedding.model_name == model_name,
+            FaceEmbedding.employee_id == Employee.id,
+            FaceEmbedding.template_id == 0
+        )
+        db.execute(
+            update(Employee).where(exists().where(primary)).values(
+                face_encoding=select(FaceEmbedding.embedding).where(primary).scalar_subquery()
+            ).execution_options(synchronize_session=False)
+        )
+        
+        template = and_(
+            FaceEmbedding.model_name == model_name,
+            FaceEmbedding.template_id == FaceTemplate.id
+        )
+        db.execute(
+            update(FaceTemplate).where(exists().where(template)).values(
+                embedding=select(FaceEmbedding.embedding).where(template).scalar_subquery()
+            ).execution_options(synchronize_session=False)
+        )
+    
+    @staticmethod
+    def _catch_up(db: Session, job: ReembeddingJob, pool=None):
+        """
+        Re-embedding das fotos gravadas por workers que ainda usavam o
+        modelo anterior entre a última passada do job e a ativação
+        """
+        stale = ReembeddingService._stale_employees(db, job.model_name)
+        if not stale:
+            return
+        
+        print(f"   Reprocessando {len(stale)} colaboradores sem embedding de {job.model_name}")
+        own_pool = pool is None
+        if own_pool:
+            pool = embedding_pool(1, job.model_name, job.detector_backend)
+        try:
+            ReembeddingService._process(db, pool, job, stale)
+        finally:
+            if own_pool:
+                pool.shutdown(wait=True, cancel_futures=True)
+        
+        ReembeddingService._copy_to_columns(db, job.model_name)
+        db.commit()
+    
+    @staticmethod
+    def activate(db: Session, job: ReembeddingJob, pool=None):
+        """
+        Torna o modelo do job o ativo (uma transação) e troca o modelo
+        deste worker e dos demais (gallery_sync)
+        
+        Fotos sem embedding do modelo novo (falhas) mantêm o vetor antigo,
+        que a galeria e o cadastro ignoram por ser de outro modelo; esses
+        colaboradores ficam em job.reenroll_pending. Cadastros feitos com o
+        modelo anterior até a ativação são recalculados antes da troca (os
+        posteriores são recusados pelo cadastro, que confere o modelo ativo).
+        
+        Args:
+            db: Sessão do banco
+            job: Job concluído
+            pool: Pool do job para o reprocessamento final (sem ele, um de 1 processo)
+        """
+        if job.status not in ("completed", "active"):
+            raise ValueError(f"Job {job.id} não está concluído ({job.status})")
+        
+        old_model, old_detector = ReembeddingService.active_model(db)
+        now = datetime.utcnow()
+        
+        # 1. Vetores atuais preservados com a marcação do modelo anterior
+        if old_model != job.model_name:
+            db.query(FaceEmbedding).filter(FaceEmbedding.model_name == old_model).delete(synchronize_session=False)
+            preserved = [
+                {
+                    "employee_id": employee_id,
+                    "template_id": template_id,
+                    "model_name": old_model,
+                    "detector_backend": old_detector,
+                    "embedding": embedding,
+                    "created_at": now
+                }
+                for employee_id, template_id, embedding in ReembeddingService._current_vectors(db, old_model)
+            ]
+            if preserved:
+                db.execute(insert(FaceEmbedding), preserved)
+        
+        # 2. Vetores novos nas colunas lidas pela galeria e pelo cadastro
+        ReembeddingService._copy_to_columns(db, job.model_name)
+        
+        # 3. Job ativo
+        db.query(ReembeddingJob).filter(
+            ReembeddingJob.status == "active",
+            ReembeddingJob.id != job.id
+        ).update({"status": "superseded"}, synchronize_session=False)
+        job.status = "active"
+        job.activated_at = now
+        job.updated_at = now
+        db.commit()
+        
+        # 4. Cadastros com o modelo anterior entre a passada final e o commit acima;
+        # o modelo já está ativo, então uma falha aqui não desfaz a troca
+        try:
+            ReembeddingService._catch_up(db, job, pool)
+        except Exception as e:
+            db.rollback()
+            print(f"⚠️ Reprocessamento final do job {job.id} falhou: {str(e)}")
+        
+        # 5. Colaboradores que precisam cadastrar a foto de novo
+        try:
+            outdated = ReembeddingService._outdated_employees(db, job.model_name)
+            job.reenroll_pending = len(outdated)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            outdated = []
+            print(f"⚠️ Contagem de recadastros do job {job.id} falhou: {str(e)}")
+        if outdated:
+            sample = ", ".join(str(employee_id) for employee_id in outdated[:20])
+            more = f" e mais {len(outdated) - 20}" if len(outdated) > 20 else ""
+            print(
+                f"⚠️ {len(outdated)} colaboradores sem embedding de {job.model_name} "
+                f"precisam de novo cadastro de foto: {sample}{more}"
+            )
+        
+        print(f"✅ Modelo {job.model_name} / {job.detector_backend} ativado")
+        gallery_sync.switch_model()
+    
+    @staticmethod
+    def run_in_background(session_factory: Callable[[], Session], job_id: int) -> bool:
+        """
+        Executa o job em uma thread deste worker
+        
+        Returns:
+            False se já houver um job rodando neste processo
+        """
+        if not job_lock.acquire(blocking=False):
+            return False
+        
+        def target():
+            try:
+                ReembeddingService.run(session_factory, job_id)
+            except Exception as e:
+                print(f"❌ Erro no job de re-embedding {job_id}: {str(e)}")
+            finally:
+                job_lock.release()
+        
+        threading.Thread(target=target, name="reembedding", daemon=True).start()
+        return True
@@ -0,0 +1,142 @@
+"""
+Formato binário dos embeddings faciais
+Cabeçalho fixo + nome do modelo + float32 little-endian, decodificado sem
+cópia com np.frombuffer
+
+Layout (little-endian):
+    magic        4 bytes  b"FEMB"
+    versão       uint8
+    dtype        uint8    (1 = float32)
+    dimensão     uint16
+    len(modelo)  uint8
+    modelo       len(modelo) bytes, UTF-8
+    dados        dimensão * 4 bytes
+"""
+
+import pickle
+import struct
+from typing import List, NamedTuple
+
+import numpy as np
+
+MAGIC = b"FEMB"
+FORMAT_VERSION = 1
+
+_HEADER = struct.Struct("<4sBBHB")
+_DTYPES = {1: np.dtype("<f4")}
+_DTYPE_CODES = {np.dtype("<f4"): 1}
+
+
+class EmbeddingHeader(NamedTuple):
+    version: int
+    dtype: np.dtype
+    dim: int
+    model_name: str
+    data_offset: int
+
+
+def is_encoded(blob: bytes) -> bool:
+    """Indica se o blob está no formato binário (e não no pickle legado)"""
+    return bytes(blob[:4]) == MAGIC
+
+
+def encode_embedding(embedding: np.ndarray, model_name: str) -> bytes:
+    """
+    Serializa um embedding no formato binário
+    
+    Args:
+        embedding: Vetor do embedding
+        model_name: Modelo que gerou o embedding (ex: Facenet)
+    
+    Returns:
+        bytes prontos para Employee.face_encoding
+    """
+    vector = np.ascontiguousarray(embedding, dtype="<f4").reshape(-1)
+    name = model_name.encode("utf-8")
+    if len(name) > 255:
+        raise ValueError("Nome do modelo muito longo")
+    
+    header = _HEADER.pack(MAGIC, FORMAT_VERSION, _DTYPE_CODES[vector.dtype], vector.shape[0], len(name))
+    return header + name + vector.tobytes()
+
+
+def read_header(blob: bytes) -> EmbeddingHeader:
+    """
+    Lê o cabeçalho de um embedding serializado
+    
+    Raises:
+        ValueError: se o blob não estiver no formato esperado
+    """
+    if len(blob) < _HEADER.size:
+        raise ValueError("Embedding truncado")
+    
+    magic, version, dtype_code, dim, name_length = _HEADER.unpack_from(blob)
+    if magic != MAGIC:
+        raise ValueError("Embedding não está no formato binário")
+    if version != FORMAT_VERSION:
+        raise ValueError(f"Versão de formato de embedding não suportada: {version}")
+    if dtype_code not in _DTYPES:
+        raise ValueError(f"Tipo de embedding não suportado: {dtype_code}")
+    
+    name_start = _HEADER.size
+    data_offset = name_start + name_length
+    model_name = bytes(blob[name_start:data_offset]).decode("utf-8")
+    
+    dtype = _DTYPES[dtype_code]
+    if len(blob) != data_offset + dim * dtype.itemsize:
+        raise ValueError("Tamanho do embedding não confere com o cabeçalho")
+    
+    return EmbeddingHeader(version, dtype, dim, model_name, data_offset)
+
+
+def decode_embedding(blob: bytes) -> np.ndarray:
+    """
+    Decodifica um embedding sem copiar os dados (array somente leitura)
+    
+    Args:
+        blob: bytes gerados por encode_embedding
+    
+    Returns:
+        Vetor float32 apontando para o próprio blob
+    """
+    header = read_header(blob)
+    return np.frombuffer(blob, dtype=header.dtype, count=header.dim, offset=header.data_offset)
+
+
+def decode_embeddings(blobs: List[bytes]) -> np.ndarray:
+    """
+    Decodifica vários embeddings de uma vez em uma matriz (n, dim)
+    
+    Quando todos os blobs têm o mesmo cabeçalho (mesmo modelo e dimensão) a
+    conversão é feita com uma única junção de bytes e um reshape, sem
+    interpretar cada cabeçalho individualmente.
+    
+    Raises:
+        ValueError: se algum blob não estiver no formato binário ou os
+            cabeçalhos forem diferentes
+    """
+    if not blobs:
+        return np.zeros((0, 0), dtype=np.float32)
+    
+    header = read_header(blobs[0])
+    row_length = header.data_offset + header.dim * header.dtype.itemsize
+    
+    joined = b"".join(blobs)
+    if len(joined) != row_length * len(blobs):
+        raise ValueError("Embeddings com tamanhos diferentes")
+    
+    rows = np.frombuffer(joined, dtype=np.uint8).reshape(len(blobs), row_length)
+    if not (rows[:, :header.data_offset] == rows[0, :header.data_offset]).all():
+        raise ValueError("Embeddings com cabeçalhos diferentes")
+    
+    return np.ascontiguousarray(rows[:, header.data_offset:]).view(header.dtype)
+
+
+def decode_legacy_pickle(blob: bytes) -> np.ndarray:
+    """
+    Decodifica o formato antigo (pickle de np.ndarray float64)
+    
+    Usado apenas pela migração e por linhas ainda não migradas; não deve
+    ser usado com dados de origem não confiável.
+    """
+    return np.asarray(pickle.loads(blob), dtype=np.float64)
@@ -1,8 +1,78 @@
+import io
 import cv2
 import numpy as np
-from typing import Dict
+from PIL import Image
+from typing import Dict, Optional, Tuple
 from app.config import settings
 
+# Fatores de redução aplicados na decodificação (escala DCT no JPEG)
+_REDUCED_DECODE_FLAGS = [
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2),
+]
+
+def image_size(data: bytes) -> Optional[Tuple[int, int]]:
+    """
+    Lê (largura, altura) apenas do cabeçalho da imagem, sem decodificá-la
+    """
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            return image.size
+    except Exception:
+        return None
+
+def limit_size(image: np.ndarray, max_side: int) -> np.ndarray:
+    """
+    Reduz a imagem para que o maior lado tenha no máximo max_side pixels
+    """
+    height, width = image.shape[:2]
+    long_side = max(height, width)
+    
+    if long_side <= max_side:
+        return image
+    
+    scale = max_side / long_side
+    return cv2.resize(
+        image,
+        (max(1, round(width * scale)), max(1, round(height * scale))),
+        interpolation=cv2.INTER_AREA
+    )
+
+def decode_image(data: bytes, max_side: Optional[int] = None) -> Optional[np.ndarray]:
+    """
+    Decodifica os bytes de um upload (JPEG, PNG, ...) direto em memória
+    
+    Com max_side, imagens grandes são decodificadas já reduzidas (1/2, 1/4
+    ou 1/8, sem passar de max_side) e depois limitadas a max_side no maior
+    lado, antes de qualquer processamento.
+    
+    Args:
+        data: Conteúdo do arquivo enviado
+        max_side: Maior lado permitido em pixels (None = tamanho original)
+    
+    Returns:
+        Imagem BGR (uint8) ou None se os bytes não forem uma imagem válida
+    """
+    if not data:
+        return None
+    
+    flags = cv2.IMREAD_COLOR
+    if max_side:
+        size = image_size(data)
+        if size is not None:
+            for factor, reduced_flag in _REDUCED_DECODE_FLAGS:
+                if max(size) // factor >= max_side:
+                    flags = reduced_flag
+                    break
+    
+    image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), flags)
+    
+    if image is None or not max_side:
+        return image
+    
+    return limit_size(image, max_side)
+
 def check_liveness(image_path: str) -> Dict:
     """
     Detecta se a imagem é de uma pessoa real ou foto/vídeo
@@ -66,7 +136,7 @@ def check_liveness(image_path: str) -> Dict:
             },
             "reason": " | ".join(reasons) if reasons else "Liveness check passed"
         }
-        
+    
     except Exception as e:
         return {
             "is_live": False,
@@ -7,7 +7,10 @@ from alembic import context
 
 from app.database import Base
 from app.config import settings
-from app.models import User, Employee, AccessLog
+from app.models import (
+    User, Employee, AccessLog, FaceTemplate, Device, AccessStatsHourly, AccessStatsDaily,
+    FaceEmbedding, ReembeddingJob
+)
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
@@ -0,0 +1,87 @@
+"""Convert face encodings from pickle to float32 binary format
+
+Revision ID: 002_embedding_float32
+Revises: 001_initial
+Create Date: 2025-02-03 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.utils.embedding_codec import (
+    decode_embedding,
+    decode_legacy_pickle,
+    encode_embedding,
+    is_encoded,
+)
+
+# revision identifiers, used by Alembic.
+revision = '002_embedding_float32'
+down_revision = '001_initial'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 500
+
+# Todos os encodings existentes foram gerados com o modelo padrão
+LEGACY_MODEL_NAME = 'Facenet'
+
+employees = sa.table(
+    'employees',
+    sa.column('id', sa.Integer),
+    sa.column('face_encoding', sa.LargeBinary),
+)
+
+
+def _rewrite_encodings(convert) -> None:
+    """Percorre employees em lotes (keyset por id) aplicando convert a cada encoding"""
+    bind = op.get_bind()
+    update = (
+        employees.update()
+        .where(employees.c.id == sa.bindparam('_id'))
+        .values(face_encoding=sa.bindparam('_encoding'))
+    )
+    
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(employees.c.id, employees.c.face_encoding)
+            .where(employees.c.id > last_id)
+            .order_by(employees.c.id)
+            .limit(BATCH_SIZE)
+        ).fetchall()
+        
+        if not rows:
+            break
+        
+        params = []
+        for employee_id, face_encoding in rows:
+            converted = convert(bytes(face_encoding))
+            if converted is not None:
+                params.append({'_id': employee_id, '_encoding': converted})
+        
+        if params:
+            bind.execute(update, params)
+        
+        last_id = rows[-1][0]
+
+
+def upgrade() -> None:
+    def to_float32(blob):
+        if is_encoded(blob):
+            return None
+        return encode_embedding(decode_legacy_pickle(blob), LEGACY_MODEL_NAME)
+    
+    _rewrite_encodings(to_float32)
+
+
+def downgrade() -> None:
+    import pickle
+    import numpy as np
+    
+    def to_pickle(blob):
+        if not is_encoded(blob):
+            return None
+        return pickle.dumps(np.asarray(decode_embedding(blob), dtype=np.float64))
+    
+    _rewrite_encodings(to_pickle)
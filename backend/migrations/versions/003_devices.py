@@ -0,0 +1,41 @@
+"""Add devices table
+
+Revision ID: 003_devices
+Revises: 002_embedding_float32
+Create Date: 2025-03-10 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '003_devices'
+down_revision = '002_embedding_float32'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'devices',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('device_id', sa.String(length=100), nullable=False),
+        sa.Column('name', sa.String(length=255), nullable=False),
+        sa.Column('location', sa.String(length=255), nullable=True),
+        sa.Column('controller_url', sa.String(length=255), nullable=True),
+        sa.Column('door_number', sa.Integer(), nullable=False),
+        sa.Column('recognition_tolerance', sa.Float(), nullable=True),
+        sa.Column('liveness_threshold', sa.Float(), nullable=True),
+        sa.Column('is_active', sa.Boolean(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_devices_id'), 'devices', ['id'], unique=False)
+    op.create_index(op.f('ix_devices_device_id'), 'devices', ['device_id'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_devices_device_id'), table_name='devices')
+    op.drop_index(op.f('ix_devices_id'), table_name='devices')
+    op.drop_table('devices')
@@ -0,0 +1,46 @@
+"""Add hourly and daily access stats rollups
+
+Revision ID: 004_access_stats
+Revises: 003_devices
+Create Date: 2025-03-24 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '004_access_stats'
+down_revision = '003_devices'
+branch_labels = None
+depends_on = None
+
+PERIODS = ('hourly', 'daily')
+
+
+def upgrade() -> None:
+    # Uma linha por (período, dispositivo, colaborador); a chave única é a
+    # usada pelo upsert de app.services.access_stats. Os logs anteriores
+    # entram com python -m scripts.rebuild_access_stats
+    for period in PERIODS:
+        table = f'access_stats_{period}'
+        op.create_table(
+            table,
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('bucket_start', sa.DateTime(), nullable=False),
+            sa.Column('device_id', sa.String(length=100), nullable=False),
+            sa.Column('employee_id', sa.Integer(), nullable=False),
+            sa.Column('attempts', sa.Integer(), nullable=False),
+            sa.Column('granted', sa.Integer(), nullable=False),
+            sa.Column('denied', sa.Integer(), nullable=False),
+            sa.Column('liveness_failed', sa.Integer(), nullable=False),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('bucket_start', 'device_id', 'employee_id', name=f'uq_{table}_bucket')
+        )
+        op.create_index(op.f(f'ix_{table}_bucket_start'), table, ['bucket_start'], unique=False)
+
+
+def downgrade() -> None:
+    for period in reversed(PERIODS):
+        table = f'access_stats_{period}'
+        op.drop_index(op.f(f'ix_{table}_bucket_start'), table_name=table)
+        op.drop_table(table)
@@ -0,0 +1,36 @@
+"""Add face templates (additional photos per employee)
+
+Revision ID: 005_face_templates
+Revises: 004_access_stats
+Create Date: 2025-04-07 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '005_face_templates'
+down_revision = '004_access_stats'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'face_templates',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('employee_id', sa.Integer(), nullable=False),
+        sa.Column('embedding', sa.LargeBinary(), nullable=False),
+        sa.Column('image_path', sa.String(length=500), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['employee_id'], ['employees.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_face_templates_id'), 'face_templates', ['id'], unique=False)
+    op.create_index(op.f('ix_face_templates_employee_id'), 'face_templates', ['employee_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_face_templates_employee_id'), table_name='face_templates')
+    op.drop_index(op.f('ix_face_templates_id'), table_name='face_templates')
+    op.drop_table('face_templates')
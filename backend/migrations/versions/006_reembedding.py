@@ -0,0 +1,61 @@
+"""Add per-model face embeddings and re-embedding jobs
+
+Revision ID: 006_reembedding
+Revises: 005_face_templates
+Create Date: 2025-04-21 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '006_reembedding'
+down_revision = '005_face_templates'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'face_embeddings',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('employee_id', sa.Integer(), nullable=False),
+        sa.Column('template_id', sa.Integer(), nullable=False),
+        sa.Column('model_name', sa.String(length=50), nullable=False),
+        sa.Column('detector_backend', sa.String(length=50), nullable=False),
+        sa.Column('embedding', sa.LargeBinary(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['employee_id'], ['employees.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('model_name', 'employee_id', 'template_id', name='uq_face_embeddings_source')
+    )
+    op.create_index(op.f('ix_face_embeddings_employee_id'), 'face_embeddings', ['employee_id'], unique=False)
+    
+    op.create_table(
+        'reembedding_jobs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('model_name', sa.String(length=50), nullable=False),
+        sa.Column('detector_backend', sa.String(length=50), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('last_employee_id', sa.Integer(), nullable=False),
+        sa.Column('total', sa.Integer(), nullable=False),
+        sa.Column('processed', sa.Integer(), nullable=False),
+        sa.Column('failed', sa.Integer(), nullable=False),
+        sa.Column('reenroll_pending', sa.Integer(), nullable=False),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('started_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.Column('activated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_reembedding_jobs_id'), 'reembedding_jobs', ['id'], unique=False)
+    op.create_index(op.f('ix_reembedding_jobs_status'), 'reembedding_jobs', ['status'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_reembedding_jobs_status'), table_name='reembedding_jobs')
+    op.drop_index(op.f('ix_reembedding_jobs_id'), table_name='reembedding_jobs')
+    op.drop_table('reembedding_jobs')
+    op.drop_index(op.f('ix_face_embeddings_employee_id'), table_name='face_embeddings')
+    op.drop_table('face_embeddings')
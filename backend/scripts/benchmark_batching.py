@@ -0,0 +1,94 @@
+"""
+Benchmark de throughput do micro-batching de embeddings
+
+Dispara --clients requisições simultâneas em laço (como os quiosques na
+troca de turno) contra o EmbeddingBatcher e compara tamanhos máximos de
+lote. Com --model real usa o Facenet do DeepFace (baixa os pesos na
+primeira execução); com --model simulated o forward pass custa
+--overhead-ms por chamada + --per-face-ms por recorte, o que isola o ganho
+de amortizar o custo fixo da chamada.
+
+Uso:
+    python -m scripts.benchmark_batching --batch-sizes 1 4 16 --clients 20
+"""
+
+import argparse
+import threading
+import time
+
+import numpy as np
+
+from app.services.embedding_batcher import EmbeddingBatcher
+from app.services.face_recognition_service import FaceRecognitionService
+
+FACE_SHAPE = (160, 160, 3)
+EMBEDDING_DIM = 128
+
+
+def simulated_embed_fn(overhead_ms: float, per_face_ms: float):
+    def embed(faces, model_name=None):
+        time.sleep((overhead_ms + per_face_ms * len(faces)) / 1000.0)
+        return np.zeros((len(faces), EMBEDDING_DIM), dtype=np.float32)
+    return embed
+
+
+def run(batcher: EmbeddingBatcher, clients: int, requests_per_client: int, face: np.ndarray):
+    latencies = []
+    lock = threading.Lock()
+
+    def client():
+        local = []
+        for _ in range(requests_per_client):
+            start = time.perf_counter()
+            batcher.submit(face).result()
+            local.append((time.perf_counter() - start) * 1000)
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    return len(latencies) / elapsed, np.percentile(latencies, [50, 99])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--clients", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=20, help="requisições por cliente")
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    parser.add_argument("--model", choices=["real", "simulated"], default="simulated")
+    parser.add_argument("--overhead-ms", type=float, default=15.0, help="custo fixo simulado por chamada")
+    parser.add_argument("--per-face-ms", type=float, default=3.0, help="custo simulado por recorte")
+    args = parser.parse_args()
+
+    if args.model == "real":
+        embed_fn = FaceRecognitionService.embed_faces
+        embed_fn([np.zeros(FACE_SHAPE, dtype=np.float32)])  # warm-up
+    else:
+        embed_fn = simulated_embed_fn(args.overhead_ms, args.per_face_ms)
+
+    face = np.random.default_rng(7).random(FACE_SHAPE, dtype=np.float32)
+
+    print(f"Modelo: {args.model}, {args.clients} clientes x {args.requests} requisições, janela {args.max_wait_ms}ms")
+    print(f"{'lote máx':>8} | {'faces/s':>9} | {'p50 ms':>8} | {'p99 ms':>8} | {'lote médio':>10}")
+
+    for batch_size in args.batch_sizes:
+        batcher = EmbeddingBatcher(embed_fn, batch_size, args.max_wait_ms)
+        sizes = batcher._batch_size
+        count_before, sum_before = sizes.count, sizes.sum
+
+        throughput, (p50, p99) = run(batcher, args.clients, args.requests, face)
+        batcher.stop()
+
+        mean_batch = (sizes.sum - sum_before) / max(sizes.count - count_before, 1)
+        print(f"{batch_size:>8} | {throughput:>9.1f} | {p50:>8.1f} | {p99:>8.1f} | {mean_batch:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
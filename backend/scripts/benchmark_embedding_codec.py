@@ -0,0 +1,60 @@
+"""
+Benchmark de decodificação em lote dos embeddings armazenados
+
+Compara o formato antigo (pickle de float64) com o formato binário float32
+(app.utils.embedding_codec) ao montar a matriz da galeria, e mostra a
+referência de uma cópia de memória do mesmo volume de dados.
+
+Uso:
+    python -m scripts.benchmark_embedding_codec --rows 10000
+"""
+
+import argparse
+import pickle
+import time
+
+import numpy as np
+
+from app.utils.embedding_codec import decode_embedding, decode_embeddings, encode_embedding
+
+EMBEDDING_DIM = 128
+
+
+def measure(label: str, fn, total_bytes: int):
+    start = time.perf_counter()
+    fn()
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    print(f"{label:>24} | {elapsed_ms:>9.2f} ms | {total_bytes / 1024:>9.0f} KiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10000)
+    args = parser.parse_args()
+
+    vectors = np.random.default_rng(0).standard_normal((args.rows, EMBEDDING_DIM))
+    legacy_blobs = [pickle.dumps(v) for v in vectors]
+    binary_blobs = [encode_embedding(v, "Facenet") for v in vectors]
+    raw = vectors.astype(np.float32)
+
+    print(f"{'formato':>24} | {'tempo':>12} | {'armazenado':>13}")
+    measure(
+        "pickle float64",
+        lambda: np.vstack([np.asarray(pickle.loads(b), dtype=np.float32) for b in legacy_blobs]),
+        sum(len(b) for b in legacy_blobs)
+    )
+    measure(
+        "binário float32",
+        lambda: np.vstack([decode_embedding(b) for b in binary_blobs]),
+        sum(len(b) for b in binary_blobs)
+    )
+    measure(
+        "binário float32 em lote",
+        lambda: decode_embeddings(binary_blobs),
+        sum(len(b) for b in binary_blobs)
+    )
+    measure("memcpy (referência)", lambda: raw.copy(), raw.nbytes)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Benchmark da ingestão de imagens: 1 MP x 12 MP
+
+Compara, para JPEGs sintéticos de cada resolução, o caminho sem política
+de resolução (decodificação completa) com a ingestão atual (decodificação
+reduzida via IMREAD_REDUCED_* + limite MAX_IMAGE_SIDE). Cada execução
+mede decodificação, escala de cinza e detecção de faces com o Haar
+cascade do OpenCV (o mesmo algoritmo do backend "opencv" do DeepFace),
+que é a parte do pipeline cujo custo cresce com a resolução.
+
+Uso:
+    python -m scripts.benchmark_ingest --megapixels 1 12 --runs 5
+"""
+
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+from app.config import settings
+from app.services.frame_context import FrameContext
+
+
+def make_jpeg(megapixels: float, rng: np.random.Generator) -> bytes:
+    """JPEG 4:3 com gradiente + ruído, qualidade típica de câmera de celular"""
+    height = int(np.sqrt(megapixels * 1e6 * 3 / 4))
+    width = int(height * 4 / 3)
+    gradient = np.linspace(40, 200, width, dtype=np.float32)[None, :, None]
+    noise = rng.normal(0, 20, (height, width, 3)).astype(np.float32)
+    image = np.clip(gradient + noise, 0, 255).astype(np.uint8)
+    ok, encoded = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, 90])
+    return encoded.tobytes()
+
+
+def run_pipeline(data: bytes, max_side: int, detector: cv2.CascadeClassifier):
+    frame = FrameContext(data=data, max_side=max_side)
+    start = time.perf_counter()
+    gray = frame.gray
+    with frame.timed("detect"):
+        detector.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5, minSize=(30, 30))
+    return (time.perf_counter() - start) * 1000, frame.bgr.shape[:2], frame.timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--megapixels", type=float, nargs="+", default=[1, 12])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-side", type=int, default=settings.MAX_IMAGE_SIDE)
+    args = parser.parse_args()
+
+    detector = cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_frontalface_default.xml")
+    rng = np.random.default_rng(7)
+
+    print(f"{'entrada':>8} | {'política':>10} | {'decodificada':>12} | {'decode ms':>9} | {'detect ms':>9} | {'total ms':>8}")
+    for megapixels in args.megapixels:
+        data = make_jpeg(megapixels, rng)
+
+        for label, max_side in (("original", 0), (f"{args.max_side}px", args.max_side)):
+            results = [run_pipeline(data, max_side, detector) for _ in range(args.runs)]
+            total = np.median([r[0] for r in results])
+            decode = np.median([r[2].get("decode", 0.0) for r in results])
+            detect = np.median([r[2].get("detect", 0.0) for r in results])
+            height, width = results[0][1]
+            print(
+                f"{megapixels:>6.0f}MP | {label:>10} | {f'{width}x{height}':>12} | "
+                f"{decode:>9.1f} | {detect:>9.1f} | {total:>8.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Benchmark do custo do liveness no frame completo x no recorte da face
+
+Mede check_liveness_frame sobre imagens sintéticas de várias resoluções
+(1 MP a 12 MP, como capturas de celular) e sobre o recorte canônico
+(LIVENESS_CROP_SIZE) que o pipeline usa depois da detecção. A detecção em
+si não entra na conta.
+
+Também compara rajadas de N recortes: check_liveness_frame + Moiré em
+laço contra check_liveness_burst (uma passada vetorizada).
+
+Uso:
+    python -m scripts.benchmark_liveness --megapixels 1 4 12 --burst 2 5 10 --runs 10
+"""
+
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+from app.config import settings
+from app.services.frame_context import FrameContext
+from app.services.liveness_detection_service import LivenessDetectionService
+
+
+def make_frame(megapixels: float, rng: np.random.Generator) -> np.ndarray:
+    """Imagem 4:3 com gradiente + ruído (evita compressão trivial do histograma)"""
+    height = int(np.sqrt(megapixels * 1e6 * 3 / 4))
+    width = int(height * 4 / 3)
+    gradient = np.linspace(40, 200, width, dtype=np.float32)[None, :, None]
+    noise = rng.normal(0, 25, (height, width, 3)).astype(np.float32)
+    return np.clip(gradient + noise, 0, 255).astype(np.uint8)
+
+
+def time_liveness(image: np.ndarray, runs: int) -> float:
+    start = time.perf_counter()
+    for _ in range(runs):
+        LivenessDetectionService.check_liveness_frame(FrameContext(bgr=image))
+    return (time.perf_counter() - start) * 1000 / runs
+
+
+def time_burst(crops: np.ndarray, runs: int):
+    start = time.perf_counter()
+    for _ in range(runs):
+        for crop in crops:
+            frame = FrameContext(bgr=crop)
+            LivenessDetectionService.check_liveness_frame(frame)
+            LivenessDetectionService.check_moiré_pattern_frame(frame)
+    loop_ms = (time.perf_counter() - start) * 1000 / runs
+
+    start = time.perf_counter()
+    for _ in range(runs):
+        LivenessDetectionService.check_liveness_burst(crops)
+    burst_ms = (time.perf_counter() - start) * 1000 / runs
+
+    return loop_ms, burst_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--megapixels", type=float, nargs="+", default=[1, 4, 12])
+    parser.add_argument("--burst", type=int, nargs="+", default=[2, 5, 10], help="frames por rajada")
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(7)
+    size = settings.LIVENESS_CROP_SIZE
+
+    print(f"{'entrada':>10} | {'frame ms':>9} | {'recorte ms':>10} | {'speedup':>7}")
+    for megapixels in args.megapixels:
+        frame = make_frame(megapixels, rng)
+        height, width = frame.shape[:2]
+
+        # Recorte central de ~1/3 da altura, como uma face em selfie
+        side = height // 3
+        top, left = (height - side) // 2, (width - side) // 2
+        crop = cv2.resize(frame[top:top + side, left:left + side], (size, size), interpolation=cv2.INTER_AREA)
+
+        frame_ms = time_liveness(frame, args.runs)
+        crop_ms = time_liveness(crop, args.runs)
+        print(f"{megapixels:>8.0f}MP | {frame_ms:>9.2f} | {crop_ms:>10.3f} | {frame_ms / crop_ms:>7.0f}")
+
+    print()
+    print(f"{'frames':>6} | {'laço ms':>8} | {'rajada ms':>9} | {'speedup':>7}")
+    reference = make_frame(1, rng)[:size, :size]
+    for count in args.burst:
+        # Pequenas variações entre frames, como uma face real parada
+        jitter = rng.integers(-3, 4, (count,) + reference.shape)
+        crops = np.clip(reference.astype(np.int16) + jitter, 0, 255).astype(np.uint8)
+        loop_ms, burst_ms = time_burst(crops, args.runs)
+        print(f"{count:>6} | {loop_ms:>8.2f} | {burst_ms:>9.2f} | {loop_ms / burst_ms:>7.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Benchmark de latência do reconhecimento em função do número de colaboradores
+
+Compara o fluxo antigo (compare_faces por colaborador, que gera o embedding
+do probe N vezes), o fluxo embed_probe + match_embedding, que gera o
+embedding uma única vez por requisição, e a busca vetorizada na FaceGallery.
+
+O forward pass do modelo é simulado com um custo fixo (--model-ms) para que
+o benchmark rode sem pesos do DeepFace e isole o custo que cresce com N.
+
+Uso:
+    python -m scripts.benchmark_recognition --sizes 10 100 800 2000
+"""
+
+import argparse
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+from app.services.face_recognition_service import FaceRecognitionService
+from app.services.face_gallery import FaceGallery
+from app.utils.embedding_codec import encode_embedding
+
+EMBEDDING_DIM = 128
+
+
+def make_employees(n: int, rng: np.random.Generator):
+    """Cria colaboradores sintéticos com encodings no formato armazenado"""
+    return [
+        SimpleNamespace(
+            id=i + 1,
+            face_encoding=encode_embedding(rng.standard_normal(EMBEDDING_DIM), FaceRecognitionService.MODEL_NAME)
+        )
+        for i in range(n)
+    ]
+
+
+def install_simulated_model(model_ms: float, rng: np.random.Generator) -> dict:
+    """Substitui o forward pass por um custo fixo e conta as chamadas"""
+    calls = {"count": 0}
+    probe = rng.standard_normal(EMBEDDING_DIM)
+
+    def fake_represent(image_path: str):
+        calls["count"] += 1
+        time.sleep(model_ms / 1000.0)
+        return probe
+
+    FaceRecognitionService._represent = staticmethod(fake_represent)
+    return calls
+
+
+def run_legacy(employees) -> float:
+    start = time.perf_counter()
+    for employee in employees:
+        FaceRecognitionService.compare_faces(employee.face_encoding, "probe.jpg")
+    return (time.perf_counter() - start) * 1000
+
+
+def run_single_probe(employees) -> float:
+    start = time.perf_counter()
+    probe = FaceRecognitionService.embed_probe("probe.jpg")
+    for employee in employees:
+        FaceRecognitionService.match_embedding(employee.face_encoding, probe)
+    return (time.perf_counter() - start) * 1000
+
+
+def run_gallery(gallery: FaceGallery) -> float:
+    start = time.perf_counter()
+    probe = FaceRecognitionService.embed_probe("probe.jpg")
+    gallery.search(probe, k=1)
+    return (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 800, 2000])
+    parser.add_argument("--model-ms", type=float, default=20.0, help="custo simulado de um forward pass")
+    parser.add_argument("--legacy-max", type=int, default=200, help="maior N executado no fluxo antigo")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    calls = install_simulated_model(args.model_ms, rng)
+
+    print(
+        f"{'colaboradores':>14} | {'antigo (ms)':>12} | {'chamadas':>8} | "
+        f"{'probe único (ms)':>16} | {'chamadas':>8} | {'galeria (ms)':>12}"
+    )
+    for n in args.sizes:
+        employees = make_employees(n, rng)
+
+        legacy_ms, legacy_calls = float("nan"), "-"
+        if n <= args.legacy_max:
+            calls["count"] = 0
+            legacy_ms = run_legacy(employees)
+            legacy_calls = calls["count"]
+
+        calls["count"] = 0
+        single_ms = run_single_probe(employees)
+        single_calls = calls["count"]
+
+        gallery = FaceGallery()
+        gallery.load_embeddings(
+            [e.id for e in employees],
+            [FaceRecognitionService.decode_encoding(e.face_encoding) for e in employees]
+        )
+        gallery_ms = run_gallery(gallery)
+
+        print(
+            f"{n:>14} | {legacy_ms:>12.1f} | {legacy_calls:>8} | "
+            f"{single_ms:>16.1f} | {single_calls:>8} | {gallery_ms:>12.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Controlador de porta falso para testes offline
+
+Imita os endpoints usados pelo DoorControlService: POST /ACT_ID_1 (login,
+devolve cookie de sessão) e POST /ACT_ID_701 (abre a porta; sem sessão
+válida redireciona para o login). Permite simular latência, falhas e
+expiração da sessão para exercitar a fila de comandos e o circuit breaker.
+
+Uso:
+    python -m scripts.fake_door_controller --port 8080 --latency 0.05 --fail-rate 0.3
+    DOOR_CONTROLLER_BASE_URL=http://127.0.0.1:8080 uvicorn app.main:app
+"""
+
+import argparse
+import random
+import secrets
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+
+class ControllerState:
+    def __init__(self, latency: float, fail_rate: float, session_ttl: float, down: bool):
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.session_ttl = session_ttl
+        self.down = down
+        self.sessions = {}
+        self.logins = 0
+        self.opens = 0
+        self.lock = threading.Lock()
+
+
+def make_handler(state: ControllerState):
+    class Handler(BaseHTTPRequestHandler):
+        def _reply(self, status: int, headers: dict = None, body: bytes = b"OK"):
+            self.send_response(status)
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _session_valid(self) -> bool:
+            cookies = dict(
+                part.strip().split("=", 1)
+                for part in self.headers.get("Cookie", "").split(";")
+                if "=" in part
+            )
+            created = state.sessions.get(cookies.get("sid"))
+            return created is not None and time.monotonic() - created < state.session_ttl
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            form = parse_qs(self.rfile.read(length).decode())
+            time.sleep(state.latency)
+
+            if state.down or random.random() < state.fail_rate:
+                self._reply(503, body=b"Service Unavailable")
+                return
+
+            if self.path == "/ACT_ID_1":
+                sid = secrets.token_hex(8)
+                with state.lock:
+                    state.sessions[sid] = time.monotonic()
+                    state.logins += 1
+                self._reply(200, {"Set-Cookie": f"sid={sid}; Path=/"})
+            elif self.path == "/ACT_ID_701":
+                if not self._session_valid():
+                    self._reply(302, {"Location": "/"})
+                    return
+                with state.lock:
+                    state.opens += 1
+                print(f"🚪 {', '.join(form)} (aberturas: {state.opens}, logins: {state.logins})")
+                self._reply(200)
+            else:
+                self._reply(404, body=b"Not Found")
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency", type=float, default=0.02, help="segundos por requisição")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="fração de respostas 503")
+    parser.add_argument("--session-ttl", type=float, default=300.0, help="validade da sessão (s)")
+    parser.add_argument("--down", action="store_true", help="responde 503 a tudo")
+    args = parser.parse_args()
+
+    state = ControllerState(args.latency, args.fail_rate, args.session_ttl, args.down)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(state))
+    print(f"🔌 Controlador falso em http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
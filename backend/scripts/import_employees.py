@@ -0,0 +1,85 @@
+"""
+Importação em lote de colaboradores a partir de um CSV e das fotos
+
+Colunas do CSV: full_name, cpf, email, phone, department, position e photo
+(nome do arquivo no diretório ou no zip de fotos). Detecção e embedding
+rodam em um pool de processos; os colaboradores são gravados em lotes e
+publicados no canal da galeria (GALLERY_SYNC_BACKEND) para os workers da
+API.
+
+Uso:
+    python -m scripts.import_employees colaboradores.csv fotos/
+    python -m scripts.import_employees colaboradores.csv fotos.zip --workers 8 --json
+"""
+
+import argparse
+import json
+import sys
+
+from app.database import SessionLocal, engine, Base
+from app.services.bulk_import import BulkImporter, PhotoSource, parse_csv
+from app.services.gallery_sync import create_change_feed, gallery_sync
+from app.services.reembedding import ReembeddingService
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("csv", help="CSV com os colaboradores")
+    parser.add_argument("photos", help="Diretório ou zip com as fotos")
+    parser.add_argument("--workers", type=int, default=None, help="Processos (padrão BULK_IMPORT_WORKERS)")
+    parser.add_argument("--chunk-size", type=int, default=None, help="Fotos por tarefa (padrão BULK_IMPORT_CHUNK_SIZE)")
+    parser.add_argument("--batch-size", type=int, default=None, help="Colaboradores por commit (padrão BULK_IMPORT_BATCH_SIZE)")
+    parser.add_argument("--json", action="store_true", help="Emite os eventos em NDJSON")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+
+    # Embeddings gerados com o modelo ativo (após uma troca por reembed_faces)
+    db = SessionLocal()
+    try:
+        ReembeddingService.use_active_model(db)
+    finally:
+        db.close()
+
+    with open(args.csv, encoding="utf-8-sig", newline="") as f:
+        rows, failures = parse_csv(f.read())
+    photos = PhotoSource(args.photos)
+
+    gallery_sync.start(create_change_feed())
+    importer = BulkImporter(
+        SessionLocal,
+        on_employee=gallery_sync.add,
+        workers=args.workers,
+        chunk_size=args.chunk_size,
+        batch_size=args.batch_size
+    )
+
+    try:
+        for event in importer.run(rows, photos, failures):
+            if args.json:
+                print(json.dumps(event, ensure_ascii=False), flush=True)
+            elif event["event"] == "start":
+                print(f"📥 Importando {event['total']} linhas com {event['workers']} processos")
+            elif event["event"] == "row" and event["status"] == "failed":
+                print(f"❌ Linha {event['line']}: {event['error']}")
+            elif event["event"] == "progress":
+                print(
+                    f"   {event['processed']}/{event['total']} "
+                    f"({event['imported']} importados, {event['failed']} falhas, "
+                    f"{event['rows_per_second']} linhas/s)",
+                    flush=True
+                )
+            elif event["event"] == "done":
+                print(
+                    f"✅ {event['imported']} colaboradores importados, {event['failed']} falhas "
+                    f"em {event['elapsed_seconds']:.1f}s ({event['rows_per_second']} linhas/s)"
+                )
+    finally:
+        photos.close()
+        gallery_sync.stop()
+
+    sys.exit(1 if importer.failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,28 @@
+"""
+Recalcula as tabelas access_stats_hourly/daily a partir de access_logs
+
+Necessário uma vez após criar as tabelas (logs anteriores não estão nos
+rollups) ou para corrigir as contagens depois de uma falha.
+
+Uso:
+    python -m scripts.rebuild_access_stats
+"""
+
+from app.database import SessionLocal, engine, Base
+from app.services.access_stats import AccessStatsService
+
+
+def main():
+    Base.metadata.create_all(bind=engine)
+
+    db = SessionLocal()
+    try:
+        processed = AccessStatsService.rebuild(db)
+    finally:
+        db.close()
+
+    print(f"✅ Estatísticas recalculadas a partir de {processed} logs de acesso")
+
+
+if __name__ == "__main__":
+    main()
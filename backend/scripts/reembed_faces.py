@@ -0,0 +1,92 @@
+"""
+Re-embedding dos colaboradores para trocar o modelo ou o detector
+
+Recalcula os embeddings de todas as fotos (cadastro e templates) com o
+modelo novo em um pool de processos, gravando um checkpoint a cada lote;
+se interrompido, rodar o mesmo comando retoma do último lote. Ao terminar,
+o modelo novo é ativado e a troca é publicada no canal da galeria
+(GALLERY_SYNC_BACKEND) para os workers da API.
+
+Uso:
+    python -m scripts.reembed_faces --model ArcFace
+    python -m scripts.reembed_faces --model ArcFace --detector retinaface --workers 8
+    python -m scripts.reembed_faces --model ArcFace --no-activate
+    python -m scripts.reembed_faces --activate 3
+    python -m scripts.reembed_faces --status
+"""
+
+import argparse
+import sys
+
+from app.database import SessionLocal, engine, Base
+from app.models.reembedding import ReembeddingJob
+from app.services.gallery_sync import create_change_feed, gallery_sync
+from app.services.reembedding import ReembeddingService
+
+
+def print_status(db):
+    model_name, detector_backend = ReembeddingService.active_model(db)
+    print(f"Modelo ativo: {model_name} / {detector_backend}")
+
+    for job in db.query(ReembeddingJob).order_by(ReembeddingJob.id.desc()).limit(10):
+        print(
+            f"  #{job.id} {job.model_name} / {job.detector_backend}: {job.status} "
+            f"{job.processed}/{job.total} ({job.failed} falhas, {job.reenroll_pending} a recadastrar)"
+            + (f" - {job.error}" if job.error else "")
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", help="Modelo de reconhecimento (ex.: ArcFace)")
+    parser.add_argument("--detector", default=None, help="Detector de faces (padrão: o ativo)")
+    parser.add_argument("--workers", type=int, default=None, help="Processos (padrão REEMBEDDING_WORKERS)")
+    parser.add_argument("--batch-size", type=int, default=None, help="Colaboradores por checkpoint (padrão REEMBEDDING_BATCH_SIZE)")
+    parser.add_argument("--no-activate", action="store_true", help="Só gera os embeddings, sem ativar o modelo")
+    parser.add_argument("--activate", type=int, metavar="JOB_ID", help="Ativa um job já concluído")
+    parser.add_argument("--status", action="store_true", help="Mostra o modelo ativo e os últimos jobs")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+
+    try:
+        if args.status:
+            print_status(db)
+            return
+
+        if args.activate is None and not args.model:
+            parser.error("informe --model, --activate ou --status")
+
+        gallery_sync.start(create_change_feed())
+        try:
+            if args.activate is not None:
+                job = db.get(ReembeddingJob, args.activate)
+                if job is None:
+                    parser.error(f"job {args.activate} não encontrado")
+                ReembeddingService.activate(db, job)
+                return
+
+            detector_backend = args.detector or ReembeddingService.active_model(db)[1]
+            job = ReembeddingService.start(db, args.model, detector_backend)
+            job = ReembeddingService.run(
+                SessionLocal,
+                job.id,
+                workers=args.workers,
+                batch_size=args.batch_size,
+                activate=not args.no_activate
+            )
+            print(f"✅ Job #{job.id}: {job.processed} colaboradores, {job.failed} fotos com falha ({job.status})")
+        finally:
+            gallery_sync.stop()
+
+    except ValueError as e:
+        print(f"❌ {str(e)}")
+        sys.exit(1)
+
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
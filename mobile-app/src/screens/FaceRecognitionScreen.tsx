@@ -75,6 +75,12 @@ export default function FaceRecognitionScreen() {
 
       const result = await recognizeFace(formData);
 
+      // Empty frame: keep auto-capturing without showing a result
+      if (result.face_detected === false) {
+        setProcessing(false);
+        return;
+      }
+
       // Vibration feedback
       if (result.access_granted) {
         Vibration.vibrate([0, 200, 100, 200]); // Success pattern
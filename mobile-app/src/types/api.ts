@@ -8,6 +8,7 @@ export interface RecognitionResponse {
     position?: string;
   };
   confidence?: number;
+  face_detected?: boolean;
   message: string;
   timestamp?: string;
   liveness_details?: any;